@@ -0,0 +1,52 @@
+"""
+Compares reading NKJP corpus with nltk's TaggedCorpusReader and with spacy_pl.conversion.nkjp_reader
+(in one and in many processes): reports time of reading tagged paragraphs of all files and checks
+that both readers give the same paragraphs.
+"""
+import os
+import time
+
+import click
+import nltk
+import pandas as pd
+
+from spacy_pl.conversion.nkjp_reader import NKJPCorpusReader
+
+
+@click.command(help="Benchmark NKJP readers")
+@click.argument("input-dir", type=str, default="data/raw/NKJP_1.2_nltk")
+@click.option("-j", "--jobs", type=int, default=1)
+def benchmark_nkjp_reader(input_dir, jobs):
+    corpus_path = os.path.abspath(input_dir)
+    nltk_corpus = nltk.corpus.reader.TaggedCorpusReader(root=corpus_path, fileids=r".*")
+    files = nltk_corpus.fileids()
+
+    start = time.time()
+    nltk_paras = [list(nltk_corpus.tagged_paras(f)) for f in files]
+    nltk_seconds = time.time() - start
+
+    corpus = NKJPCorpusReader(root=corpus_path, fileids=r".*")
+    assert corpus.fileids() == files, "Readers found different files"
+
+    rows = [{"reader": "nltk", "jobs": 1, "seconds": nltk_seconds, "same_as_nltk": True}]
+    for n_jobs in sorted({1, jobs}):
+        start = time.time()
+        paras = [paragraphs for _, paragraphs in corpus.iter_files_paras(n_jobs)]
+        seconds = time.time() - start
+        same = all(
+            [[list(s) for s in p] for p in a] == [[list(s) for s in p] for p in b]
+            for a, b in zip(nltk_paras, paras)
+        )
+        rows.append({"reader": "native", "jobs": n_jobs, "seconds": seconds, "same_as_nltk": same})
+
+    n_tokens = sum(len(s) for file_paras in nltk_paras for p in file_paras for s in p)
+    results_df = pd.DataFrame(rows)
+    results_df["tokens_per_second"] = n_tokens / results_df["seconds"]
+    results_df["speedup"] = nltk_seconds / results_df["seconds"]
+    print(f"{len(files)} files, {n_tokens} tokens")
+    print(results_df)
+    return results_df
+
+
+if __name__ == "__main__":
+    benchmark_nkjp_reader()
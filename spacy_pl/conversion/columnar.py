@@ -0,0 +1,224 @@
+"""
+Compact columnar storage for converted POS corpora.
+
+Instead of a dict per token, a corpus is stored as interned orth and tag string tables
+and flat numpy arrays:
+    token_orth, token_tag - ids into orth/tag tables, one entry per token
+    sent_offsets - token offsets of sentence boundaries (n_sentences + 1 entries)
+    para_offsets - sentence offsets of paragraph boundaries (n_paragraphs + 1 entries)
+    doc_offsets - paragraph offsets of document boundaries (n_documents + 1 entries)
+    doc_ids - id of every document
+    token_head, token_dep - optional (only for corpora with trees): head offset relative to the token
+        and id into dep table
+
+Corpus is saved as a directory of .npy files (so it can be memory-mapped) and a JSON file with string tables.
+Documents in spacy JSON format can be read from it lazily.
+"""
+import json
+import os
+from array import array
+
+import numpy as np
+
+ARRAY_NAMES = ("token_orth", "token_tag", "sent_offsets", "para_offsets", "doc_offsets", "doc_ids")
+TREE_ARRAY_NAMES = ("token_head", "token_dep")
+STRINGS_FILENAME = "strings.json"
+
+
+class ColumnarCorpusWriter:
+    """Accumulates documents in compact arrays, interning orths and tags"""
+
+    def __init__(self):
+        self.orths = {}
+        self.tags = {}
+        self.deps = {}
+        self.token_orth = array('i')
+        self.token_tag = array('i')
+        self.token_head = array('i')
+        self.token_dep = array('i')
+        self.sent_offsets = array('q', [0])
+        self.para_offsets = array('q', [0])
+        self.doc_offsets = array('q', [0])
+        self.doc_ids = array('q')
+
+    @staticmethod
+    def _intern(table: dict, string: str) -> int:
+        idx = table.get(string)
+        if idx is None:
+            idx = len(table)
+            table[string] = idx
+        return idx
+
+    def add_document(self, index: int, paragraphs):
+        """
+        :param index: id of the document
+        :param paragraphs: list of paragraphs, each a list of sentences, each a list of (orth, tag) tuples
+            (same structure as nltk's tagged_paras) or (orth, tag, head, dep) tuples, with head relative to the token
+        """
+        for sentences in paragraphs:
+            for tokens in sentences:
+                for orth, tag, *tree in tokens:
+                    self.token_orth.append(self._intern(self.orths, orth))
+                    self.token_tag.append(self._intern(self.tags, tag))
+                    if tree:
+                        head, dep = tree
+                        self.token_head.append(head)
+                        self.token_dep.append(self._intern(self.deps, dep))
+                self.sent_offsets.append(len(self.token_orth))
+            self.para_offsets.append(len(self.sent_offsets) - 1)
+        self.doc_offsets.append(len(self.para_offsets) - 1)
+        self.doc_ids.append(index)
+
+    def to_corpus(self):
+        has_trees = len(self.token_head) > 0
+        if has_trees and len(self.token_head) != len(self.token_orth):
+            raise ValueError("Either all or none of the tokens should have trees")
+        return ColumnarCorpus(
+            orth_table=list(self.orths),
+            tag_table=list(self.tags),
+            dep_table=list(self.deps) if has_trees else None,
+            token_head=np.frombuffer(self.token_head, dtype=np.int32) if has_trees else None,
+            token_dep=np.frombuffer(self.token_dep, dtype=np.int32) if has_trees else None,
+            token_orth=np.frombuffer(self.token_orth, dtype=np.int32),
+            token_tag=np.frombuffer(self.token_tag, dtype=np.int32),
+            sent_offsets=np.frombuffer(self.sent_offsets, dtype=np.int64),
+            para_offsets=np.frombuffer(self.para_offsets, dtype=np.int64),
+            doc_offsets=np.frombuffer(self.doc_offsets, dtype=np.int64),
+            doc_ids=np.frombuffer(self.doc_ids, dtype=np.int64),
+        )
+
+
+class ColumnarCorpus:
+
+    def __init__(
+            self,
+            orth_table: list,
+            tag_table: list,
+            token_orth: np.ndarray,
+            token_tag: np.ndarray,
+            sent_offsets: np.ndarray,
+            para_offsets: np.ndarray,
+            doc_offsets: np.ndarray,
+            doc_ids: np.ndarray,
+            dep_table: list = None,
+            token_head: np.ndarray = None,
+            token_dep: np.ndarray = None,
+    ):
+        self.orth_table = orth_table
+        self.dep_table = dep_table
+        self.token_head = token_head
+        self.token_dep = token_dep
+        self.tag_table = tag_table
+        self.token_orth = token_orth
+        self.token_tag = token_tag
+        self.sent_offsets = sent_offsets
+        self.para_offsets = para_offsets
+        self.doc_offsets = doc_offsets
+        self.doc_ids = doc_ids
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    @property
+    def n_tokens(self):
+        return len(self.token_orth)
+
+    @property
+    def has_trees(self):
+        return self.token_head is not None
+
+    def remap_tags(self, conversion_map: dict):
+        """
+        Converts tags with conversion_map as a single array lookup.
+        Tags missing from conversion map are kept as they are, with one warning listing all of them.
+        :return: new corpus sharing all arrays except token_tag
+        """
+        converted = [conversion_map.get(tag, tag) for tag in self.tag_table]
+        missing = [tag for tag in self.tag_table if tag not in conversion_map]
+        if missing:
+            print("Warning, tags {} not in conversion map".format(sorted(missing)))
+
+        new_tag_table = sorted(set(converted))
+        new_tag_ids = {tag: idx for idx, tag in enumerate(new_tag_table)}
+        lookup = np.array([new_tag_ids[tag] for tag in converted], dtype=np.int32)
+
+        return ColumnarCorpus(
+            orth_table=self.orth_table,
+            tag_table=new_tag_table,
+            token_orth=self.token_orth,
+            token_tag=lookup[self.token_tag],
+            sent_offsets=self.sent_offsets,
+            para_offsets=self.para_offsets,
+            doc_offsets=self.doc_offsets,
+            doc_ids=self.doc_ids,
+            dep_table=self.dep_table,
+            token_head=self.token_head,
+            token_dep=self.token_dep,
+        )
+
+    def save(self, output_dir: str):
+        os.makedirs(output_dir, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(output_dir, name + ".npy"), getattr(self, name))
+        strings = {"orths": self.orth_table, "tags": self.tag_table}
+        if self.has_trees:
+            for name in TREE_ARRAY_NAMES:
+                np.save(os.path.join(output_dir, name + ".npy"), getattr(self, name))
+            strings["deps"] = self.dep_table
+        with open(os.path.join(output_dir, STRINGS_FILENAME), "w") as f:
+            json.dump(strings, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, input_dir: str, mmap: bool = True):
+        """
+        :param mmap: if True, arrays are memory-mapped instead of read into memory
+        """
+        mmap_mode = "r" if mmap else None
+        arrays = {
+            name: np.load(os.path.join(input_dir, name + ".npy"), mmap_mode=mmap_mode)
+            for name in ARRAY_NAMES
+        }
+        with open(os.path.join(input_dir, STRINGS_FILENAME), "r") as f:
+            strings = json.load(f)
+        if "deps" in strings:
+            for name in TREE_ARRAY_NAMES:
+                arrays[name] = np.load(os.path.join(input_dir, name + ".npy"), mmap_mode=mmap_mode)
+        return cls(orth_table=strings["orths"], tag_table=strings["tags"], dep_table=strings.get("deps"), **arrays)
+
+    def document(self, doc_idx: int) -> dict:
+        """Builds a single document in spacy JSON format"""
+        orth_table, tag_table = self.orth_table, self.tag_table
+        para_start, para_end = self.doc_offsets[doc_idx], self.doc_offsets[doc_idx + 1]
+        doc_token_start = self.sent_offsets[self.para_offsets[para_start]]
+
+        paragraphs = []
+        for para_idx in range(para_start, para_end):
+            sentences = []
+            for sent_idx in range(self.para_offsets[para_idx], self.para_offsets[para_idx + 1]):
+                start, end = self.sent_offsets[sent_idx], self.sent_offsets[sent_idx + 1]
+                orths = self.token_orth[start:end].tolist()
+                tags = self.token_tag[start:end].tolist()
+                tokens = [
+                    {"id": int(start - doc_token_start) + i, "head": 0, "tag": tag_table[t], "orth": orth_table[o]}
+                    for i, (o, t) in enumerate(zip(orths, tags))
+                ]
+                if self.has_trees:
+                    heads = self.token_head[start:end].tolist()
+                    deps = self.token_dep[start:end].tolist()
+                    for token, head, dep in zip(tokens, heads, deps):
+                        token["head"] = head
+                        token["dep"] = self.dep_table[dep]
+                sentences.append({"tokens": tokens})
+            paragraphs.append({"sentences": sentences})
+
+        return {"id": int(self.doc_ids[doc_idx]), "paragraphs": paragraphs}
+
+    def iter_documents(self, doc_indices=None):
+        """
+        Lazily yields documents in spacy JSON format
+        :param doc_indices: positions of documents to yield, all documents if None
+        """
+        if doc_indices is None:
+            doc_indices = range(len(self))
+        for doc_idx in doc_indices:
+            yield self.document(doc_idx)
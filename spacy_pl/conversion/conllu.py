@@ -0,0 +1,181 @@
+"""
+Converts CoNLL-U treebanks (eg. UD Polish LFG) to spacy JSON training format, the way `spacy convert -t json`
+does for conllu files: tag is XPOS (UPOS if XPOS is missing), head is relative to the token (missing head
+makes the token a root), "root" dep becomes "ROOT", multiword tokens and empty nodes are skipped and every
+document has `n_sents` sentences. Named entities are read the way spacy 2's conllu2json reads them too: if MISC
+column of the first token of a file is an IOB tag (eg. "B-PER" or "O"), MISC columns of all tokens are taken as
+IOB tags, simplified to PER, LOC, ORG and MISC types (see `simplify_tag`) and tokens get "ner" in BILUO scheme.
+
+Files are read one sentence at a time and documents are written as soon as they are complete, every file
+is converted in its own worker process. With `--columnar-dir`, trees are written in compact columnar format
+(see `spacy_pl.conversion.columnar`) as well.
+"""
+import os
+import re
+from multiprocessing import Pool
+from pathlib import Path
+
+import click
+from spacy.gold import iob_to_biluo
+
+from spacy_pl.conversion.columnar import ColumnarCorpusWriter
+from spacy_pl.training.documents import DocumentWriter
+
+LFG_FILES = ("pl_lfg-ud-train.conllu", "pl_lfg-ud-dev.conllu", "pl_lfg-ud-test.conllu")
+# same as spacy's conllu2json
+NER_TAG_PATTERN = re.compile(r"([A-Z_]+)-([A-Z_]+)")
+SIMPLIFIED_NER_TYPES = {"PER": "PER", "LOC": "LOC", "ORG": "ORG", "GPE_LOC": "LOC", "GPE_ORG": "ORG"}
+
+
+def iter_token_lines(path: str):
+    """Yields lists of token lines of consecutive sentences (comments skipped)"""
+    lines = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if line.strip():
+                if not line.startswith("#"):
+                    lines.append(line)
+            elif lines:
+                yield lines
+                lines = []
+    if lines:
+        yield lines
+
+
+def is_skipped(id_: str) -> bool:
+    """Whether the token is a multiword token or an empty node"""
+    return "-" in id_ or "." in id_
+
+
+def misc_column(columns: list) -> str:
+    return columns[9] if len(columns) > 9 and columns[9] else "O"
+
+
+def has_ner_tags(path: str) -> bool:
+    """Whether MISC column of the first token of the file is a named entity tag, reads only the first sentence"""
+    for lines in iter_token_lines(path):
+        for line in lines:
+            columns = line.split("\t")
+            if not is_skipped(columns[0]):
+                tag = misc_column(columns)
+                return tag == "O" or NER_TAG_PATTERN.match(tag) is not None
+    return False
+
+
+def simplify_tag(tag: str) -> str:
+    """Same as spacy's simplify_tags: GPE_LOC becomes LOC, GPE_ORG becomes ORG, types other than PER, LOC, ORG MISC"""
+    match = NER_TAG_PATTERN.match(tag)
+    if match is None:
+        return tag
+    prefix, ner_type = match.groups()
+    return f"{prefix}-{SIMPLIFIED_NER_TYPES.get(ner_type, 'MISC')}"
+
+
+def iter_conllu_sentences(path: str, with_ner: bool = False):
+    """
+    Yields sentences of CoNLL-U file as lists of (orth, tag, head, dep), head relative to the token,
+    or (orth, tag, head, dep, ner) if with_ner
+    """
+    for lines in iter_token_lines(path):
+        yield parse_sentence(lines, with_ner)
+
+
+def parse_sentence(lines: list, with_ner: bool = False) -> list:
+    tokens = []
+    iob_tags = []
+    for line in lines:
+        columns = line.split("\t")
+        id_, word, _lemma, pos, tag, _morph, head, dep = columns[:8]
+        if is_skipped(id_):
+            continue
+        index = int(id_) - 1
+        head = int(head) - 1 if head not in ("0", "_") else index
+        tokens.append((word, pos if tag == "_" else tag, head - index, "ROOT" if dep == "root" else dep))
+        if with_ner:
+            iob_tags.append(simplify_tag(misc_column(columns)))
+    if with_ner:
+        tokens = [token + (ner,) for token, ner in zip(tokens, iob_to_biluo(iob_tags))]
+    return tokens
+
+
+def make_tree_document(index: int, sentences: list, starting_id: int = 0) -> dict:
+    converted_sents = []
+    token_id = starting_id
+    for tokens in sentences:
+        converted_tokens = []
+        for orth, tag, head, dep, *ner in tokens:
+            token = {"id": token_id, "orth": orth, "tag": tag, "head": head, "dep": dep}
+            if ner:
+                token["ner"] = ner[0]
+            converted_tokens.append(token)
+            token_id += 1
+        converted_sents.append({"tokens": converted_tokens})
+    return {"id": index, "paragraphs": [{"sentences": converted_sents}]}
+
+
+def iter_documents(path: str, n_sents: int, with_ner: bool = False):
+    """Yields lists of sentences of consecutive documents"""
+    sentences = []
+    for sentence in iter_conllu_sentences(path, with_ner):
+        sentences.append(sentence)
+        if len(sentences) == n_sents:
+            yield sentences
+            sentences = []
+    if sentences:
+        yield sentences
+
+
+def convert_file(task):
+    """Converts one CoNLL-U file, runs in a worker process"""
+    input_path, output_path, columnar_dir, n_sents = task
+    writer = ColumnarCorpusWriter() if columnar_dir is not None else None
+    with_ner = has_ner_tags(input_path)
+    with DocumentWriter(output_path) as documents:
+        for i, sentences in enumerate(iter_documents(input_path, n_sents, with_ner)):
+            documents.write(make_tree_document(i, sentences))
+            if writer is not None:
+                # columnar format keeps trees only
+                writer.add_document(i, [[[token[:4] for token in tokens] for tokens in sentences]])
+        n_docs = documents.n_docs
+
+    if writer is not None:
+        writer.to_corpus().save(columnar_dir)
+    return input_path, n_docs
+
+
+@click.command(help="Convert CoNLL-U treebank files to spacy JSON format")
+@click.argument("input-dir", type=str, default="data/raw/UD_Polish-LFG-master")
+@click.argument("output-dir", type=str, default="data/processed/trees")
+@click.option(
+    "-f", "--file", "files", type=str, multiple=True, default=LFG_FILES,
+    help="CoNLL-U files in input dir to convert, can be given multiple times"
+)
+@click.option("-n", "--n-sents", type=int, default=1, help="Number of sentences per document")
+@click.option(
+    "--columnar-dir", type=str, default=None,
+    help="If provided, trees are also written in compact columnar format to subdirectories of this directory"
+)
+@click.option("-j", "--jobs", type=int, default=1)
+def convert_conllu(input_dir, output_dir, files, n_sents, columnar_dir, jobs):
+    if not files:
+        print("No files to convert")
+        return
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = []
+    for filename in files:
+        stem = Path(filename).stem
+        tasks.append((
+            os.path.join(input_dir, filename),
+            os.path.join(output_dir, stem + ".json"),
+            os.path.join(columnar_dir, stem) if columnar_dir is not None else None,
+            n_sents,
+        ))
+
+    with Pool(min(jobs, len(tasks))) as pool:
+        for input_path, n_docs in pool.imap_unordered(convert_file, tasks):
+            print(f"Converted {input_path}: {n_docs} documents")
+
+
+if __name__ == "__main__":
+    convert_conllu()
@@ -1,15 +1,33 @@
+"""
+Converts NKJP corpus (nltk format, read with `spacy_pl.conversion.nkjp_reader`) to spacy JSON training format.
+
+By default the whole corpus is converted in one process and written one document at a time. When `--shards-dir`
+is given, every corpus file is converted in a worker process into its own JSONL shard, shards of
+files that didn't change since the last run are reused and the output is merged from shards
+one document at a time. With `--columnar-dir`, corpus is written in compact columnar format
+(see `spacy_pl.conversion.columnar`) instead of JSON.
+"""
+import hashlib
 import json
 import os
+from collections import Counter
+from multiprocessing import Pool
 
 import click
-import nltk
+
+from spacy_pl.conversion.columnar import ColumnarCorpusWriter
+from spacy_pl.conversion.nkjp_reader import NKJPCorpusReader
+from spacy_pl.instrumentation import Metrics
+from spacy_pl.training.documents import DocumentWriter
+
+SHARDS_MANIFEST = "manifest.json"
 
 
-def make_document(index: int, paragraphs: list, conversion_map: dict):
+def make_document(index: int, paragraphs: list, conversion_map: dict, missing_tags: Counter = None):
     converted_paras = []
     starting_id = 0
     for sentences in paragraphs:
-        paragraph, tokens_number = make_paragraph(sentences, starting_id, conversion_map)
+        paragraph, tokens_number = make_paragraph(sentences, starting_id, conversion_map, missing_tags)
         converted_paras.append(paragraph)
         starting_id += tokens_number
 
@@ -21,15 +39,15 @@ def make_document(index: int, paragraphs: list, conversion_map: dict):
     return document
 
 
-def make_paragraph(sentences: list, starting_id: int, conversion_map: dict):
+def make_paragraph(sentences: list, starting_id: int, conversion_map: dict, missing_tags: Counter = None):
     converted_sents = []
     tokens_num = 0
 
     for tokens in sentences:
-        converted_sentence = make_sentence(tokens, starting_id, conversion_map)  # TODO
+        converted_sentence = make_sentence(tokens, starting_id, conversion_map, missing_tags)  # TODO
         converted_sents.append(converted_sentence)
 
-        sentence_size = len(converted_sentence)
+        sentence_size = len(converted_sentence["tokens"])
         starting_id += sentence_size
         tokens_num += sentence_size
 
@@ -41,7 +59,10 @@ def make_paragraph(sentences: list, starting_id: int, conversion_map: dict):
     return paragraph, tokens_num
 
 
-def make_sentence(tokens: list, starting_id: int, conversion_map: dict):  # , tags: list):
+def make_sentence(tokens: list, starting_id: int, conversion_map: dict, missing_tags: Counter = None):
+    """
+    :param missing_tags: if provided, counts tags not found in conversion map (they're kept unconverted)
+    """
     converted_tokens = []
     id = starting_id
     for token in tokens:
@@ -49,8 +70,8 @@ def make_sentence(tokens: list, starting_id: int, conversion_map: dict):  # , ta
         if conversion_map:
             if tag in conversion_map:
                 tag = conversion_map[tag]
-            else:
-                print("Warning, tag {} not in conversion map".format(tag))
+            elif missing_tags is not None:
+                missing_tags[tag] += 1
         converted_token = make_token(id, token[0], tag)
         converted_tokens.append(converted_token)
         id += 1
@@ -73,6 +94,131 @@ def make_token(id: int, orth: str, tag: str):
     return token
 
 
+def report_missing_tags(missing_tags: Counter):
+    if missing_tags:
+        print("Warning, {} tags ({} tokens) not in conversion map: {}".format(
+            len(missing_tags), sum(missing_tags.values()), ", ".join(sorted(missing_tags))
+        ))
+
+
+def file_fingerprint(path: str) -> str:
+    stat = os.stat(path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def conversion_map_fingerprint(conversion_map_filepath: str) -> str:
+    if conversion_map_filepath is None:
+        return "none"
+    with open(conversion_map_filepath, "rb") as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+
+def shard_name(fileid: str) -> str:
+    return fileid.replace(os.sep, "__") + ".jsonl"
+
+
+_worker_conversion_map = None
+
+
+def _init_worker(conversion_map):
+    global _worker_conversion_map
+    _worker_conversion_map = conversion_map
+
+
+def convert_file_to_shard(task):
+    """
+    Converts a single corpus file to a shard with paragraphs of its document, runs in a worker process.
+    Document id isn't stored in shard (it's assigned when shards are merged), so shards don't depend on other files.
+    :return: file id and counts of its tags missing from conversion map
+    """
+    corpus_path, fileid, shard_path = task
+    corpus = NKJPCorpusReader(root=corpus_path, fileids=[fileid])
+    missing_tags = Counter()
+    document = make_document(0, corpus.tagged_paras(fileid), _worker_conversion_map, missing_tags)
+
+    # write to temporary file first, so that interrupted runs never leave half-written shards
+    tmp_path = shard_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(json.dumps(document["paragraphs"], ensure_ascii=False))
+        f.write("\n")
+    os.replace(tmp_path, shard_path)
+    return fileid, missing_tags
+
+
+def convert_to_shards(corpus_path, files, shards_dir, conversion_map, conversion_map_hash, jobs):
+    """
+    Converts each corpus file to its own shard, skipping files whose shards are up to date.
+    Shards are keyed by file id only, so adding or removing corpus files doesn't invalidate shards of other files.
+    :return: list of shard paths in document order
+    """
+    os.makedirs(shards_dir, exist_ok=True)
+    manifest_path = os.path.join(shards_dir, SHARDS_MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    else:
+        manifest = {}
+
+    shard_paths = []
+    fingerprints = {}
+    tasks = []
+    for fileid in files:
+        shard_path = os.path.join(shards_dir, shard_name(fileid))
+        shard_paths.append(shard_path)
+        fingerprint = "{}:{}".format(file_fingerprint(os.path.join(corpus_path, fileid)), conversion_map_hash)
+        fingerprints[fileid] = fingerprint
+        if manifest.get(fileid) != fingerprint or not os.path.exists(shard_path):
+            tasks.append((corpus_path, fileid, shard_path))
+
+    print(f"Converting {len(tasks)} of {len(files)} files ({len(files) - len(tasks)} shards up to date)...")
+    missing_tags = Counter()
+    if tasks:
+        with Pool(jobs, initializer=_init_worker, initargs=(conversion_map,)) as pool:
+            for fileid, file_missing_tags in pool.imap_unordered(convert_file_to_shard, tasks):
+                manifest[fileid] = fingerprints[fileid]
+                missing_tags.update(file_missing_tags)
+    report_missing_tags(missing_tags)
+
+    manifest = {fileid: manifest[fileid] for fileid in files if fileid in manifest}
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+
+    return shard_paths
+
+
+def merge_shards(shard_paths, output_path):
+    """
+    Writes documents from shards as a single spacy JSON list, holding one document in memory at a time.
+    Document ids are positions of shards in the list (sorted corpus file ids).
+    """
+    with open(output_path, "w") as result_file:
+        result_file.write("[\n")
+        index = 0
+        for shard_path in shard_paths:
+            with open(shard_path, "r") as shard:
+                for line in shard:
+                    line = line.rstrip("\n")
+                    if not line:
+                        continue
+                    if index > 0:
+                        result_file.write(",\n")
+                    result_file.write(f'{{"id": {index}, "paragraphs": {line}}}')
+                    index += 1
+        result_file.write("\n]\n")
+
+
+def convert_to_columnar(corpus, files, columnar_dir, conversion_map, jobs=1):
+    writer = ColumnarCorpusWriter()
+    for i, (_, paragraphs) in enumerate(corpus.iter_files_paras(jobs, files)):
+        writer.add_document(i, paragraphs)
+
+    columnar_corpus = writer.to_corpus()
+    if conversion_map:
+        columnar_corpus = columnar_corpus.remap_tags(conversion_map)
+    columnar_corpus.save(columnar_dir)
+    print(f"Saved {len(columnar_corpus)} documents, {columnar_corpus.n_tokens} tokens to {columnar_dir}")
+
+
 @click.command(help="Convert nkjp to spacy format")
 @click.argument(
     "input-dir", type=str, default="data/raw/NKJP_1.2_nltk"
@@ -83,9 +229,30 @@ def make_token(id: int, orth: str, tag: str):
 @click.option(
     "--conversion-map-filepath", type=str, default=None, help="If nor provided, uses full tags from input as classes"
 )
-def convert(input_dir, output_path, conversion_map_filepath):
+@click.option(
+    "--shards-dir", type=str, default=None,
+    help="If provided, converts files in parallel to per-file shards in this directory and reuses unchanged ones"
+)
+@click.option("-j", "--jobs", type=int, default=1, help="Number of worker processes reading corpus files")
+@click.option(
+    "--columnar-dir", type=str, default=None,
+    help="If provided, writes corpus in compact columnar format to this directory instead of JSON output"
+)
+@click.option(
+    "--metrics-path", type=str, default=None,
+    help="If provided, time and peak memory of conversion phases are saved to this JSON file"
+)
+def convert(input_dir, output_path, conversion_map_filepath, shards_dir, jobs, columnar_dir, metrics_path):
+    metrics = Metrics()
+    with metrics.phase("convert"):
+        convert_corpus(input_dir, output_path, conversion_map_filepath, shards_dir, jobs, columnar_dir, metrics)
+    if metrics_path is not None:
+        metrics.save(metrics_path)
+
+
+def convert_corpus(input_dir, output_path, conversion_map_filepath, shards_dir, jobs, columnar_dir, metrics: Metrics):
     corpus_path = os.path.abspath(input_dir)
-    corpus = nltk.corpus.reader.TaggedCorpusReader(root=corpus_path, fileids=".*")
+    corpus = NKJPCorpusReader(root=corpus_path, fileids=".*")
 
     if conversion_map_filepath is not None:
         with open(conversion_map_filepath, "r") as f:
@@ -94,15 +261,28 @@ def convert(input_dir, output_path, conversion_map_filepath):
         conversion_map = None
 
     files = corpus.fileids()
-    output = []
+    metrics.set("n_files", len(files))
 
-    for i, f in enumerate(files):
-        document = make_document(i, corpus.tagged_paras(f), conversion_map)
-        output.append(document)
+    if columnar_dir is not None:
+        with metrics.phase("convert/columnar"):
+            convert_to_columnar(corpus, files, columnar_dir, conversion_map, jobs)
+        return
 
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    with open(output_path, "w") as result_file:
-        json.dump(output, result_file, indent=4, ensure_ascii=False)
+
+    if shards_dir is not None:
+        conversion_map_hash = conversion_map_fingerprint(conversion_map_filepath)
+        with metrics.phase("convert/shards"):
+            shard_paths = convert_to_shards(corpus_path, files, shards_dir, conversion_map, conversion_map_hash, jobs)
+        with metrics.phase("convert/merge"):
+            merge_shards(shard_paths, output_path)
+        return
+
+    missing_tags = Counter()
+    with metrics.phase("convert/write"), DocumentWriter(output_path) as writer:
+        for i, (_, paragraphs) in enumerate(corpus.iter_files_paras(jobs, files)):
+            writer.write(make_document(i, paragraphs, conversion_map, missing_tags))
+    report_missing_tags(missing_tags)
 
 
 if __name__ == "__main__":
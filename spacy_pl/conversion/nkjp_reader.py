@@ -0,0 +1,107 @@
+"""
+Reader of NKJP corpus in nltk tagged format (files of "orth/tag" tokens separated by whitespace,
+one sentence per line, paragraphs separated by blank lines), giving the same results as
+nltk's TaggedCorpusReader (tags are uppercased, tokens without "/" get None tag).
+
+Files are read as bytes and split into lines and paragraphs without regular expressions, only sentence lines are
+decoded. Paragraphs are yielded lazily, and whole files can be parsed in worker processes.
+"""
+import os
+import re
+from functools import partial
+from multiprocessing import Pool
+
+SEPARATOR = "/"
+
+
+def find_fileids(root: str, regexp: str = r".*") -> list:
+    """Sorted paths (relative to root, "/"-separated) of files matching regexp, like nltk's find_corpus_fileids"""
+    pattern = re.compile(regexp + "$")
+    fileids = []
+    for dirname, subdirs, filenames in os.walk(root):
+        subdirs[:] = [subdir for subdir in subdirs if subdir != ".svn"]
+        relative = os.path.relpath(dirname, root)
+        prefix = "" if relative == "." else relative.replace(os.sep, "/") + "/"
+        fileids += [prefix + filename for filename in filenames if pattern.match(prefix + filename)]
+    return sorted(fileids)
+
+
+def parse_token(token: str) -> tuple:
+    orth, separator, tag = token.rpartition(SEPARATOR)
+    if not separator:
+        return token, None
+    return orth, tag.upper()
+
+
+def parse_sentence(line: bytes, encoding: str = "utf8") -> list:
+    return [parse_token(token) for token in line.decode(encoding).split()]
+
+
+def iter_paragraph_lines(data: bytes):
+    """Yields lists of non-blank lines of paragraphs"""
+    lines = []
+    for line in data.split(b"\n"):
+        if line.strip():
+            lines.append(line)
+        elif lines:
+            yield lines
+            lines = []
+    if lines:
+        yield lines
+
+
+def iter_tagged_paras(path: str, encoding: str = "utf8"):
+    """Yields paragraphs of the file: lists of sentences, each a list of (orth, tag) tuples"""
+    with open(path, "rb") as f:
+        data = f.read()
+    for lines in iter_paragraph_lines(data):
+        yield [parse_sentence(line, encoding) for line in lines]
+
+
+def read_tagged_paras(path: str, encoding: str = "utf8") -> list:
+    return list(iter_tagged_paras(path, encoding))
+
+
+class NKJPCorpusReader(object):
+    """Replacement of nltk.corpus.reader.TaggedCorpusReader for NKJP corpus"""
+
+    def __init__(self, root: str, fileids=r".*", encoding: str = "utf8"):
+        """:param fileids: regular expression or list of file ids"""
+        self.root = os.path.abspath(root)
+        self.encoding = encoding
+        self._fileids = find_fileids(self.root, fileids) if isinstance(fileids, str) else list(fileids)
+
+    def fileids(self) -> list:
+        return list(self._fileids)
+
+    def abspath(self, fileid: str) -> str:
+        return os.path.join(self.root, *fileid.split("/"))
+
+    def tagged_paras(self, fileid: str):
+        return iter_tagged_paras(self.abspath(fileid), self.encoding)
+
+    def tagged_sents(self, fileid: str):
+        for paragraph in self.tagged_paras(fileid):
+            yield from paragraph
+
+    def tagged_words(self, fileids=None):
+        for fileid in self._fileids if fileids is None else _as_list(fileids):
+            for sentence in self.tagged_sents(fileid):
+                yield from sentence
+
+    def iter_files_paras(self, jobs: int = 1, fileids=None):
+        """
+        Yields (fileid, list of paragraphs) of all files in order, files are parsed in `jobs` worker processes
+        """
+        fileids = self._fileids if fileids is None else _as_list(fileids)
+        if jobs <= 1:
+            for fileid in fileids:
+                yield fileid, list(self.tagged_paras(fileid))
+            return
+        with Pool(jobs) as pool:
+            paths = [self.abspath(fileid) for fileid in fileids]
+            yield from zip(fileids, pool.imap(partial(read_tagged_paras, encoding=self.encoding), paths))
+
+
+def _as_list(fileids) -> list:
+    return [fileids] if isinstance(fileids, str) else list(fileids)
@@ -0,0 +1,142 @@
+"""
+Lightweight instrumentation of long-running stages: wall time and peak RSS of named phases.
+
+On Linux peak RSS of a phase is sampled by a background thread reading current RSS from /proc/self/status
+(every 50 ms by default, a read takes microseconds, so it can be left on in production runs). Process-wide peak
+isn't reset, so phases (also nested ones) and other measurements in the same process don't interfere,
+but allocations shorter than the sampling interval may be missed. Elsewhere peak RSS is the peak since process start.
+"""
+import json
+import resource
+import sys
+import threading
+import time
+import typing as T
+from contextlib import contextmanager
+
+SAMPLING_INTERVAL = 0.05
+
+
+def current_rss_mb() -> T.Optional[float]:
+    """Resident set size of this process, None if it can't be read (outside Linux)"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb(children: bool = False) -> float:
+    """Peak resident set size of this process (or of the largest of its finished child processes)"""
+    if not children:
+        try:
+            with open("/proc/self/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+class RssSampler(object):
+    """
+    Peak RSS of this process while the block runs, eg.:
+
+        with RssSampler() as sampler:
+            ...
+        sampler.peak_mb
+    """
+
+    def __init__(self, interval: float = SAMPLING_INTERVAL):
+        self.interval = interval
+        self.peak_mb = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        rss = current_rss_mb()
+        if rss is not None:
+            self.peak_mb = max(self.peak_mb or 0.0, rss)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.sample()
+        if self.peak_mb is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self.sample()
+        else:
+            # RSS can't be sampled, peak since process start is the best estimate
+            self.peak_mb = peak_rss_mb()
+
+
+class Metrics(object):
+    """
+    Collects measurements of phases, eg.:
+
+        metrics = Metrics()
+        with metrics.phase("read"):
+            ...
+        metrics.save("metrics.json")
+    """
+
+    def __init__(self, verbose: bool = True):
+        """
+        :param verbose: if True, time and peak RSS of every phase are printed when it ends
+        """
+        self.verbose = verbose
+        self.phases = dict()
+        self.values = dict()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Measures wall time and peak RSS of the block, phases with the same name are summed up"""
+        sampler = RssSampler()
+        start = time.perf_counter()
+        try:
+            with sampler:
+                yield
+        finally:
+            self.add_phase(name, time.perf_counter() - start, sampler.peak_mb)
+
+    def add_phase(self, name: str, seconds: float, peak_rss: float = None):
+        """Records phase measured elsewhere (eg. training epochs reported by spacy)"""
+        measurement = self.phases.setdefault(name, {"seconds": 0.0, "peak_rss_mb": None, "calls": 0})
+        measurement["seconds"] += seconds
+        measurement["calls"] += 1
+        if peak_rss is not None:
+            measurement["peak_rss_mb"] = max(measurement["peak_rss_mb"] or 0.0, peak_rss)
+        if self.verbose:
+            rss = f", peak RSS {peak_rss:.0f} MB" if peak_rss is not None else ""
+            print(f"[{name}] {seconds:.2f}s{rss}")
+
+    def set(self, name: str, value):
+        """Records any other JSON-serializable value (eg. number of processed documents or per-epoch times)"""
+        self.values[name] = value
+
+    def to_dict(self) -> dict:
+        return {
+            "phases": self.phases,
+            "peak_rss_mb": peak_rss_mb(),
+            "peak_children_rss_mb": peak_rss_mb(children=True),
+            **self.values,
+        }
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=4)
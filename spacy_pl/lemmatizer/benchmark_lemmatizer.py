@@ -0,0 +1,80 @@
+"""
+Throughput micro-benchmark of PolishLemmatizer: lemmatizes tokens of a corpus in spacy JSON format (POS taken
+from their NKJP tags) using the suffix trie and using a linear scan over all rules of the POS,
+reports words per second of both and the fraction of tokens for which they agree.
+"""
+import time
+from itertools import islice
+
+import click
+
+from spacy_pl.lemmatizer.lemmatizer import PolishLemmatizer, NKJP_TO_POS
+from spacy_pl.training.documents import iter_documents
+
+
+def iter_tagged_words(path: str):
+    for document in iter_documents(path):
+        for paragraph in document["paragraphs"]:
+            for sentence in paragraph["sentences"]:
+                for token in sentence["tokens"]:
+                    yield token["orth"], NKJP_TO_POS.get(token["tag"].split(":")[0].lower())
+
+
+def collect_rules(node) -> list:
+    children, rules = node
+    collected = list(rules)
+    for child in children.values():
+        collected += collect_rules(child)
+    return collected
+
+
+def lemmatize_linear(lemmatizer: PolishLemmatizer, rules: dict, word: str, pos: str) -> str:
+    """
+    The same as lemmatizer.lemmatize, but checking every rule of the POS
+    :param rules: dict(<POS>: list(Rule)), sorted by descending length of the ending
+    """
+    word = word.lower()
+    if lemmatizer.is_lemma(word, pos):
+        return word
+    for rule in rules.get(pos, ()):
+        if word.endswith(rule.suffix):
+            lemma = rule.apply(word)
+            if lemma is not None and lemmatizer.is_lemma(lemma, pos):
+                return lemma
+    return word
+
+
+@click.command(help="Measure throughput of the lemmatizer")
+@click.argument("input-file", type=str, default="data/processed/pos/NKJP_justpos.json")
+@click.option("--rules-path", type=str, default="data/processed/lemmatizer/rules_pos.json")
+@click.option("--index-path", type=str, default="data/processed/lemmatizer/index_pos")
+@click.option("-n", "--n-words", type=int, default=100000)
+def benchmark_lemmatizer(input_file, rules_path, index_path, n_words):
+    print("Loading lemmatizer...")
+    start = time.time()
+    lemmatizer = PolishLemmatizer.from_files(rules_path, index_path)
+    print(f"Loaded in {time.time() - start:.2f}s")
+
+    words = list(islice(iter_tagged_words(input_file), n_words))
+    rules = {
+        pos: sorted(collect_rules(trie.root), key=lambda rule: -len(rule.suffix))
+        for pos, trie in lemmatizer.tries.items()
+    }
+
+    start = time.time()
+    trie_lemmas = [lemmatizer.lemmatize(word, pos) for word, pos in words]
+    trie_seconds = time.time() - start
+
+    start = time.time()
+    linear_lemmas = [lemmatize_linear(lemmatizer, rules, word, pos) for word, pos in words]
+    linear_seconds = time.time() - start
+
+    agreement = sum(a == b for a, b in zip(trie_lemmas, linear_lemmas)) / max(len(words), 1)
+    print(f"Words: {len(words)}")
+    print(f"Trie: {len(words) / max(trie_seconds, 1e-9):.0f} words/s")
+    print(f"Linear scan: {len(words) / max(linear_seconds, 1e-9):.0f} words/s")
+    print(f"Agreement: {agreement:.4f}")
+
+
+if __name__ == "__main__":
+    benchmark_lemmatizer()
@@ -1,37 +1,201 @@
+"""
+Builds index of words of ispell dictionary (polish.all) by their lemmatization rule flags. Dictionary is read
+line by line, every word is written once to a word table (one UTF-8 blob with offsets) as it's read and every flag
+(or any other group, see map_flags_to_pos) keeps a sorted int32 array of ids of its words. Arrays of all groups
+are concatenated in one file, so the whole index is loaded with memory-mapping. Word ids ordered by lowercased
+words are stored too (sorted using the written word table), so checking if a word belongs to a group
+is two binary searches.
+"""
 import json
+import os
+from array import array
 from collections import defaultdict
+from pathlib import Path
+
 import click
+import numpy as np
+
+from spacy_pl.instrumentation import Metrics
+from spacy_pl.lemmatizer.form_lookup import StringsWriter, write_strings, map_file
+
+NO_FLAG = "NO_FLAG"
+GROUPS_FILENAME = "groups.json"
+WORD_IDS_FILENAME = "word_ids.npy"
+LOWER_ORDER_FILENAME = "lower_order.npy"
 
 
 def make_flag_word_dict(splitted):
     words_dict = defaultdict(list)
     for word, flags in splitted:
-        for f in flags:
+        for f in split_flags(flags):
             words_dict[f].append(word)
     return words_dict
 
 
+def split_flags(flags: str) -> list:
+    return [flags] if flags == NO_FLAG else list(flags)
+
+
 def decode_and_split(lines):
     lines = [l.decode('iso-8859-2').strip() for l in lines]
-    splitted = [(l.split('/')) if '/' in l else (l, "NO_FLAG")
+    splitted = [(l.split('/')) if '/' in l else (l, NO_FLAG)
                 for l in lines]
     return splitted
 
 
+def iter_dictionary(path: str):
+    """Yields (word, flags) of polish.all, one line at a time"""
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield decode_and_split([line])[0]
+
+
+class WordTable(object):
+    """Memory-mapped word table (written with write_strings), indexed like a list of words"""
+
+    def __init__(self, path: Path):
+        self._words = map_file(path / "words.bin")
+        self.offsets = np.load(path / "words_offsets.npy", mmap_mode="r")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self._words[self.offsets[i]:self.offsets[i + 1]].decode("utf8")
+
+
+def lowercase_order(words) -> np.ndarray:
+    """Word ids sorted by UTF-8 encoded lowercased words"""
+    return np.array(sorted(range(len(words)), key=lambda i: words[i].lower().encode("utf8")), dtype=np.int32)
+
+
+def write_flag_index(path: str, words: list, groups: dict):
+    """
+    :param words: word table
+    :param groups: dict(<flag or other group>: array of word ids)
+    """
+    path = Path(path)
+    os.makedirs(path, exist_ok=True)
+    write_strings(path, "words", words)
+    write_groups(path, groups)
+
+
+def write_groups(path: Path, groups: dict):
+    """
+    Writes the rest of index to directory which already contains word table
+    :param groups: dict(<flag or other group>: array of word ids)
+    """
+    np.save(path / LOWER_ORDER_FILENAME, lowercase_order(WordTable(path)))
+
+    ranges = {}
+    start = 0
+    arrays = list()
+    for group in sorted(groups):
+        ids = np.sort(np.asarray(groups[group], dtype=np.int32))
+        arrays.append(ids)
+        ranges[group] = [start, start + len(ids)]
+        start += len(ids)
+    np.save(path / WORD_IDS_FILENAME, np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.int32))
+
+    with open(path / GROUPS_FILENAME, "w", encoding="utf-8") as f:
+        json.dump(ranges, f, ensure_ascii=False, indent=4, sort_keys=True)
+
+
+class FlagIndex(object):
+    """Loader of index written by write_flag_index"""
+
+    def __init__(self, path: str):
+        path = Path(path)
+        with open(path / GROUPS_FILENAME, "r", encoding="utf-8") as f:
+            self.ranges = json.load(f)
+        self._words = map_file(path / "words.bin")
+        self.word_offsets = np.load(path / "words_offsets.npy", mmap_mode="r")
+        self.all_word_ids = np.load(path / WORD_IDS_FILENAME, mmap_mode="r")
+        if (path / LOWER_ORDER_FILENAME).exists():
+            self.lower_order = np.load(path / LOWER_ORDER_FILENAME, mmap_mode="r")
+        else:
+            # index written before the order was stored
+            self.lower_order = lowercase_order(WordTable(path))
+
+    @property
+    def groups(self) -> list:
+        return list(self.ranges)
+
+    @property
+    def n_words(self) -> int:
+        return len(self.word_offsets) - 1
+
+    def word(self, i: int) -> str:
+        return self._words[self.word_offsets[i]:self.word_offsets[i + 1]].decode("utf8")
+
+    def word_table(self) -> list:
+        return [self.word(i) for i in range(self.n_words)]
+
+    def word_ids(self, group: str) -> np.ndarray:
+        start, end = self.ranges[group]
+        return self.all_word_ids[start:end]
+
+    def words(self, group: str) -> list:
+        return [self.word(i) for i in self.word_ids(group)]
+
+    def _lower_key(self, position: int) -> bytes:
+        return self.word(self.lower_order[position]).lower().encode("utf8")
+
+    def find(self, word: str) -> np.ndarray:
+        """Ids of words equal to the word when lowercased (eg. "kot" and "Kot")"""
+        key = word.lower().encode("utf8")
+        low, high = 0, self.n_words
+        while low < high:
+            middle = (low + high) // 2
+            if self._lower_key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        end = low
+        while end < self.n_words and self._lower_key(end) == key:
+            end += 1
+        return self.lower_order[low:end]
+
+    def contains(self, group: str, word: str) -> bool:
+        """Whether the word (case-insensitive) belongs to the group, without loading the index into memory"""
+        if group not in self.ranges:
+            return False
+        group_ids = self.word_ids(group)
+        for i in self.find(word):
+            position = np.searchsorted(group_ids, i)
+            if position < len(group_ids) and group_ids[position] == i:
+                return True
+        return False
+
+    def to_dict(self) -> dict:
+        """dict(<group>: list(<word>)), the same as old JSON index"""
+        return {group: self.words(group) for group in self.groups}
+
+
 @click.command()
 @click.argument('ispell_all', type=click.Path(exists=True))
 @click.argument('output', type=click.Path(exists=False))
-def main(ispell_all, output):
+@click.option('--metrics-path', type=str, default=None, help="If provided, time and peak memory are saved to this JSON file")
+def main(ispell_all, output, metrics_path):
     """Assigns lemmas to lemmatization rule flags"""
+    metrics = Metrics()
+    output = Path(output)
+    os.makedirs(output, exist_ok=True)
+    groups = defaultdict(lambda: array("i"))
+    with metrics.phase("read"):
+        words = StringsWriter(output, "words")
+        for word, flags in iter_dictionary(ispell_all):
+            for flag in split_flags(flags):
+                groups[flag].append(len(words))
+            words.write(word)
+        words.close()
+    metrics.set("n_words", len(words))
 
-    with open(ispell_all, "rb") as f:
-        lines = f.readlines()
-
-    splitted = decode_and_split(lines)
-    words_dict = make_flag_word_dict(splitted)
-
-    with open(output, "w") as f:
-        json.dump(words_dict, f, indent=4)
+    with metrics.phase("write"):
+        write_groups(output, groups)
+    if metrics_path is not None:
+        metrics.save(metrics_path)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,173 @@
+"""
+Compact, memory-mapped table of inflected form -> (lemma, POS) entries (see generate_lemma_lookup).
+Forms are stored sorted as one UTF-8 blob with an array of offsets, so a form is found with binary search
+in O(log n) comparisons, without loading millions of strings into Python objects.
+"""
+import json
+import mmap
+import os
+from array import array
+from pathlib import Path
+
+import numpy as np
+
+META_FILENAME = "meta.json"
+FORMS_FILENAME = "forms.bin"
+LEMMAS_FILENAME = "lemmas.bin"
+
+
+class StringsWriter(object):
+    """Writes strings one by one to blob <name>.bin, their offsets are saved to <name>_offsets.npy on close"""
+
+    def __init__(self, path: Path, name: str):
+        self.offsets_path = path / f"{name}_offsets.npy"
+        self.offsets = array("q", [0])
+        self._file = open(path / f"{name}.bin", "wb")
+
+    def write(self, string: str):
+        encoded = string.encode("utf8")
+        self._file.write(encoded)
+        self.offsets.append(self.offsets[-1] + len(encoded))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def close(self):
+        self._file.close()
+        np.save(self.offsets_path, np.frombuffer(self.offsets, dtype=np.int64))
+
+
+def write_strings(path: Path, name: str, strings):
+    """Writes strings as one blob <name>.bin and their offsets <name>_offsets.npy"""
+    writer = StringsWriter(path, name)
+    for string in strings:
+        writer.write(string)
+    writer.close()
+
+
+class FormLookupWriter(object):
+    """
+    Writes (form, lemma, pos) entries sorted by UTF-8 encoded form one at a time (repeated entries are skipped),
+    keeping only ids of lemmas and POS tags of entries in memory
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.n_entries = 0
+
+    def __enter__(self):
+        os.makedirs(self.path, exist_ok=True)
+        self._forms = StringsWriter(self.path, "forms")
+        self._lemma_ids = dict()
+        self._pos_ids = dict()
+        self._entry_offsets = array("q")
+        self._entry_lemmas = array("i")
+        self._entry_pos = array("b")
+        self._last_entry = None
+        return self
+
+    def write(self, form: str, lemma: str, pos: str):
+        entry = (form, lemma, pos)
+        if entry == self._last_entry:
+            return
+        if self._last_entry is None or self._last_entry[0] != form:
+            self._forms.write(form)
+            self._entry_offsets.append(self.n_entries)
+        # ids are assigned in order of first appearance
+        self._entry_lemmas.append(self._lemma_ids.setdefault(lemma, len(self._lemma_ids)))
+        self._entry_pos.append(self._pos_ids.setdefault(pos, len(self._pos_ids)))
+        self._last_entry = entry
+        self.n_entries += 1
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._forms.close()
+        self._entry_offsets.append(self.n_entries)
+        write_strings(self.path, "lemmas", self._lemma_ids)
+        np.save(self.path / "entry_offsets.npy", np.frombuffer(self._entry_offsets, dtype=np.int64))
+        np.save(self.path / "entry_lemmas.npy", np.frombuffer(self._entry_lemmas, dtype=np.int32))
+        np.save(self.path / "entry_pos.npy", np.frombuffer(self._entry_pos, dtype=np.int8))
+        with open(self.path / META_FILENAME, "w") as f:
+            json.dump({
+                "pos": list(self._pos_ids),
+                "n_forms": len(self._forms),
+                "n_lemmas": len(self._lemma_ids),
+                "n_entries": self.n_entries,
+            }, f, indent=4)
+
+
+def write_form_lookup(path: str, entries):
+    """
+    :param entries: (form, lemma, pos) tuples, sorted by UTF-8 encoded form
+    """
+    with FormLookupWriter(path) as writer:
+        for entry in entries:
+            writer.write(*entry)
+
+
+def map_file(path: Path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class FormLookup(object):
+
+    def __init__(self, path: str = "data/processed/lemmatizer/lemma_lookup"):
+        path = Path(path)
+        with open(path / META_FILENAME, "r") as f:
+            self.meta = json.load(f)
+        self.pos_tags = self.meta["pos"]
+        self.n_forms = self.meta["n_forms"]
+
+        self._forms = map_file(path / FORMS_FILENAME)
+        self._lemmas = map_file(path / LEMMAS_FILENAME)
+        self.form_offsets = np.load(path / "forms_offsets.npy", mmap_mode="r")
+        self.lemma_offsets = np.load(path / "lemmas_offsets.npy", mmap_mode="r")
+        self.entry_offsets = np.load(path / "entry_offsets.npy", mmap_mode="r")
+        self.entry_lemmas = np.load(path / "entry_lemmas.npy", mmap_mode="r")
+        self.entry_pos = np.load(path / "entry_pos.npy", mmap_mode="r")
+
+    def _form(self, i: int) -> bytes:
+        return self._forms[self.form_offsets[i]:self.form_offsets[i + 1]]
+
+    def _lemma(self, i: int) -> str:
+        return self._lemmas[self.lemma_offsets[i]:self.lemma_offsets[i + 1]].decode("utf8")
+
+    def find(self, form: str):
+        """:return: index of the form in the table or None"""
+        key = form.encode("utf8")
+        low, high = 0, self.n_forms
+        while low < high:
+            middle = (low + high) // 2
+            if self._form(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.n_forms and self._form(low) == key:
+            return low
+        return None
+
+    def lookup(self, form: str) -> list:
+        """:return: list of (lemma, pos) of the form, empty if form is unknown"""
+        i = self.find(form)
+        if i is None:
+            return []
+        return [
+            (self._lemma(self.entry_lemmas[j]), self.pos_tags[self.entry_pos[j]])
+            for j in range(self.entry_offsets[i], self.entry_offsets[i + 1])
+        ]
+
+    def lemmatize(self, form: str, pos: str = None):
+        """:return: lemma of the form with given POS (or of any POS if there is none), None for unknown forms"""
+        entries = self.lookup(form)
+        for lemma, entry_pos in entries:
+            if entry_pos == pos:
+                return lemma
+        return entries[0][0] if entries else None
+
+    def __contains__(self, form: str) -> bool:
+        return self.find(form) is not None
+
+    def __len__(self):
+        return self.n_forms
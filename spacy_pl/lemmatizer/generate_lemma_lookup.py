@@ -0,0 +1,126 @@
+"""
+Generates full inflected form -> (lemma, POS) lookup table: every word of ispell dictionary (polish.all)
+is inflected with suffix rules of all its flags (rules_ispell_flags.json), POS is assigned by flag
+(maps/flag_to_pos.py). Chunks of the dictionary are expanded in parallel into sorted runs of entries that are
+written to temporary files as workers return them, the runs are merged into memory-mapped format read by
+form_lookup.FormLookup one entry at a time.
+"""
+import heapq
+import json
+import os
+import tempfile
+from itertools import islice
+from multiprocessing import Pool
+
+import click
+
+from spacy_pl.instrumentation import Metrics
+from spacy_pl.lemmatizer.build_lemma_index import decode_and_split, split_flags
+from spacy_pl.lemmatizer.form_lookup import FormLookupWriter
+from spacy_pl.lemmatizer.lemmatizer import compile_rule
+from spacy_pl.lemmatizer.maps.flag_to_pos import MAP
+
+CHUNK_LINES = 10000
+UNKNOWN_POS = "X"
+
+
+def compile_flag_rules(rule_groups: dict) -> dict:
+    compiled = {}
+    for flag, rules in rule_groups.items():
+        compiled[flag] = [rule for rule in (compile_rule(w, l) for w, l in rules) if rule is not None]
+    return compiled
+
+
+def expand_word(word: str, flags: str, flag_rules: dict):
+    """Yields (form, lemma, pos) of all forms generated from the word by rules of its flags"""
+    lowered = word.lower()
+    pos_tags = set()
+    for flag in split_flags(flags):
+        pos = MAP.get(flag)
+        if pos is None:
+            continue
+        pos_tags.add(pos)
+        for rule in flag_rules.get(flag, ()):
+            form = rule.inflect(lowered)
+            if form:
+                yield form, word, pos
+    for pos in pos_tags or (UNKNOWN_POS,):
+        yield lowered, word, pos
+
+
+def entry_key(entry: tuple):
+    """Order of entries in lookup table - by UTF-8 encoded form"""
+    form, lemma, pos = entry
+    return form.encode("utf8"), lemma, pos
+
+
+_worker_flag_rules = None
+
+
+def _init_worker(flag_rules):
+    global _worker_flag_rules
+    _worker_flag_rules = flag_rules
+
+
+def expand_lines(lines: list) -> list:
+    """:return: sorted unique entries of all words in lines"""
+    entries = set()
+    for word, flags in decode_and_split(lines):
+        entries.update(expand_word(word, flags, _worker_flag_rules))
+    return sorted(entries, key=entry_key)
+
+
+def write_run(path: str, entries: list):
+    with open(path, "w", encoding="utf8") as f:
+        for entry in entries:
+            f.write("\t".join(entry))
+            f.write("\n")
+
+
+def read_run(path: str):
+    with open(path, "r", encoding="utf8") as f:
+        for line in f:
+            yield tuple(line.rstrip("\n").split("\t"))
+
+
+def iter_chunks(path: str, chunk_lines: int = CHUNK_LINES):
+    with open(path, "rb") as f:
+        while True:
+            lines = [line for line in islice(f, chunk_lines) if line.strip()]
+            if not lines:
+                break
+            yield lines
+
+
+@click.command(help="Generate inflected form -> lemma lookup table from ispell dictionary and rules")
+@click.option("--ispell-all", type=str, default="data/raw/ispell_rules/polish.all")
+@click.option("--rules-path", type=str, default="data/processed/lemmatizer/rules_ispell_flags.json")
+@click.option("--output-dir", type=str, default="data/processed/lemmatizer/lemma_lookup")
+@click.option("-j", "--jobs", type=int, default=1)
+@click.option("--metrics-path", type=str, default=None, help="If provided, time and peak memory are saved to this JSON file")
+def generate_lemma_lookup(ispell_all, rules_path, output_dir, jobs, metrics_path):
+    metrics = Metrics()
+    with open(rules_path, "r", encoding="utf-8") as f:
+        flag_rules = compile_flag_rules(json.load(f))
+
+    with tempfile.TemporaryDirectory(prefix="lemma_lookup_runs") as runs_dir:
+        print("Expanding dictionary...")
+        run_paths = []
+        with metrics.phase("expand"), Pool(jobs, initializer=_init_worker, initargs=(flag_rules,)) as pool:
+            for chunk_entries in pool.imap_unordered(expand_lines, iter_chunks(ispell_all)):
+                run_paths.append(os.path.join(runs_dir, f"run{len(run_paths)}.tsv"))
+                write_run(run_paths[-1], chunk_entries)
+
+        print(f"Merging {len(run_paths)} runs...")
+        with metrics.phase("write"), FormLookupWriter(output_dir) as writer:
+            # the same entry can come from more chunks, writer skips repeated entries
+            for entry in heapq.merge(*(read_run(path) for path in run_paths), key=entry_key):
+                writer.write(*entry)
+    print(f"Saved {writer.n_entries} entries")
+    metrics.set("n_entries", writer.n_entries)
+    if metrics_path is not None:
+        metrics.save(metrics_path)
+
+
+if __name__ == "__main__":
+    generate_lemma_lookup()
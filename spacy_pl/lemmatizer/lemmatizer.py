@@ -0,0 +1,239 @@
+"""
+Polish lemmatizer spacy component, using ispell suffix rules and lemma index mapped to POS
+(outputs of map_lemmatizer_rules_to_pos and map_lemmatizer_index_to_pos steps).
+
+Every rule [word_suffix, lemma_suffix] (see convert_ispell_to_json_rules.get_rule) is compiled into
+a literal word ending, a condition on preceding characters and a lemma ending. Rules of each POS are stored
+in a trie of reversed word endings, so finding all rules matching a word costs O(word length)
+instead of checking every rule. Candidate lemmas are accepted only if they are in the lemma index
+(queried in place if it's a memory-mapped index, see build_lemma_index). If precompiled form lookup
+(generate_lemma_lookup) is given, known forms are lemmatized with a single lookup and rules are used only
+for forms missing from it. Lemmas are always lowercase, whichever way they were found.
+"""
+import json
+import os
+import typing as T
+from dataclasses import dataclass
+
+from spacy_pl.lemmatizer.build_lemma_index import FlagIndex
+from spacy_pl.lemmatizer.form_lookup import FormLookup
+
+NKJP_TO_POS = {
+    "subst": "NOUN",
+    "depr": "NOUN",
+    "ger": "NOUN",
+    "fin": "VERB",
+    "bedzie": "VERB",
+    "praet": "VERB",
+    "impt": "VERB",
+    "imps": "VERB",
+    "inf": "VERB",
+    "pcon": "VERB",
+    "pant": "VERB",
+    "pact": "VERB",
+    "ppas": "VERB",
+    "winien": "VERB",
+    "adj": "ADJ",
+    "adja": "ADJ",
+    "adjp": "ADJ",
+    "adjc": "ADJ",
+}
+
+ANY_CHAR = (frozenset(), True)
+
+
+def parse_pattern(pattern: str) -> list:
+    """
+    Splits ispell suffix pattern into elements, every element is a pair (set of characters, negated),
+    eg. "[^ą]a" -> [({"ą"}, True), ({"a"}, False)]
+    """
+    elements = []
+    i = 0
+    while i < len(pattern):
+        if pattern[i] == "[":
+            end = pattern.index("]", i)
+            chars = pattern[i + 1:end]
+            negated = chars.startswith("^")
+            elements.append((frozenset(chars[1:] if negated else chars), negated))
+            i = end + 1
+        elif pattern[i] == ".":
+            elements.append(ANY_CHAR)
+            i += 1
+        else:
+            elements.append((frozenset(pattern[i]), False))
+            i += 1
+    return elements
+
+
+def is_literal(element) -> bool:
+    chars, negated = element
+    return not negated and len(chars) == 1
+
+
+def element_matches(element, char: str) -> bool:
+    chars, negated = element
+    return (char in chars) != negated
+
+
+@dataclass
+class Rule(object):
+    suffix: str  # literal ending of the inflected word, replaced by lemma_suffix
+    condition: tuple  # pattern elements that characters before the suffix have to match
+    lemma_suffix: str
+
+    def condition_matches(self, stem: str) -> bool:
+        if len(stem) < len(self.condition):
+            return False
+        offset = len(stem) - len(self.condition)
+        return all(element_matches(element, stem[offset + i]) for i, element in enumerate(self.condition))
+
+    def apply(self, word: str):
+        """:return: lemma candidate or None if condition doesn't match"""
+        stem = word[:len(word) - len(self.suffix)]
+        if not self.condition_matches(stem):
+            return None
+        lemma = stem + self.lemma_suffix
+        return lemma if lemma else None
+
+    def inflect(self, lemma: str):
+        """Reverse of apply: :return: inflected form or None if the rule doesn't apply to the lemma"""
+        if not lemma.endswith(self.lemma_suffix):
+            return None
+        stem = lemma[:len(lemma) - len(self.lemma_suffix)]
+        if not self.condition_matches(stem):
+            return None
+        return stem + self.suffix
+
+
+def compile_rule(word_pattern: str, lemma_pattern: str):
+    """
+    :return: Rule, or None if the part in which word and lemma differ is not literal
+    """
+    # "-" stands for empty ending in ispell rules
+    word_elements = parse_pattern(word_pattern.lower().replace("-", ""))
+    lemma_elements = parse_pattern(lemma_pattern.lower().replace("-", ""))
+
+    common = 0
+    while common < min(len(word_elements), len(lemma_elements)) \
+            and word_elements[common] == lemma_elements[common]:
+        common += 1
+
+    word_rest, lemma_rest = word_elements[common:], lemma_elements[common:]
+    if not all(is_literal(e) for e in word_rest + lemma_rest):
+        return None
+    return Rule(
+        suffix="".join(next(iter(chars)) for chars, _ in word_rest),
+        condition=tuple(word_elements[:common]),
+        lemma_suffix="".join(next(iter(chars)) for chars, _ in lemma_rest),
+    )
+
+
+class SuffixTrie(object):
+    """Trie of reversed word endings, every node keeps rules with the ending leading to it"""
+
+    def __init__(self):
+        self.root = ({}, [])
+
+    def add(self, rule: Rule):
+        node = self.root
+        for char in reversed(rule.suffix):
+            node = node[0].setdefault(char, ({}, []))
+        node[1].append(rule)
+
+    def matches(self, word: str):
+        """Yields rules whose ending matches the end of the word, longest endings first"""
+        node = self.root
+        found = [node[1]]
+        for char in reversed(word):
+            node = node[0].get(char)
+            if node is None:
+                break
+            found.append(node[1])
+        for rules in reversed(found):
+            yield from rules
+
+
+def build_trie(rules: list) -> SuffixTrie:
+    trie = SuffixTrie()
+    seen = set()
+    for word_pattern, lemma_pattern in rules:
+        rule = compile_rule(word_pattern, lemma_pattern)
+        if rule is None:
+            continue
+        key = (rule.suffix, rule.condition, rule.lemma_suffix)
+        if key not in seen:
+            seen.add(key)
+            trie.add(rule)
+    return trie
+
+
+class PolishLemmatizer(object):
+    """Spacy pipeline component setting token.lemma_, should be added after tagger"""
+    name = "pl_lemmatizer"
+
+    def __init__(self, rules: dict, index: T.Union[dict, FlagIndex], lookup: FormLookup = None):
+        """
+        :param rules: dict(<POS>: list([word_suffix, lemma_suffix]))
+        :param index: dict(<POS>: list(<lemma>)) or index with POS groups (see build_lemma_index)
+        :param lookup: optional precompiled form -> lemma table, consulted before rules
+        """
+        self.tries = {pos: build_trie(pos_rules) for pos, pos_rules in rules.items()}
+        if isinstance(index, FlagIndex):
+            self.index = index
+        else:
+            self.index = {pos: set(word.lower() for word in words) for pos, words in index.items()}
+        self.lookup = lookup
+
+    @classmethod
+    def from_files(cls, rules_path: str = "data/processed/lemmatizer/rules_pos.json",
+                   index_path: str = "data/processed/lemmatizer/index_pos", lookup_path: str = None):
+        """:param index_path: directory with index (see build_lemma_index) or JSON file"""
+        with open(rules_path, "r", encoding="utf-8") as f:
+            rules = json.load(f)
+        if os.path.isdir(index_path):
+            index = FlagIndex(index_path)
+        else:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        lookup = FormLookup(lookup_path) if lookup_path is not None else None
+        return cls(rules, index, lookup)
+
+    def candidates(self, word: str, pos: str):
+        trie = self.tries.get(pos)
+        if trie is None:
+            return
+        for rule in trie.matches(word):
+            lemma = rule.apply(word)
+            if lemma is not None:
+                yield lemma
+
+    def is_lemma(self, word: str, pos: str) -> bool:
+        """Whether lowercase word is in the lemma index of the POS"""
+        if isinstance(self.index, FlagIndex):
+            return self.index.contains(pos, word)
+        return word in self.index.get(pos, ())
+
+    def lemmatize(self, word: str, pos: str) -> str:
+        """:return: first candidate found in the lemma index, lowercased word if there is none"""
+        word = word.lower()
+        if self.lookup is not None:
+            lemma = self.lookup.lemmatize(word, pos)
+            if lemma is not None:
+                # lookup keeps lemmas as in the dictionary (eg. proper nouns), rules give lowercase ones
+                return lemma.lower()
+        if self.is_lemma(word, pos):
+            return word
+        for lemma in self.candidates(word, pos):
+            if self.is_lemma(lemma, pos):
+                return lemma
+        return word
+
+    def token_pos(self, token):
+        if token.pos_ in self.tries:
+            return token.pos_
+        return NKJP_TO_POS.get(token.tag_.split(":")[0].lower())
+
+    def __call__(self, doc):
+        for token in doc:
+            token.lemma_ = self.lemmatize(token.text, self.token_pos(token))
+        return doc
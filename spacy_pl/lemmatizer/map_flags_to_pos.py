@@ -1,26 +1,64 @@
+import os
+from collections import defaultdict
+
 import click
 import json
-from maps.flag_to_pos import MAP
+import numpy as np
 
+from spacy_pl.lemmatizer.build_lemma_index import FlagIndex, write_flag_index
+from spacy_pl.lemmatizer.maps.flag_to_pos import MAP
 
-@click.command()
-@click.argument('input_file', type=click.Path(exists=True))
-@click.argument('output_file', type=click.Path(exists=False))
-def main(input_file, output_file):
-    with open(input_file, "r") as f:
-        dict_to_convert = json.load(f)
 
-    result_dict = {}
-    for flag, value in dict_to_convert.items():
+def group_flags_by_pos(flags):
+    flags_by_pos = defaultdict(list)
+    for flag in flags:
         try:
-            pos = MAP[flag]
-            result_dict[pos] = value
+            flags_by_pos[MAP[flag]].append(flag)
         except KeyError:
             print(f"No mapping for flag {flag}")
+    return flags_by_pos
+
+
+def map_rules(input_file, output_file):
+    """Rules of all flags mapped to the same POS are merged, keeping their order and dropping duplicates"""
+    with open(input_file, "r") as f:
+        dict_to_convert = json.load(f)
+
+    result_dict = {}
+    for pos, flags in group_flags_by_pos(dict_to_convert).items():
+        merged = []
+        seen = set()
+        for flag in flags:
+            for rule in dict_to_convert[flag]:
+                if tuple(rule) not in seen:
+                    seen.add(tuple(rule))
+                    merged.append(rule)
+        result_dict[pos] = merged
 
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(result_dict, f, indent=4)
 
 
+def map_index(input_dir, output_dir):
+    """Word ids of all flags mapped to the same POS are merged, word table is kept"""
+    index = FlagIndex(input_dir)
+    groups = {
+        pos: np.unique(np.concatenate([index.word_ids(flag) for flag in flags]))
+        for pos, flags in group_flags_by_pos(index.groups).items()
+    }
+    write_flag_index(output_dir, index.word_table(), groups)
+
+
+@click.command()
+@click.argument('input_file', type=click.Path(exists=True))
+@click.argument('output_file', type=click.Path(exists=False))
+def main(input_file, output_file):
+    """Maps ispell flags of rules (JSON file) or of lemma index (directory, see build_lemma_index) to POS"""
+    if os.path.isdir(input_file):
+        map_index(input_file, output_file)
+    else:
+        map_rules(input_file, output_file)
+
+
 if __name__ == '__main__':
     main()
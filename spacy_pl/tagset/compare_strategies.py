@@ -0,0 +1,85 @@
+"""
+Evaluates many tagset strategies at once on cached tag statistics of NKJP corpus (see corpus_statistics):
+for every strategy computes its conversion map, cardinalities of the new tags and class balance statistics
+(number of classes, entropy, share of the most frequent class, number of rare classes).
+"""
+import json
+import math
+import os
+
+import click
+import numpy as np
+import pandas as pd
+
+from spacy_pl.tagset.corpus_statistics import load_tag_statistics, CORPUS_PATH, CACHE_DIR
+from spacy_pl.tagset.generate_tagset_and_conversion_map import prepare_structured_data
+from spacy_pl.tagset.strategies import Strategy, STRATEGIES
+
+
+def tagset_cardinalities(transitional_tagset: dict) -> dict:
+    return {
+        Strategy.make_full_tag(pos, subclass['tags']): subclass['card']
+        for pos, subclasses in transitional_tagset.items() for subclass in subclasses
+    }
+
+
+def balance_statistics(cardinalities: dict, min_card: int = 100) -> dict:
+    cards = np.array(sorted(cardinalities.values(), reverse=True), dtype=np.float64)
+    n_tokens = cards.sum()
+    probs = cards / max(n_tokens, 1)
+    entropy = float(-(probs * np.log2(probs, where=probs > 0, out=np.zeros_like(probs))).sum())
+    return {
+        "n_classes": len(cards),
+        "n_tokens": int(n_tokens),
+        "entropy": entropy,
+        "normalized_entropy": entropy / math.log2(len(cards)) if len(cards) > 1 else 1.0,
+        "majority_fraction": float(probs[0]) if len(cards) else 0.0,
+        "median_card": float(np.median(cards)) if len(cards) else 0.0,
+        "min_card": int(cards[-1]) if len(cards) else 0,
+        f"n_classes_below_{min_card}": int((cards < min_card).sum()),
+    }
+
+
+def evaluate_strategies(structured_data: dict, strategies: dict, min_card: int = 100) -> dict:
+    """
+    :param strategies: dict(<name>: Strategy)
+    :return: dict(<name>: dict(conversion_map, cardinalities, balance))
+    """
+    results = {}
+    for name, strategy in strategies.items():
+        conversion_map, transitional_tagset = strategy.prepare_conversion(structured_data)
+        cardinalities = tagset_cardinalities(transitional_tagset)
+        results[name] = {
+            "conversion_map": conversion_map,
+            "cardinalities": cardinalities,
+            "balance": balance_statistics(cardinalities, min_card),
+        }
+    return results
+
+
+@click.command(help="Compare tagsets created by many strategies")
+@click.option("--output-dir", type=str, default="data/processed/tagset_strategies")
+@click.option(
+    "--strategy", type=click.Choice(list(STRATEGIES)), multiple=True, default=list(STRATEGIES),
+    help="Strategies to evaluate, can be given multiple times (all by default)"
+)
+@click.option("--min-card", type=int, default=100, help="Classes with less tokens are counted as rare")
+@click.option("--statistics-dir", type=str, default=CACHE_DIR, help="Cache of corpus tag counts")
+@click.option("-j", "--jobs", type=int, default=1)
+def compare_strategies(output_dir, strategy, min_card, statistics_dir, jobs):
+    statistics = load_tag_statistics(CORPUS_PATH, statistics_dir, jobs=jobs, read_only=True)
+    structured_data, _ = prepare_structured_data(statistics)
+    results = evaluate_strategies(structured_data, {name: STRATEGIES[name] for name in strategy}, min_card)
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "strategies.json"), "w") as f:
+        json.dump(results, f, indent=4, sort_keys=True, ensure_ascii=False)
+
+    summary_df = pd.DataFrame({name: result["balance"] for name, result in results.items()}).T
+    summary_df.to_csv(os.path.join(output_dir, "summary.csv"))
+    with pd.option_context("display.max_rows", 100, "display.max_columns", 20):
+        print(summary_df.sort_values("n_classes"))
+
+
+if __name__ == "__main__":
+    compare_strategies()
@@ -0,0 +1,205 @@
+"""
+Counts tags (and optionally tag x word pairs) of NKJP corpus in one pass, files are processed in parallel.
+Counts are cached as a small JSON table named by content hash of the corpus (of paths relative to its root and
+contents of its files), so stages that need them (eg. tagset generation) read the cache instead of scanning
+the corpus again, as long as corpus files don't change. Only generate_corpus_statistics writes to the statistics
+directory (a DVC output), other stages just read it.
+Content hashes of files are kept in a local cache outside DVC outputs (HASH_CACHE_DIR, one file per corpus root,
+keyed by paths relative to the root) with size and modification time they were hashed with, so files are read
+(and worker processes started) only if they changed or counts aren't cached yet.
+"""
+import hashlib
+import json
+import os
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from dataclasses import dataclass
+from multiprocessing import Pool
+
+import click
+
+from spacy_pl.conversion.nkjp_reader import NKJPCorpusReader, find_fileids
+
+CORPUS_PATH = os.path.abspath("./data/raw/NKJP_1.2_nltk/")
+CACHE_DIR = "data/processed/corpus_statistics"
+HASH_CACHE_DIR = ".cache/corpus_statistics"
+HASH_BLOCK_SIZE = 1 << 20
+
+
+@dataclass
+class TagStatistics(object):
+    corpus_hash: str
+    tag_counts: dict
+    tag_word_counts: dict = None  # dict(<tag>: dict(<word>: count)), if counted
+
+    @property
+    def tags(self) -> set:
+        return set(self.tag_counts)
+
+    def most_common(self) -> list:
+        """list((tag, count)) sorted by descending count, like nltk.FreqDist.most_common"""
+        # ties are broken by tag, so the order doesn't depend on order of counting
+        return sorted(self.tag_counts.items(), key=lambda item: (-item[1], item[0]))
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "corpus_hash": self.corpus_hash,
+                "tag_counts": self.tag_counts,
+                "tag_word_counts": self.tag_word_counts,
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(**json.load(f))
+
+
+def corpus_files(corpus_path: str) -> list:
+    return find_fileids(corpus_path, r".*")
+
+
+def file_hash(path: str) -> str:
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+def file_stat(path: str) -> list:
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def file_hashes_path(hash_cache_dir: str, corpus_path: str) -> str:
+    root_hash = hashlib.md5(os.path.abspath(corpus_path).encode("utf8")).hexdigest()
+    return os.path.join(hash_cache_dir, f"file_hashes_{root_hash}.json")
+
+
+def load_file_hashes(hash_cache_dir: str, corpus_path: str) -> dict:
+    """dict(<path relative to corpus root>: [size, mtime_ns, md5]) of files of the corpus hashed before"""
+    path = file_hashes_path(hash_cache_dir, corpus_path)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_file_hashes(hash_cache_dir: str, corpus_path: str, file_hashes: dict):
+    os.makedirs(hash_cache_dir, exist_ok=True)
+    path = file_hashes_path(hash_cache_dir, corpus_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(file_hashes, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def changed_files(corpus_path: str, files: list, file_hashes: dict) -> list:
+    """Files whose size or modification time differ from the ones they were hashed with"""
+    return [
+        fileid for fileid in files
+        if file_hashes.get(fileid, [None, None])[:2] != file_stat(os.path.join(corpus_path, fileid))
+    ]
+
+
+def corpus_hash(files: list, file_hashes: dict) -> str:
+    """Hash of names and contents of all corpus files (all files have to be in file_hashes)"""
+    md5 = hashlib.md5()
+    for fileid in files:
+        md5.update(f"{fileid}:{file_hashes[fileid][2]}\n".encode("utf8"))
+    return md5.hexdigest()
+
+
+def count_file(task):
+    """Counts tags (and tag x word pairs) of one corpus file, runs in a worker process"""
+    corpus_path, fileid, with_words = task
+    corpus = NKJPCorpusReader(root=corpus_path, fileids=[fileid])
+    tag_counts = Counter()
+    tag_word_counts = Counter()
+    for word, tag in corpus.tagged_words(fileid):
+        if tag is None:
+            continue
+        tag_counts[tag] += 1
+        if with_words:
+            tag_word_counts[(tag, word)] += 1
+    return tag_counts, tag_word_counts
+
+
+def count_tags(corpus_path: str, files: list, with_words: bool, pool) -> tuple:
+    tag_counts = Counter()
+    tag_word_counts = Counter()
+    tasks = [(corpus_path, fileid, with_words) for fileid in files]
+    # counts are merged in file order, so the order of tags (and of ties in most_common) is the same in every run
+    for file_tag_counts, file_tag_word_counts in pool.imap(count_file, tasks):
+        tag_counts.update(file_tag_counts)
+        tag_word_counts.update(file_tag_word_counts)
+
+    if not with_words:
+        return dict(tag_counts), None
+    nested = defaultdict(dict)
+    for (tag, word), count in tag_word_counts.items():
+        nested[tag][word] = count
+    return dict(tag_counts), dict(nested)
+
+
+def cache_path(cache_dir: str, hash_: str, with_words: bool) -> str:
+    return os.path.join(cache_dir, f"{hash_}{'_words' if with_words else ''}.json")
+
+
+def load_tag_statistics(corpus_path: str = CORPUS_PATH, cache_dir: str = CACHE_DIR, with_words: bool = False,
+                        jobs: int = 1, read_only: bool = False,
+                        hash_cache_dir: str = HASH_CACHE_DIR) -> TagStatistics:
+    """
+    Reads tag statistics of the corpus from cache, counting them (and filling the cache) if corpus changed
+    :param with_words: count also tag x word pairs
+    :param read_only: don't write counted statistics to cache_dir (for stages which only depend on it)
+    :param hash_cache_dir: local cache of content hashes of corpus files
+    """
+    files = corpus_files(corpus_path)
+    file_hashes = load_file_hashes(hash_cache_dir, corpus_path)
+    changed = changed_files(corpus_path, files, file_hashes)
+
+    with ExitStack() as stack:
+        pool = None
+        if changed:
+            print(f"Hashing {len(changed)} new or changed files...")
+            pool = stack.enter_context(Pool(jobs))
+            paths = [os.path.join(corpus_path, fileid) for fileid in changed]
+            for fileid, path, hash_ in zip(changed, paths, pool.map(file_hash, paths)):
+                file_hashes[fileid] = file_stat(path) + [hash_]
+            # entries of files removed from the corpus are dropped
+            save_file_hashes(hash_cache_dir, corpus_path, {fileid: file_hashes[fileid] for fileid in files})
+
+        hash_ = corpus_hash(files, file_hashes)
+        paths = [cache_path(cache_dir, hash_, True)] + ([] if with_words else [cache_path(cache_dir, hash_, False)])
+        for path in paths:
+            if os.path.exists(path):
+                return TagStatistics.load(path)
+
+        print(f"Counting tags in {len(files)} files...")
+        if pool is None:
+            pool = stack.enter_context(Pool(jobs))
+        tag_counts, tag_word_counts = count_tags(corpus_path, files, with_words, pool)
+
+    statistics = TagStatistics(hash_, tag_counts, tag_word_counts)
+    if read_only:
+        print(f"Statistics aren't cached in {cache_dir}, run generate_corpus_statistics to cache them")
+    else:
+        os.makedirs(cache_dir, exist_ok=True)
+        statistics.save(cache_path(cache_dir, hash_, with_words))
+    return statistics
+
+
+@click.command(help="Count tags of NKJP corpus and cache the counts")
+@click.argument("corpus-path", type=str, default=CORPUS_PATH)
+@click.argument("cache-dir", type=str, default=CACHE_DIR)
+@click.option("--with-words", is_flag=True, help="Count also tag x word pairs")
+@click.option("-j", "--jobs", type=int, default=1)
+def generate_corpus_statistics(corpus_path, cache_dir, with_words, jobs):
+    statistics = load_tag_statistics(os.path.abspath(corpus_path), cache_dir, with_words, jobs)
+    print(f"{len(statistics.tag_counts)} tags, {sum(statistics.tag_counts.values())} tokens")
+
+
+if __name__ == "__main__":
+    generate_corpus_statistics()
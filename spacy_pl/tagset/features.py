@@ -0,0 +1,54 @@
+"""
+Parsing NKJP tags (eg. "SUBST:SG:NOM:M1") into structured features: flexeme (POS) and values
+of grammatical categories, found by value since every value of NKJP tagset belongs to one category.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+
+CATEGORIES = {
+    "number": ("sg", "pl"),
+    "case": ("nom", "gen", "dat", "acc", "inst", "loc", "voc"),
+    "gender": ("m1", "m2", "m3", "f", "n"),
+    "person": ("pri", "sec", "ter"),
+    "degree": ("pos", "com", "sup"),
+    "aspect": ("imperf", "perf"),
+    "negation": ("aff", "neg"),
+    "accentability": ("akc", "nakc"),
+    "post_prepositionality": ("praep", "npraep"),
+    "accommodability": ("congr", "rec"),
+    "agglutination": ("agl", "nagl"),
+    "vocalicity": ("wok", "nwok"),
+    "fullstoppedness": ("pun", "npun"),
+}
+
+VALUE_TO_CATEGORY = {value: category for category, values in CATEGORIES.items() for value in values}
+
+
+@dataclass(frozen=True)
+class TagFeatures(object):
+    pos: str
+    features: tuple  # ((<category>, <value>), ...) in order of the tag
+    unknown: tuple = ()  # values that don't belong to any known category
+
+    def get(self, category: str):
+        for feature_category, value in self.features:
+            if feature_category == category:
+                return value
+        return None
+
+
+@lru_cache(maxsize=None)
+def parse_tag(tag: str) -> TagFeatures:
+    """
+    Values keep case of the tag, alternative values (eg. "m1.m2") are assigned to the category of the first one
+    """
+    pos, *values = tag.split(":")
+    features = []
+    unknown = []
+    for value in values:
+        category = VALUE_TO_CATEGORY.get(value.split(".")[0].lower())
+        if category is None:
+            unknown.append(value)
+        else:
+            features.append((category, value))
+    return TagFeatures(pos, tuple(features), tuple(unknown))
@@ -4,12 +4,9 @@ import json
 from collections import defaultdict
 
 import click
-import nltk
 
-from spacy_pl.tagset.strategies import JustPOS
-
-
-CORPUS_PATH = os.path.abspath("./data/raw/NKJP_1.2_nltk/")
+from spacy_pl.tagset.corpus_statistics import load_tag_statistics, TagStatistics, CORPUS_PATH, CACHE_DIR
+from spacy_pl.tagset.strategies import Strategy, STRATEGIES
 
 
 def assert_empty(set, message):
@@ -18,12 +15,8 @@ def assert_empty(set, message):
         raise AssertionError(message)
 
 
-def prepare_structured_data():
-    corpus = nltk.corpus.reader.TaggedCorpusReader(root=CORPUS_PATH, fileids=r".*")
-    tags = [x[1] for x in corpus.tagged_words()]
-    fqd = nltk.FreqDist(tags)
-
-    sets = fqd.most_common()
+def prepare_structured_data(statistics: TagStatistics):
+    sets = statistics.most_common()
     sets = [(s[0].split(':'), s[1]) for s in sets]
     sets = [(s[0][0], s[0][1:], s[1]) for s in sets]
     # now sets is list((main tag, [other tags], cardinality))
@@ -40,25 +33,11 @@ def prepare_structured_data():
         flexeme_data = dict(tags=s[1], card=s[2])
         structured_data[flexeme] += [flexeme_data]
 
-    return structured_data, set(tags)
+    return structured_data, statistics.tags
 
 
-@click.command(help='Generate tagset and mapping from nkjp to the created tagset')
-@click.option("--tagset-filepath", type=str, default="./data/processed/tagset/justpos.json")
-@click.option("--conversion-map-filepath", type=str, default="./data/processed/tagset/nkjp2justpos.json")
-@click.option("--strategy", type=str, default="justpos")
-def generate_tagset_and_conversion(
-        tagset_filepath,
-        conversion_map_filepath,
-        strategy
-):
-    structured_data, original_nkjp_tags = prepare_structured_data()
-
-    if strategy == 'justpos':
-        strategy_obj = JustPOS()
-    else:
-        raise ValueError(f"Strategy {strategy} does not exist")
-
+def write_tagset_and_conversion(strategy_obj, structured_data, original_nkjp_tags, tagset_filepath,
+                                conversion_map_filepath):
     conversion_function, transitional_tagset = strategy_obj.prepare_conversion(structured_data)
 
     # assert original nkjp tags and conversion function keys are exactly the same
@@ -66,7 +45,7 @@ def generate_tagset_and_conversion(
     assert_empty(diff_keys_original, "Conversion function keys differ from nkjp tags")
 
     # assert results of conversion equal tags in tagset
-    tagset_tags = [pos + ":" + e['tags'] if e['tags'] else pos for pos, l in transitional_tagset.items() for e in l]
+    tagset_tags = [Strategy.make_full_tag(pos, e['tags']) for pos, l in transitional_tagset.items() for e in l]
     diff_conversion_tagset = set(conversion_function.values()) ^ set(tagset_tags)
     assert_empty(diff_conversion_tagset, "Tagset and right side of conversion function differ")
 
@@ -79,5 +58,37 @@ def generate_tagset_and_conversion(
         file.write(json.dumps(conversion_function, indent=4, sort_keys=True))
 
 
+@click.command(help='Generate tagset and mapping from nkjp to the created tagset')
+@click.option(
+    "--tagset-filepath", type=str, default="./data/processed/tagset/{strategy}.json",
+    help="{strategy} is replaced with strategy name"
+)
+@click.option(
+    "--conversion-map-filepath", type=str, default="./data/processed/tagset/nkjp2{strategy}.json",
+    help="{strategy} is replaced with strategy name"
+)
+@click.option(
+    "--strategy", type=click.Choice(list(STRATEGIES)), multiple=True, default=["justpos"],
+    help="Can be given multiple times, all strategies use the same corpus statistics"
+)
+@click.option("--statistics-dir", type=str, default=CACHE_DIR, help="Cache of corpus tag counts")
+@click.option("-j", "--jobs", type=int, default=1)
+def generate_tagset_and_conversion(
+        tagset_filepath,
+        conversion_map_filepath,
+        strategy,
+        statistics_dir,
+        jobs
+):
+    statistics = load_tag_statistics(CORPUS_PATH, statistics_dir, jobs=jobs, read_only=True)
+    structured_data, original_nkjp_tags = prepare_structured_data(statistics)
+
+    for name in strategy:
+        write_tagset_and_conversion(
+            STRATEGIES[name], structured_data, original_nkjp_tags,
+            tagset_filepath.format(strategy=name), conversion_map_filepath.format(strategy=name)
+        )
+
+
 if __name__ == "__main__":
     generate_tagset_and_conversion()
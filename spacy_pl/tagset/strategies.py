@@ -1,5 +1,12 @@
+from collections import Counter, defaultdict
+from itertools import combinations
+
 from tqdm import tqdm
 
+from spacy_pl.tagset.features import parse_tag, CATEGORIES
+
+MAIN_CATEGORIES = ("number", "case", "gender", "person", "degree", "aspect", "negation")
+
 
 class Strategy:
     """This class represents a strategy for squashing tags from NKJP"""
@@ -49,3 +56,50 @@ class JustPOS(Strategy):
                 transitional_tagset[fleksem] = [{'tags': [], 'card': fleksem_card}]
 
         return conversion_map, transitional_tagset
+
+
+class Projection(Strategy):
+    """Keeps flexeme (optionally merged with pos_map) and values of chosen grammatical categories of the tag"""
+
+    def __init__(self, categories=(), pos_map: dict = None, name: str = None):
+        self.categories = tuple(categories)
+        self.pos_map = pos_map or {}
+        self.name = name if name is not None else "_".join(("pos",) + self.categories)
+
+    def convert(self, tag):
+        features = parse_tag(tag)
+        pos = self.pos_map.get(features.pos, features.pos)
+        values = [features.get(category) for category in self.categories]
+        return self.make_full_tag(pos, [value for value in values if value is not None])
+
+    def prepare_conversion(self, structured_data):
+        conversion_map = {}
+        cards = Counter()
+        for fleksem, subclasses in structured_data.items():
+            for subclass in subclasses:
+                tag = self.make_full_tag(fleksem, subclass['tags'])
+                new_tag = self.convert(tag)
+                conversion_map[tag] = new_tag
+                cards[new_tag] += subclass['card']
+
+        transitional_tagset = defaultdict(list)
+        for new_tag, card in cards.items():
+            pos, *tags = new_tag.split(":")
+            transitional_tagset[pos].append({'tags': tags, 'card': card})
+
+        return conversion_map, dict(transitional_tagset)
+
+
+def projection_strategies(categories=MAIN_CATEGORIES, max_categories: int = 3) -> dict:
+    """Projections on every combination of at most max_categories of the categories"""
+    strategies = [
+        Projection(subset) for size in range(1, max_categories + 1) for subset in combinations(categories, size)
+    ]
+    return {strategy.name: strategy for strategy in strategies}
+
+
+STRATEGIES = {
+    "justpos": JustPOS(),
+    **projection_strategies(),
+    "full": Projection(tuple(CATEGORIES), name="full"),
+}
@@ -0,0 +1,141 @@
+"""
+Speed benchmark of trained models: loads the model and runs it over held-out texts with every combination
+of batch sizes and numbers of processes, measuring words per second, per-document latency percentiles,
+model load time and peak RSS of the benchmark process while loading and running the model (sampled, so memory
+used before, eg. by training in this process or its worker processes, isn't counted). Memory of nlp.pipe worker
+processes (n_process > 1) isn't included.
+Documents of a batch come out of nlp.pipe together, so latency of every document is the time it took to get
+its whole batch (since the previous batch came out) divided by the number of documents in the batch,
+with batch size 1 it's the time of every single document.
+With more than one process batches are processed concurrently and this time is the throughput per document instead.
+Benchmarks should be run on an otherwise idle machine, one at a time.
+"""
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+import click
+import numpy as np
+import pandas as pd
+
+from spacy_pl.instrumentation import RssSampler
+from spacy_pl.training.documents import is_jsonl, iter_documents
+from spacy_pl.training.model import SpacyModel, iter_texts
+from spacy_pl.training.pipeline_cache import PIPELINES
+
+BENCHMARK_FILENAME = "benchmark.json"
+
+
+def iter_benchmark_texts(path: str):
+    """Texts of documents of a corpus in spacy JSON/JSONL format (orths joined with spaces), or lines of text file"""
+    if not (path.endswith(".json") or is_jsonl(path)):
+        yield from iter_texts(path)
+        return
+    for document in iter_documents(path):
+        yield " ".join(
+            token["orth"]
+            for paragraph in document["paragraphs"]
+            for sentence in paragraph["sentences"]
+            for token in sentence["tokens"]
+        )
+
+
+def run_config(nlp, texts: list, batch_size: int, n_process: int) -> dict:
+    # time of the batch ended by every document, divided among all documents of the batch afterwards
+    latencies = np.empty(len(texts), dtype=np.float64)
+    n_words = 0
+    with RssSampler() as sampler:
+        start = previous = time.perf_counter()
+        for i, doc in enumerate(nlp.pipe(texts, batch_size=batch_size, n_process=n_process)):
+            n_words += len(doc)
+            if (i + 1) % batch_size == 0 or i + 1 == len(texts):
+                now = time.perf_counter()
+                batch_start = i - i % batch_size
+                latencies[batch_start:i + 1] = (now - previous) / (i + 1 - batch_start)
+                previous = now
+        seconds = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000 if len(texts) else (0.0, 0.0, 0.0)
+    return {
+        "batch_size": batch_size,
+        "n_process": n_process,
+        "n_docs": len(texts),
+        "n_words": n_words,
+        "seconds": seconds,
+        "words_per_second": n_words / seconds if seconds > 0 else 0.0,
+        "latency_p50_ms": float(p50),
+        "latency_p95_ms": float(p95),
+        "latency_p99_ms": float(p99),
+        "peak_rss_mb": sampler.peak_mb,
+    }
+
+
+def benchmark_model(model: SpacyModel, data_path: str, batch_sizes=(1, 64, 1000), n_processes=(1,),
+                    max_docs: int = 1000) -> dict:
+    """
+    :param data_path: held-out corpus in spacy format or text file with one document per line
+    :return: dict with load time, peak RSS and results of every (batch size, number of processes) run
+    """
+    texts = list(islice(iter_benchmark_texts(str(data_path)), max_docs))
+
+    # pipeline is loaded from disk, not taken from cache, to measure load time
+    PIPELINES.invalidate(model.model_path)
+    with RssSampler() as sampler:
+        start = time.perf_counter()
+        nlp = model.get_nlp()
+        load_seconds = time.perf_counter() - start
+    rss_after_load = sampler.peak_mb
+
+    runs = [
+        run_config(nlp, texts, batch_size, n_process)
+        for n_process in n_processes
+        for batch_size in batch_sizes
+    ]
+    return {
+        "model_path": str(model.model_path),
+        "data_path": str(data_path),
+        "load_seconds": load_seconds,
+        "peak_rss_after_load_mb": rss_after_load,
+        "peak_rss_mb": max([rss_after_load] + [run["peak_rss_mb"] for run in runs]),
+        "runs": runs,
+    }
+
+
+def speed_summary(results: dict) -> dict:
+    """Flat summary of benchmark results, to be put alongside accuracy scores"""
+    best = max(results["runs"], key=lambda run: run["words_per_second"])
+    return {
+        "words_per_second": best["words_per_second"],
+        "latency_p95_ms": best["latency_p95_ms"],
+        "load_seconds": results["load_seconds"],
+        "peak_rss_mb": results["peak_rss_mb"],
+    }
+
+
+def save_benchmark(results: dict, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=4)
+
+
+@click.command(help="Measure speed and memory usage of a trained model")
+@click.argument("model-location", type=str)
+@click.argument("data-path", type=str)
+@click.option("-o", "--output-path", type=str, default=None, help=f"{BENCHMARK_FILENAME} in model location by default")
+@click.option("-b", "--batch-size", type=int, multiple=True, default=(1, 64, 1000))
+@click.option("-n", "--n-process", type=int, multiple=True, default=(1,))
+@click.option("--max-docs", type=int, default=1000)
+def run_benchmark(model_location, data_path, output_path, batch_size, n_process, max_docs):
+    # pipeline and vectors aren't needed to load a trained model
+    model = SpacyModel(pipeline=None, vectors_path=None, location=model_location)
+    results = benchmark_model(model, data_path, batch_size, n_process, max_docs)
+    save_benchmark(results, output_path or Path(model_location) / BENCHMARK_FILENAME)
+
+    with pd.option_context("display.max_rows", 100, "display.max_columns", 20):
+        print(pd.DataFrame(results["runs"]))
+    print(f"Load time: {results['load_seconds']:.2f}s, peak RSS: {results['peak_rss_mb']:.0f} MB")
+    return results
+
+
+if __name__ == "__main__":
+    run_benchmark()
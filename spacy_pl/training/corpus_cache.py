@@ -0,0 +1,98 @@
+"""
+Cache of training corpora converted to spacy's binary gold format: documents of a JSON (or JSONL) corpus
+are parsed into gold tuples once and saved with msgpack under the content hash of the file.
+spacy's GoldCorpus reads .msg files directly, so training and evaluation on cached corpora skip JSON parsing
+(the same fold, trial or refit data is converted only once).
+Gold tuples are written one at a time, so conversion doesn't hold the whole corpus in memory, and cache size
+is bounded: least recently used corpora are removed when it grows over max_size_mb.
+"""
+import hashlib
+import os
+import shutil
+
+import srsly
+from spacy.gold import read_json_object
+
+from spacy_pl.training.documents import iter_documents
+
+CACHE_DIR = "data/processed/corpus_cache"
+CACHE_SUFFIX = ".msg"
+HASH_BLOCK_SIZE = 1 << 20
+MAX_CACHE_SIZE_MB = 2048
+
+_hashes = {}  # (path, size, mtime) -> content hash, so unchanged files are hashed once per process
+
+
+def content_hash(path: str) -> str:
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _hashes:
+        md5 = hashlib.md5()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                md5.update(block)
+        _hashes[key] = md5.hexdigest()
+    return _hashes[key]
+
+
+def write_msgpack_list(path: str, items):
+    """
+    Writes items as one msgpack array (same bytes as srsly.write_msgpack(path, list(items))),
+    keeping only one item in memory at a time
+    """
+    body_path = f"{path}.items"
+    count = 0
+    try:
+        with open(body_path, "wb") as body:
+            for item in items:
+                body.write(srsly.msgpack_dumps(item))
+                count += 1
+        with open(path, "wb") as f, open(body_path, "rb") as body:
+            f.write(srsly.msgpack.Packer().pack_array_header(count))
+            shutil.copyfileobj(body, f)
+    finally:
+        os.remove(body_path)
+
+
+def evict(cache_dir: str, max_size_mb: float, keep: str = None):
+    """Removes least recently used corpora until the size of cache is within max_size_mb, except `keep`"""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(CACHE_SUFFIX):
+            stat = os.stat(os.path.join(cache_dir, name))
+            entries.append((stat.st_mtime, stat.st_size, os.path.join(cache_dir, name)))
+    size = sum(entry_size for _, entry_size, _ in entries)
+    for _, entry_size, entry_path in sorted(entries):
+        if size <= max_size_mb * 1024 * 1024:
+            break
+        if keep is not None and os.path.samefile(entry_path, keep):
+            continue
+        try:
+            os.remove(entry_path)
+        except FileNotFoundError:  # removed by another process
+            pass
+        size -= entry_size
+
+
+def cached_corpus(path: str, cache_dir: str = CACHE_DIR, max_size_mb: float = MAX_CACHE_SIZE_MB) -> str:
+    """
+    :param path: corpus in spacy JSON or JSONL format (paths to .msg files are returned as they are)
+    :param max_size_mb: least recently used corpora are removed from cache when it grows over this size
+    :return: path to the corpus in binary gold format, converted if it's not in cache yet
+    """
+    path = str(path)
+    if path.endswith(CACHE_SUFFIX):
+        return path
+
+    cache_path = os.path.join(cache_dir, content_hash(path) + CACHE_SUFFIX)
+    if os.path.exists(cache_path):
+        # modification time marks recent use (access times are often not updated)
+        os.utime(cache_path)
+    else:
+        os.makedirs(cache_dir, exist_ok=True)
+        # write to temporary file first, so that concurrent fits never read half-written cache
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        write_msgpack_list(tmp_path, read_json_object(iter_documents(path)))
+        os.replace(tmp_path, cache_path)
+        evict(cache_dir, max_size_mb, keep=cache_path)
+    return cache_path
@@ -1,6 +1,6 @@
-import shutil
+from multiprocessing import get_context
 from tempfile import TemporaryDirectory
-import json
+from dataclasses import dataclass
 from pathlib import Path
 import typing as T
 import os
@@ -9,19 +9,26 @@ import click
 import numpy as np
 import pandas as pd
 
+from spacy_pl.training.benchmark import benchmark_model, save_benchmark, speed_summary, BENCHMARK_FILENAME
 from spacy_pl.training.model import SpacyModel, TrainParams
+from spacy_pl.training.documents import iter_documents, count_documents, DocumentWriter
+from spacy_pl.training.environment import limited_threads, threads_per_job
 
 np.random.seed(42)
 
 
-def split_data_kfold(input_file: str, output_dir: str, n_splits: int, train_frac: float):
-    data = json.load(open(input_file))
-    assert type(data == list)
+@dataclass
+class Fold(object):
+    """Fold of k-fold cross validation, defined by indices of documents in the shared corpus file"""
+    train_ids: np.ndarray
+    dev_ids: np.ndarray
+    test_ids: np.ndarray
 
-    data_arr = np.array(data, dtype='object')
-    fold_id_arr = np.random.choice(n_splits, len(data_arr), replace=True)
 
-    print("Splitting data for k-fold cross validation:")
+def split_indices_kfold(n_docs: int, n_splits: int, train_frac: float) -> T.List[Fold]:
+    fold_id_arr = np.random.choice(n_splits, n_docs, replace=True)
+
+    folds = list()
     for fold_idx in range(n_splits):
         test_ids = fold_id_arr == fold_idx
         train_and_dev_ids = fold_id_arr != fold_idx
@@ -30,24 +37,91 @@ def split_data_kfold(input_file: str, output_dir: str, n_splits: int, train_frac
         train_ids = np.logical_and(train_and_dev_ids, train_not_dev_ids)
         dev_ids = np.logical_and(train_and_dev_ids, ~train_not_dev_ids)
 
-        fold_output_path = Path(output_dir) / f'fold-{fold_idx+1}'
-        os.makedirs(fold_output_path, exist_ok=True)
+        folds.append(Fold(
+            train_ids=np.flatnonzero(train_ids),
+            dev_ids=np.flatnonzero(dev_ids),
+            test_ids=np.flatnonzero(test_ids),
+        ))
+    return folds
+
+
+def write_fold(input_file: str, fold: Fold, output_dir: str):
+    """
+    Streams documents selected by fold from input file to train.json, dev.json and test.json in output dir
+    :return: paths to train, dev and test files
+    """
+    output_dir = Path(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    paths = [output_dir / 'train.json', output_dir / 'dev.json', output_dir / 'test.json']
+
+    # every document of the corpus belongs to exactly one of fold's parts
+    n_docs = len(fold.train_ids) + len(fold.dev_ids) + len(fold.test_ids)
+    split_of_doc = np.empty(n_docs, dtype=np.int8)
+    for split_id, ids in enumerate((fold.train_ids, fold.dev_ids, fold.test_ids)):
+        split_of_doc[ids] = split_id
+
+    with DocumentWriter(paths[0]) as train_writer, \
+            DocumentWriter(paths[1]) as dev_writer, \
+            DocumentWriter(paths[2]) as test_writer:
+        writers = (train_writer, dev_writer, test_writer)
+        for doc_idx, doc in enumerate(iter_documents(input_file)):
+            writers[split_of_doc[doc_idx]].write(doc)
+
+    return paths
+
+
+def write_test_documents(input_file: str, fold: Fold, path: str):
+    """Streams documents of fold's test part from input file to path"""
+    is_test = np.zeros(len(fold.train_ids) + len(fold.dev_ids) + len(fold.test_ids), dtype=bool)
+    is_test[fold.test_ids] = True
+    with DocumentWriter(path) as writer:
+        for doc_idx, doc in enumerate(iter_documents(input_file)):
+            if is_test[doc_idx]:
+                writer.write(doc)
+
+
+def fit_fold(
+        input_file: str,
+        fold: Fold,
+        model_location: Path,
+        train_params: TrainParams,
+        model_init_params: dict
+) -> SpacyModel:
+    os.makedirs(model_location, exist_ok=True)
+
+    # only the fold being trained is written to disk
+    with TemporaryDirectory() as fold_dir:
+        train_path, dev_path, test_path = write_fold(input_file, fold, fold_dir)
+        print(f"Training model {model_location}...")
+
+        # fold data written again by another run (same corpus and split) is read from corpus cache if it's enabled
+        model = SpacyModel(location=model_location, **model_init_params)
+        model.fit(
+            train_path=str(train_path),
+            dev_path=str(dev_path),
+            train_params=train_params
+        )
 
-        js_train = list(data_arr[train_ids])
-        with open(fold_output_path / 'train.json', 'w') as f:
-            json.dump(js_train, f)
+        # score dict is accessible via model.score_
+        model.score(str(test_path))
 
-        js_dev = list(data_arr[dev_ids])
-        with open(fold_output_path / 'dev.json', 'w') as f:
-            json.dump(js_dev, f)
+    return model
 
-        js_test = list(data_arr[test_ids])
-        with open(fold_output_path / 'test.json', 'w') as f:
-            json.dump(js_test, f)
 
-        print(f"fold {fold_idx+1}, train_docs={len(js_train)}, dev_docs={len(js_dev)}, test_docs={len(js_test)}")
+def benchmark_fold(input_file: str, fold: Fold, model: SpacyModel, benchmark_params: dict):
+    """
+    Measures speed of fold model on its test data (with benchmark_params as arguments of benchmark_model)
+    and saves it to benchmark.json in model location
+    """
+    with TemporaryDirectory() as fold_dir:
+        test_path = Path(fold_dir) / 'test.json'
+        write_test_documents(input_file, fold, test_path)
+        model.benchmark_ = benchmark_model(model, str(test_path), **benchmark_params)
+    save_benchmark(model.benchmark_, model.location / BENCHMARK_FILENAME)
 
-        yield fold_output_path
+
+def _fit_fold_star(args):
+    return fit_fold(*args)
 
 
 def kfold(
@@ -56,31 +130,47 @@ def kfold(
         n_splits,
         train_frac,
         train_params: TrainParams,
+        n_jobs: int = 1,
+        benchmark_params: dict = None,
         **model_init_params
 ) -> T.List[SpacyModel]:
-    models = list()
-
-    with TemporaryDirectory() as cv_dir:
-        data_paths = list(split_data_kfold(input_file, cv_dir, n_splits, train_frac))
-
-        for fold_idx, fold_dir in enumerate(data_paths):
-            model_location = Path(output_dir) / f'fold-{fold_idx+1}'
-            os.makedirs(model_location, exist_ok=True)
-            print(f"Training model {model_location}...")
-
-            model_init_params['location'] = model_location
-            model = SpacyModel(**model_init_params)
+    """
+    Trains and scores a model for every fold.
+    :param n_jobs: number of folds trained at once in separate processes,
+        available CPUs are split evenly between them
+    :param benchmark_params: if provided, speed of every fold model is measured (see benchmark_fold),
+        one model at a time after all folds are trained, so that measurements don't compete for CPUs
+    :return: models in order of folds
+    """
+    n_docs = count_documents(input_file)
+    folds = split_indices_kfold(n_docs, n_splits, train_frac)
 
-            model.fit(
-                train_path=os.path.join(fold_dir, 'train.json'),
-                dev_path=os.path.join(fold_dir, 'dev.json'),
-                train_params=train_params
-            )
-
-            # score dict is accessible via model.score_
-            model.score(os.path.join(fold_dir, 'test.json'))
-            shutil.rmtree(fold_dir)  # we keep only model location
-            models.append(model)
+    print("Splitting data for k-fold cross validation:")
+    for fold_idx, fold in enumerate(folds):
+        print(f"fold {fold_idx+1}, train_docs={len(fold.train_ids)}, "
+              f"dev_docs={len(fold.dev_ids)}, test_docs={len(fold.test_ids)}")
+
+    tasks = [
+        (input_file, fold, Path(output_dir) / f'fold-{fold_idx+1}', train_params, model_init_params)
+        for fold_idx, fold in enumerate(folds)
+    ]
+
+    n_jobs = min(n_jobs, len(tasks))
+    if n_jobs <= 1:
+        models = [fit_fold(*task) for task in tasks]
+    else:
+        # fresh (spawned) worker processes load numerical libraries with capped thread pools
+        n_threads = threads_per_job(n_jobs)
+        print(f"Training {n_jobs} folds at once, {n_threads} threads each")
+        with limited_threads(n_threads):
+            pool = get_context("spawn").Pool(n_jobs)
+        with pool:
+            models = pool.map(_fit_fold_star, tasks, chunksize=1)
+
+    if benchmark_params is not None:
+        for fold_idx, (fold, model) in enumerate(zip(folds, models)):
+            print(f"Benchmarking model of fold {fold_idx+1}...")
+            benchmark_fold(input_file, fold, model, benchmark_params)
 
     return models
 
@@ -101,13 +191,27 @@ def kfold(
     "-f", "--train-frac", type=float, default=0.75,
     help="Fraction of every fold that will be used for training (as opposed to validation)"
 )
-def run_kfold_cv(input_file, output_dir, pipeline, vectors, n_splits, train_frac):
+@click.option(
+    "-j", "--jobs", type=int, default=1,
+    help="Number of folds trained in parallel, CPUs are split evenly between them"
+)
+@click.option(
+    "--benchmark/--no-benchmark", default=False,
+    help="Measure speed of fold models on their test data (one at a time, after training) and add it to scores"
+)
+@click.option(
+    "--corpus-cache-dir", type=str, default=None,
+    help="If provided, fold data is cached in binary gold format in this directory and reused by later runs "
+         "(see spacy_pl.training.corpus_cache)"
+)
+def run_kfold_cv(input_file, output_dir, pipeline, vectors, n_splits, train_frac, jobs, benchmark, corpus_cache_dir):
     train_params = TrainParams(
         n_iter=5,
     )
     model_init_params = {
         "pipeline": pipeline,
         "vectors_path": vectors,
+        "corpus_cache_dir": corpus_cache_dir,
     }
     models = kfold(
         input_file,
@@ -115,12 +219,18 @@ def run_kfold_cv(input_file, output_dir, pipeline, vectors, n_splits, train_frac
         n_splits,
         train_frac,
         train_params,
+        n_jobs=jobs,
+        benchmark_params={} if benchmark else None,
         **model_init_params
     )
     score_dfs = list()
     for idx, model in enumerate(models):
         score_row = pd.DataFrame(
-            {"fold":idx+1, "model_location": model.location, **model.scores_}, index=[idx+1]
+            {
+                "fold": idx+1, "model_location": model.location, **model.scores_,
+                **(speed_summary(model.benchmark_) if benchmark else {})
+            },
+            index=[idx+1]
         )
         score_dfs.append(score_row)
     score_df = pd.concat(score_dfs, axis='index')
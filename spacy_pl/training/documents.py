@@ -0,0 +1,123 @@
+"""
+Streaming reading and writing of corpora in spacy JSON format, one document at a time.
+Both JSON list files (as produced by spacy and our converters) and JSONL files (one document per line) are supported.
+"""
+import json
+
+CHUNK_SIZE = 1 << 20
+MAX_DOCUMENT_SIZE = 1 << 30
+TRUNCATION_MARGIN = 6
+JSON_SEPARATORS = " \t\r\n,"
+
+
+def is_jsonl(path: str) -> bool:
+    return str(path).endswith(".jsonl")
+
+
+def _is_truncated(error: json.JSONDecodeError) -> bool:
+    """Whether decoding error can be caused by the document not fitting into buffer, not by invalid JSON"""
+    # error at (or a few characters before, inside an escape sequence) the end of buffer or unclosed string
+    return error.pos >= len(error.doc) - TRUNCATION_MARGIN or error.msg.startswith("Unterminated string")
+
+
+def _iter_json_list(file_, chunk_size: int = CHUNK_SIZE, max_document_size: int = MAX_DOCUMENT_SIZE):
+    decoder = json.JSONDecoder()
+    buffer = ""
+    while not buffer:
+        # leading whitespace can span many reads
+        chunk = file_.read(chunk_size)
+        if chunk == "":
+            break
+        buffer = chunk.lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("Expected JSON list of documents")
+    pos = 1
+    offset = 0  # position of buffer start in the file (in characters)
+    eof = False
+
+    while True:
+        # skip whitespace and commas between documents, reading more data if needed
+        while True:
+            while pos < len(buffer) and buffer[pos] in JSON_SEPARATORS:
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            offset += len(buffer)
+            buffer, pos = file_.read(chunk_size), 0
+            eof = buffer == ""
+
+        if pos >= len(buffer):
+            raise ValueError("Unexpected end of JSON list")
+        if buffer[pos] == "]":
+            return
+
+        try:
+            document, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as e:
+            size = len(buffer) - pos
+            if eof or not _is_truncated(e) or size > max_document_size:
+                raise json.JSONDecodeError(
+                    f"{e.msg} (character {offset + e.pos} of {getattr(file_, 'name', 'file')})", e.doc, e.pos
+                ) from None
+            # document doesn't fit into buffer yet, reading at least as much as buffered keeps re-decoding linear
+            chunk = file_.read(max(chunk_size, size))
+            eof = chunk == ""
+            offset += pos
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+
+        yield document
+        pos = end
+
+
+def iter_documents(path: str):
+    """Lazily yields documents from JSON list or JSONL file"""
+    with open(path, "r") as file_:
+        if is_jsonl(path):
+            for line in file_:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from _iter_json_list(file_)
+
+
+def count_documents(path: str) -> int:
+    return sum(1 for _ in iter_documents(path))
+
+
+def count_tokens(document: dict) -> int:
+    return sum(len(sentence["tokens"]) for paragraph in document["paragraphs"] for sentence in paragraph["sentences"])
+
+
+class DocumentWriter:
+    """
+    Writes documents one by one, to JSONL if path ends with .jsonl and to JSON list otherwise
+    (in the latter case output is the same as json.dump of the whole list).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.jsonl = is_jsonl(path)
+        self.n_docs = 0
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "w")
+        if not self.jsonl:
+            self._file.write("[")
+        return self
+
+    def write(self, document: dict):
+        if self.jsonl:
+            self._file.write(json.dumps(document))
+            self._file.write("\n")
+        else:
+            if self.n_docs > 0:
+                self._file.write(", ")
+            json.dump(document, self._file)
+        self.n_docs += 1
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if not self.jsonl:
+            self._file.write("]")
+        self._file.close()
@@ -0,0 +1,41 @@
+import os
+from contextlib import contextmanager
+
+# variables read by BLAS / OpenMP libraries when they are loaded
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+
+@contextmanager
+def environ(variables: dict):
+    """Sets environment variables for the duration of the block, restoring previous values afterwards"""
+    previous = {key: os.environ.get(key) for key in variables}
+    try:
+        for key, value in variables.items():
+            os.environ[key] = str(value)
+        yield
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def threads_per_job(n_jobs: int) -> int:
+    """Splits available CPUs evenly between parallel jobs"""
+    return max(1, (os.cpu_count() or 1) // n_jobs)
+
+
+def limited_threads(n_threads: int):
+    """
+    Caps thread pools of numerical libraries in processes started within the block.
+    Libraries read these variables only when loaded, so it has to wrap creation of fresh ("spawn") processes.
+    """
+    return environ({key: n_threads for key in THREAD_ENV_VARS})
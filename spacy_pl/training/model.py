@@ -1,12 +1,27 @@
 import json
 import os
+import time
+from itertools import count
 from shutil import rmtree
 from dataclasses import dataclass, asdict
 from pathlib import Path
+import typing as T
 
+import numpy as np
 import spacy
+from spacy.gold import GoldCorpus
 from sklearn.base import BaseEstimator
 
+from spacy_pl.instrumentation import Metrics
+from spacy_pl.training.corpus_cache import cached_corpus
+from spacy_pl.training.environment import environ
+from spacy_pl.training.pipeline_cache import PIPELINES
+from spacy_pl.vectors.subwords import make_subword_vectors_model
+
+METRICS_FILENAME = "metrics.json"
+BASE_MODEL_DIRNAME = "model-base"
+SUBWORD_VECTORS_DIRNAME = "vectors-subwords"
+
 
 @dataclass
 class TrainParams(object):
@@ -41,13 +56,75 @@ class TestParams(object):
     displacy_limit: int = 25
 
 
+def iter_texts(path: str):
+    """Reads texts from file, one text per line (empty lines are skipped)"""
+    with open(path, "r") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if line.strip():
+                yield line
+
+
+def epoch_times(location: str, start: float) -> list:
+    """
+    Approximate durations of parts of consecutive epochs, inferred from modification times of files that spacy
+    writes after every epoch to model0, model1, ... in output directory: the model is saved first, then it's loaded
+    and evaluated on dev data and accuracy.json and meta.json are written. Writing of the first file of saved model
+    counts to training and loading it counts to evaluation, first epoch includes loading data and vectors.
+    :param start: time when training started
+    :return: list(dict(train=<seconds>, save=<seconds>, evaluate=<seconds>))
+    """
+    times = list()
+    previous_end = start
+    for i in count():
+        model_dir = os.path.join(location, f"model{i}")
+        meta_path = os.path.join(model_dir, "meta.json")
+        if not os.path.exists(meta_path):
+            break
+        end = os.stat(meta_path).st_mtime
+        saved = [
+            os.stat(os.path.join(root, name)).st_mtime
+            for root, _, names in os.walk(model_dir)
+            for name in names
+            if root != model_dir or name not in ("meta.json", "accuracy.json")
+        ] or [end]
+        times.append({
+            "train": max(0.0, min(saved) - previous_end),
+            "save": max(0.0, max(saved) - min(saved)),
+            "evaluate": max(0.0, end - max(saved)),
+        })
+        previous_end = end
+    return times
+
+
+def doc_to_prediction(doc, with_tags: bool, with_parse: bool) -> dict:
+    """Compact per-token outputs of the model: words, tags, absolute head indices and dependency labels"""
+    prediction = {"words": [token.text for token in doc]}
+    if with_tags:
+        prediction["tags"] = [token.tag_ for token in doc]
+    if with_parse:
+        prediction["heads"] = np.fromiter((token.head.i for token in doc), dtype=np.int32, count=len(doc))
+        prediction["deps"] = [token.dep_ for token in doc]
+    return prediction
+
+
 class SpacyModel(BaseEstimator):
     """
     Base class for spaCy model wrappers that has sklearn-like interface
     which works nicely for evaluation and hyperparameter tuning.
     """
 
-    def __init__(self, pipeline: str, vectors_path: str, location: str, hyperparams: dict = dict(), lang: str = 'pl'):
+    def __init__(
+            self,
+            pipeline: str,
+            vectors_path: str,
+            location: str,
+            hyperparams: dict = dict(),
+            lang: str = 'pl',
+            vectors_store: str = None,
+            corpus_cache_dir: str = None,
+            subwords_path: str = None
+    ):
         """
         Initializes model that can be fitted or used to make predictions and evaluate itself.
         :param pipeline: pipeline that will be passed to spacy.cli.train
@@ -55,12 +132,21 @@ class SpacyModel(BaseEstimator):
         :param location: location where model will be saved, should contain model-best or model-final folder inside
         :param hyperparams: dict of hyperparameters for model training
         :param lang: language for which the model is trained
+        :param vectors_store: optional memory-mapped vector store (see spacy_pl.vectors.store),
+            used instead of vectors saved with the model when the model is loaded
+        :param corpus_cache_dir: directory where training and evaluation data are cached in binary gold format
+            (see spacy_pl.training.corpus_cache, eg. its CACHE_DIR), None to read JSON data every time
+        :param subwords_path: optional subword buckets (see spacy_pl.vectors.subwords), if provided, vectors composed
+            from subwords are added for words of training and dev data missing from vectors before training
         """
         self.lang = lang
         self.pipeline = pipeline
         self.vectors_path = vectors_path
         self.location = Path(location)
         self.hyperparams = hyperparams
+        self.vectors_store = vectors_store
+        self.corpus_cache_dir = corpus_cache_dir
+        self.subwords_path = subwords_path
 
     @property
     def best_model_path(self):
@@ -82,6 +168,12 @@ class SpacyModel(BaseEstimator):
     def meta_path(self):
         return os.path.join(self.model_path, 'meta.json')
 
+    def corpus_path(self, data_path: str) -> Path:
+        """Path of data to read with spacy, cached binary version of it if corpus cache is enabled"""
+        if self.corpus_cache_dir is None:
+            return Path(data_path)
+        return Path(cached_corpus(data_path, self.corpus_cache_dir))
+
     # noinspection PyAttributeOutsideInit
     def fit(self, train_path: str, dev_path: str, train_params: TrainParams = TrainParams(), refit: bool = True):
         """
@@ -92,58 +184,148 @@ class SpacyModel(BaseEstimator):
         :param train_path: path to training data in spacy format
         :param dev_path: path to evaluation data in spacy format
         :param train_params: parameters for model training, passed to CLI
-        :return: self
+        :return: self (time and peak memory of training phases and epochs are in metrics_ and meta_["metrics"])
         """
 
+        previous_model_path = self.model_path
         if refit is True:
             base_model = None
         else:
-            # specify itself as a base model to continue training
-            base_model = Path(self.model_path)
-
-        # set hyperparameters (in spacy loaded only via environment variables)
-        for key in self.hyperparams:
-            os.environ[key] = str(self.hyperparams[key])
-
-        spacy.cli.train(
-            lang=self.lang,
-            output_path=Path(self.location),
-            train_path=Path(train_path),
-            dev_path=Path(dev_path),
-            pipeline=self.pipeline,
-            base_model=base_model,
-            vectors=Path(self.vectors_path),
-            **asdict(train_params)
-        )
-
-        # remove all paths except the model path (best or final - depending on spacy version)
-        for filename in os.listdir(self.location):
-            filepath = os.path.join(self.location, filename)
-            if os.path.isdir(filepath) and filepath != self.model_path:
-                rmtree(filepath)
+            # specify itself as a base model to continue training, moved aside because spacy copies
+            # model-final to model-best at the end of training and fails if model-best already exists
+            base_model = self.location / BASE_MODEL_DIRNAME
+            if os.path.exists(base_model):
+                rmtree(base_model)
+            os.rename(previous_model_path, base_model)
+
+        metrics = Metrics()
+        vectors_path = Path(self.vectors_path)
+        if self.subwords_path is not None:
+            with metrics.phase("fit/subwords"):
+                # removed with other intermediate directories after training
+                vectors_path = self.location / SUBWORD_VECTORS_DIRNAME
+                os.makedirs(self.location, exist_ok=True)
+                n_added = make_subword_vectors_model(
+                    self.vectors_path, self.subwords_path, [train_path, dev_path], vectors_path
+                )
+            metrics.set("n_subword_vectors", n_added)
+
+        with metrics.phase("fit/corpus"):
+            train_path = self.corpus_path(train_path)
+            dev_path = self.corpus_path(dev_path)
 
+        # set hyperparameters (in spacy loaded only via environment variables),
+        # previous values are restored after training so they don't leak to other models
+        train_start = time.time()
+        try:
+            with environ(self.hyperparams), metrics.phase("fit/train"):
+                spacy.cli.train(
+                    lang=self.lang,
+                    output_path=Path(self.location),
+                    train_path=train_path,
+                    dev_path=dev_path,
+                    pipeline=self.pipeline,
+                    base_model=base_model,
+                    vectors=vectors_path,
+                    **asdict(train_params)
+                )
+        except BaseException:
+            # keep the model that training was continued from if no new one was saved
+            if base_model is not None and not os.path.exists(self.model_path):
+                os.rename(base_model, previous_model_path)
+            raise
+
+        # spacy saves and evaluates model after every epoch, parts of epochs are told apart by times of saved files
+        epochs = epoch_times(self.location, train_start)
+        for epoch in epochs:
+            for part, seconds in epoch.items():
+                metrics.add_phase(f"fit/train/{part}", seconds)
+        metrics.set("epoch_seconds", [sum(epoch.values()) for epoch in epochs])
+        metrics.set("epochs", epochs)
+
+        with metrics.phase("fit/cleanup"):
+            # remove all paths except the model path (best or final - depending on spacy version),
+            # including the base model training was continued from
+            for filename in os.listdir(self.location):
+                filepath = os.path.join(self.location, filename)
+                if os.path.isdir(filepath) and filepath != self.model_path:
+                    rmtree(filepath)
+
+        # pipelines loaded before training are outdated now
+        PIPELINES.invalidate(self.location)
+
+        self.metrics_ = {"fit": metrics.to_dict()}
+        self.save_metrics()
         self.meta_ = json.load(open(self.meta_path))
+        self.meta_["metrics"] = self.metrics_["fit"]
         return self
 
     # noinspection PyAttributeOutsideInit
     def score(self, data_path: str, test_params: TestParams = TestParams()) -> dict:
         """
-        Calls spacy.cli.evaluate on itself and returns available metrics
+        Evaluates the model (same as spacy.cli.evaluate, but reusing cached pipeline) and returns available metrics
         :param data_path: path to evaluation data in spacy format
-        :param test_params: forwarded to spacy.cli.evaluate
-        :return: scores dict
+        :param test_params: same parameters as for spacy.cli.evaluate
+        :return: scores dict (time and peak memory of scoring phases are in metrics_["score"])
         """
-        self.scores_ = spacy.cli.evaluate(
-            model=self.model_path,
-            data_path=data_path,
-            return_scores=True,
-            **asdict(test_params)
-        )
+        metrics = Metrics()
+        if test_params.displacy_path is not None:
+            # rendering parses is only available through CLI
+            with metrics.phase("score/evaluate"):
+                self.scores_ = spacy.cli.evaluate(
+                    model=self.model_path,
+                    data_path=data_path,
+                    return_scores=True,
+                    **asdict(test_params)
+                )
+        else:
+            with metrics.phase("score/load"):
+                nlp = self.get_nlp()
+            with metrics.phase("score/corpus"):
+                data_path = self.corpus_path(data_path)
+                corpus = GoldCorpus(data_path, data_path)
+                dev_docs = list(corpus.dev_docs(nlp, gold_preproc=test_params.gold_preproc))
+            with metrics.phase("score/evaluate"):
+                self.scores_ = nlp.evaluate(dev_docs, verbose=False).scores
+
+        self.metrics_ = {**getattr(self, "metrics_", {}), "score": metrics.to_dict()}
+        self.save_metrics()
         return self.scores_
 
+    def save_metrics(self):
+        """Saves time and memory usage of fitting and scoring (see spacy_pl.instrumentation) to model location"""
+        with open(self.location / METRICS_FILENAME, "w") as f:
+            json.dump(self.metrics_, f, indent=4)
+
     def get_nlp(self):
         """
         Get the underlying spacy model (eg. to make predictions, tag text, etc.)
+        The model is loaded once per process and shared (see spacy_pl.training.pipeline_cache),
+        so it shouldn't be modified.
+        """
+        return PIPELINES.get(self.model_path, self.vectors_store)
+
+    def predict(
+            self,
+            texts: T.Union[T.Iterable[str], str, Path],
+            batch_size: int = 1000,
+            n_process: int = 1
+    ) -> T.Iterator[dict]:
         """
-        model = spacy.load(self.model_path)
-        return model
+        Tags/parses texts in batches (with nlp.pipe), lazily yielding compact predictions instead of Doc objects
+        :param texts: single text, iterable of texts or Path to a file with one text per line
+        :param batch_size: number of texts processed at once
+        :param n_process: number of processes used by nlp.pipe
+        :return: generator of dicts with "words" and, depending on pipeline, "tags" or "heads" and "deps"
+        """
+        if isinstance(texts, Path):
+            texts = iter_texts(texts)
+        elif isinstance(texts, str):
+            texts = [texts]
+
+        nlp = self.get_nlp()
+        with_tags = "tagger" in nlp.pipe_names
+        with_parse = "parser" in nlp.pipe_names
+
+        for doc in nlp.pipe(texts, batch_size=batch_size, n_process=n_process):
+            yield doc_to_prediction(doc, with_tags, with_parse)
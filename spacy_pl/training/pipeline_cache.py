@@ -0,0 +1,103 @@
+"""
+Process-wide LRU cache of loaded spacy pipelines, so that the same model isn't loaded from disk over and over
+(eg. when comparing fold models in a notebook or scoring and tagging with the same model).
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import spacy
+
+from spacy_pl.vectors.store import load_model_with_store
+
+
+def model_fingerprint(model_path: str):
+    """Modification times of model directory and its meta.json, both change when model is re-saved"""
+    meta_path = os.path.join(model_path, "meta.json")
+    meta_mtime = os.stat(meta_path).st_mtime_ns if os.path.exists(meta_path) else None
+    return os.stat(model_path).st_mtime_ns, meta_mtime
+
+
+def model_size_mb(model_path: str) -> float:
+    """Size of model files on disk, used as an estimate of memory taken by loaded model"""
+    size = 0
+    for root, _, files in os.walk(model_path):
+        for filename in files:
+            size += os.path.getsize(os.path.join(root, filename))
+    return size / 1024 / 1024
+
+
+class PipelineCache(object):
+    """
+    Keeps at most max_size loaded pipelines (and, if max_memory_mb is set, at most that much of estimated memory),
+    evicting least recently used ones. Pipelines are keyed by path and modification time of the model,
+    so a re-saved model is never served from cache.
+    """
+
+    def __init__(self, max_size: int = 4, max_memory_mb: float = None):
+        self.max_size = max_size
+        self.max_memory_mb = max_memory_mb
+        self._entries = OrderedDict()  # (path, vectors store path) -> (fingerprint, nlp, size_mb)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, model_path):
+        return any(path == os.path.abspath(model_path) for path, _ in self._entries)
+
+    @property
+    def memory_mb(self) -> float:
+        return sum(size_mb for _, _, size_mb in self._entries.values())
+
+    def get(self, model_path: str, vectors_store: str = None):
+        """
+        Returns loaded pipeline for the model, loading it only if it's not cached or changed on disk.
+        Returned pipeline is shared - it shouldn't be modified (eg. by adding pipes) by the caller.
+        :param vectors_store: if provided, vectors are memory-mapped from this store (see spacy_pl.vectors.store)
+            instead of loaded from the model
+        """
+        path = os.path.abspath(model_path)
+        key = (path, os.path.abspath(vectors_store) if vectors_store is not None else None)
+        fingerprint = model_fingerprint(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == fingerprint:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+            if vectors_store is not None:
+                nlp = load_model_with_store(path, vectors_store)
+            else:
+                nlp = spacy.load(path)
+            self._entries[key] = (fingerprint, nlp, model_size_mb(path))
+            self._entries.move_to_end(key)
+            self._evict()
+            return nlp
+
+    def _evict(self):
+        # the most recently loaded pipeline is always kept, even if it exceeds memory limit by itself
+        while len(self._entries) > 1 and (
+                len(self._entries) > self.max_size
+                or (self.max_memory_mb is not None and self.memory_mb > self.max_memory_mb)
+        ):
+            self._entries.popitem(last=False)
+
+    def invalidate(self, path: str = None):
+        """Removes cached pipelines of the model at path (or any model inside path), or all of them if path is None"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                return
+            prefix = os.path.abspath(path)
+            for key in list(self._entries):
+                model_path = key[0]
+                if model_path == prefix or model_path.startswith(prefix + os.sep):
+                    del self._entries[key]
+
+
+PIPELINES = PipelineCache()
+
+
+def load_pipeline(model_path: str, vectors_store: str = None):
+    return PIPELINES.get(model_path, vectors_store)
@@ -0,0 +1,323 @@
+"""
+Hyperparameter search for SpacyModel using random search, successive halving or hyperband.
+
+Search space is a JSON file with distributions for spacy hyperparameters (environment variables read by spacy,
+eg. "dropout_from", "learn_rate", "hidden_width") and TrainParams fields, for example:
+    {
+        "hyperparams": {
+            "learn_rate": {"type": "loguniform", "low": 0.0001, "high": 0.01},
+            "hidden_width": {"type": "choice", "values": [64, 128, 256]}
+        },
+        "train_params": {
+            "n_early_stopping": {"type": "choice", "values": [2, 4]}
+        }
+    }
+
+Number of training iterations (n_iter) is the budget: successive halving trains all trials for a few iterations,
+continues training only the best 1/eta of them (judged by dev score) and repeats until max_iter is reached.
+Hyperband runs several successive halving brackets that trade the number of trials for their starting budget.
+
+Every finished (trial, n_iter) result is appended to trials.jsonl in the output directory. Re-running the same
+command with the same seed reuses logged results, so an interrupted search can be resumed.
+"""
+import json
+import math
+import os
+from dataclasses import dataclass, field, replace
+from multiprocessing import get_context
+from pathlib import Path
+import typing as T
+
+import click
+import numpy as np
+import pandas as pd
+
+from spacy_pl.training.model import SpacyModel, TrainParams
+from spacy_pl.training.environment import limited_threads, threads_per_job
+
+TRIAL_LOG_FILENAME = "trials.jsonl"
+
+DEFAULT_SPACE = {
+    "hyperparams": {
+        "dropout_from": {"type": "uniform", "low": 0.1, "high": 0.4},
+        "learn_rate": {"type": "loguniform", "low": 0.0001, "high": 0.01},
+        "batch_to": {"type": "choice", "values": [16, 32, 64]},
+    },
+    "train_params": {},
+}
+
+
+def sample_value(distribution: dict, random_state: np.random.RandomState):
+    kind = distribution["type"]
+    if kind == "choice":
+        values = distribution["values"]
+        return values[random_state.randint(len(values))]
+    elif kind == "uniform":
+        return float(random_state.uniform(distribution["low"], distribution["high"]))
+    elif kind == "loguniform":
+        low, high = math.log(distribution["low"]), math.log(distribution["high"])
+        return float(math.exp(random_state.uniform(low, high)))
+    elif kind == "int":
+        return int(random_state.randint(distribution["low"], distribution["high"] + 1))
+    else:
+        raise ValueError(f"Distribution {kind} does not exist")
+
+
+@dataclass
+class Trial(object):
+    trial_id: int
+    hyperparams: dict
+    train_params: dict
+    n_iter: int = 0  # number of iterations the model at trial location was trained for in this run
+    score: float = None
+    scores: dict = field(default_factory=dict)  # dev score by n_iter
+
+
+def check_space(space: dict):
+    """Raises ValueError for search spaces that can't be searched, eg. with n_iter which is the budget of trials"""
+    if "n_iter" in space.get("train_params", {}):
+        raise ValueError("n_iter can't be searched over, it's the budget of trials (use --min-iter and --max-iter)")
+
+
+def sample_trials(space: dict, n_trials: int, random_state: np.random.RandomState, first_id: int = 0):
+    check_space(space)
+    trials = list()
+    for trial_id in range(first_id, first_id + n_trials):
+        trials.append(Trial(
+            trial_id=trial_id,
+            hyperparams={
+                key: sample_value(dist, random_state) for key, dist in sorted(space.get("hyperparams", {}).items())
+            },
+            train_params={
+                key: sample_value(dist, random_state) for key, dist in sorted(space.get("train_params", {}).items())
+            },
+        ))
+    return trials
+
+
+class TrialLog(object):
+    """Append-only log of finished trial results, used to resume interrupted searches"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.results = dict()
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.results[(record["trial_id"], record["n_iter"])] = record
+
+    def get(self, trial: Trial, n_iter: int):
+        record = self.results.get((trial.trial_id, n_iter))
+        # results are reused only if they were obtained with the same parameters
+        if record is not None and record["hyperparams"] == trial.hyperparams \
+                and record["train_params"] == trial.train_params:
+            return record
+        return None
+
+    def append(self, record: dict):
+        self.results[(record["trial_id"], record["n_iter"])] = record
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def run_trial(task):
+    """Trains a trial up to n_iter iterations and evaluates it on dev data, runs in a worker process"""
+    trial, n_iter, output_dir, train_path, dev_path, metric, base_train_params, model_init_params = task
+
+    model = SpacyModel(
+        location=Path(output_dir) / f"trial-{trial.trial_id}",
+        hyperparams=trial.hyperparams,
+        **model_init_params
+    )
+    # continue training of the model from the previous rung if possible
+    warm_start = 0 < trial.n_iter < n_iter
+    # budget always takes precedence over sampled train params
+    train_params = replace(
+        base_train_params,
+        **{**trial.train_params, "n_iter": n_iter - trial.n_iter if warm_start else n_iter}
+    )
+    model.fit(train_path=train_path, dev_path=dev_path, train_params=train_params, refit=not warm_start)
+
+    score = model.score(dev_path)[metric]
+    return trial.trial_id, n_iter, score
+
+
+class Search(object):
+
+    def __init__(
+            self,
+            train_path: str,
+            dev_path: str,
+            output_dir: str,
+            metric: str,
+            base_train_params: TrainParams,
+            model_init_params: dict,
+            n_jobs: int = 1,
+    ):
+        self.train_path = train_path
+        self.dev_path = dev_path
+        self.output_dir = output_dir
+        self.metric = metric
+        self.base_train_params = base_train_params
+        self.model_init_params = model_init_params
+        self.n_jobs = n_jobs
+
+        os.makedirs(output_dir, exist_ok=True)
+        self.log = TrialLog(os.path.join(output_dir, TRIAL_LOG_FILENAME))
+        self.trials = dict()
+        self._pool = None
+
+    def __enter__(self):
+        if self.n_jobs > 1:
+            with limited_threads(threads_per_job(self.n_jobs)):
+                self._pool = get_context("spawn").Pool(self.n_jobs)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+
+    def evaluate(self, trials: T.List[Trial], n_iter: int):
+        """Trains all trials up to n_iter iterations (reusing logged results) and sets their scores"""
+        tasks = list()
+        for trial in trials:
+            self.trials[trial.trial_id] = trial
+            record = self.log.get(trial, n_iter)
+            if record is not None:
+                # model state on disk is unknown, so a trial continued later is trained from scratch
+                trial.score = trial.scores[n_iter] = record["score"]
+                trial.n_iter = 0
+            else:
+                tasks.append((
+                    trial, n_iter, self.output_dir, self.train_path, self.dev_path,
+                    self.metric, self.base_train_params, self.model_init_params
+                ))
+
+        print(f"Training {len(tasks)} trials for {n_iter} iterations ({len(trials) - len(tasks)} logged)...")
+        results = self._pool.imap_unordered(run_trial, tasks) if self._pool else map(run_trial, tasks)
+        for trial_id, trial_n_iter, score in results:
+            trial = self.trials[trial_id]
+            trial.n_iter = trial_n_iter
+            trial.score = trial.scores[trial_n_iter] = score
+            self.log.append({
+                "trial_id": trial_id,
+                "n_iter": trial_n_iter,
+                "score": score,
+                "hyperparams": trial.hyperparams,
+                "train_params": trial.train_params,
+            })
+
+    def successive_halving(self, trials: T.List[Trial], budgets: T.List[int], eta: int):
+        """
+        Trains trials for consecutive budgets (numbers of iterations), keeping best 1/eta of trials after each one
+        :return: trials that made it to the last budget
+        """
+        for rung, n_iter in enumerate(budgets):
+            self.evaluate(trials, n_iter)
+            if rung < len(budgets) - 1:
+                trials = sorted(trials, key=lambda t: t.score, reverse=True)
+                trials = trials[:max(1, len(trials) // eta)]
+        return trials
+
+    def results(self) -> pd.DataFrame:
+        rows = [
+            {"trial_id": t.trial_id, "max_n_iter": max(t.scores), "score": t.scores[max(t.scores)],
+             **t.hyperparams, **t.train_params}
+            for t in self.trials.values() if t.scores
+        ]
+        return pd.DataFrame(rows).sort_values(["max_n_iter", "score"], ascending=False)
+
+
+def halving_budgets(min_iter: int, max_iter: int, eta: int) -> T.List[int]:
+    """Budgets growing eta times each rung, ending with max_iter"""
+    n_rungs = int(math.floor(math.log(max_iter / min_iter, eta) + 1e-9)) + 1
+    return [max(1, int(round(max_iter * eta ** (rung - n_rungs + 1)))) for rung in range(n_rungs)]
+
+
+def random_search(search: Search, space: dict, n_trials: int, max_iter: int, random_state):
+    trials = sample_trials(space, n_trials, random_state)
+    search.successive_halving(trials, [max_iter], eta=1)
+
+
+def successive_halving_search(search: Search, space: dict, n_trials: int, min_iter: int, max_iter: int, eta: int,
+                              random_state):
+    trials = sample_trials(space, n_trials, random_state)
+    search.successive_halving(trials, halving_budgets(min_iter, max_iter, eta), eta)
+
+
+def hyperband_search(search: Search, space: dict, min_iter: int, max_iter: int, eta: int, random_state):
+    s_max = len(halving_budgets(min_iter, max_iter, eta)) - 1
+    first_id = 0
+    for s in range(s_max, -1, -1):
+        n_trials = int(math.ceil((s_max + 1) / (s + 1) * eta ** s))
+        budgets = halving_budgets(min_iter, max_iter, eta)[s_max - s:]
+        print(f"Hyperband bracket s={s}: {n_trials} trials, budgets {budgets}")
+        trials = sample_trials(space, n_trials, random_state, first_id=first_id)
+        first_id += n_trials
+        search.successive_halving(trials, budgets, eta)
+
+
+@click.command(help="Search for best hyperparameters of a spacy model, evaluating trials on dev data")
+@click.argument("train-data", type=str)
+@click.argument("dev-data", type=str)
+@click.argument("output-dir", type=str)
+@click.option(
+    "-p", "--pipeline", type=str, required=True,
+    help="Pipeline of tasks to train the model for, same format as for spacy.cli.train"
+)
+@click.option(
+    "-v", "--vectors", type=str, default="models/blank/fasttext",
+    help="Path to model from which vectors will be taken"
+)
+@click.option("-s", "--space", type=str, default=None, help="Path to JSON file with search space")
+@click.option("--strategy", type=click.Choice(["random", "halving", "hyperband"]), default="hyperband")
+@click.option("-m", "--metric", type=str, default="tags_acc", help="Dev score to maximize, eg. tags_acc, uas, las")
+@click.option("-n", "--n-trials", type=int, default=27, help="Number of trials (ignored by hyperband)")
+@click.option("--min-iter", type=int, default=1)
+@click.option("--max-iter", type=int, default=27)
+@click.option("--eta", type=int, default=3, help="Only 1/eta of trials is trained further after each rung")
+@click.option("-j", "--jobs", type=int, default=1, help="Number of trials trained in parallel")
+@click.option("--seed", type=int, default=42)
+@click.option(
+    "--corpus-cache-dir", type=str, default=None,
+    help="If provided, training and dev data are converted to binary gold format once and read from this directory "
+         "by all trials (see spacy_pl.training.corpus_cache)"
+)
+def run_search(
+        train_data, dev_data, output_dir, pipeline, vectors, space, strategy, metric,
+        n_trials, min_iter, max_iter, eta, jobs, seed, corpus_cache_dir
+):
+    if space is not None:
+        with open(space, "r") as f:
+            space = json.load(f)
+    else:
+        space = DEFAULT_SPACE
+    check_space(space)
+
+    model_init_params = {
+        "pipeline": pipeline,
+        "vectors_path": vectors,
+        "corpus_cache_dir": corpus_cache_dir,
+    }
+    random_state = np.random.RandomState(seed)
+
+    with Search(train_data, dev_data, output_dir, metric, TrainParams(), model_init_params, n_jobs=jobs) as search:
+        if strategy == "random":
+            random_search(search, space, n_trials, max_iter, random_state)
+        elif strategy == "halving":
+            successive_halving_search(search, space, n_trials, min_iter, max_iter, eta, random_state)
+        else:
+            hyperband_search(search, space, min_iter, max_iter, eta, random_state)
+
+    results_df = search.results()
+    results_df.to_csv(os.path.join(output_dir, "results.csv"), index=False)
+    with pd.option_context("display.max_rows", 10, "display.max_columns", 20):
+        print(results_df)
+    return results_df
+
+
+if __name__ == "__main__":
+    run_search()
@@ -1,7 +1,14 @@
+"""
+Splits corpus in spacy JSON (or JSONL) format into train, validation and test files.
+Documents are streamed from input straight to the chosen output, so memory usage doesn't depend on corpus size.
+"""
 import numpy as np
-import json
 import click
 
+from spacy_pl.training.documents import iter_documents, count_tokens, DocumentWriter
+
+ASSIGNMENT_CHUNK_SIZE = 4096
+
 
 class Split(object):
     def __init__(self, train_prob: float, validation_prob: float, test_prob: float, n_docs: int, random_seed: int=2137):
@@ -13,6 +20,40 @@ class Split(object):
         self.test = set(np.where(indice_assignment == 2)[0])
 
 
+def split_assignments(train_prob: float, validation_prob: float, test_prob: float, random_seed: int = 2137):
+    """
+    Infinite generator of split ids (0 - train, 1 - validation, 2 - test) for consecutive documents.
+    Yields exactly the same assignment as Split does for any number of documents, without knowing it in advance.
+    """
+    assert(train_prob+validation_prob+test_prob == 1.0)
+    random_state = np.random.RandomState(random_seed)
+    # same sampling as np.random.choice with probabilities
+    cdf = np.cumsum([train_prob, validation_prob, test_prob])
+    cdf /= cdf[-1]
+    while True:
+        samples = random_state.random_sample(ASSIGNMENT_CHUNK_SIZE)
+        yield from cdf.searchsorted(samples, side='right').tolist()
+
+
+def balance_by_tokens(assigned_docs, probs):
+    """
+    Adjusts random split assignments, so that splits get their share of tokens rather than documents:
+    a document drawn for a split that already has more than its share of tokens seen so far
+    goes to the split that is furthest below its share instead.
+    :param assigned_docs: iterable of (split id, document) pairs
+    :param probs: expected fraction of tokens for every split
+    """
+    probs = np.array(probs)
+    split_tokens = np.zeros(len(probs))
+    for split_id, doc in assigned_docs:
+        n_tokens = count_tokens(doc)
+        seen_tokens = split_tokens.sum()
+        if split_tokens[split_id] > probs[split_id] * seen_tokens:
+            split_id = int(np.argmax(probs * (seen_tokens + n_tokens) - split_tokens))
+        split_tokens[split_id] += n_tokens
+        yield split_id, doc
+
+
 @click.command(help="Split JSON converted for POS tagger (input-file) training into train, test and validation files (based on given probabilities).")
 @click.option('--input-file', type=str, required=True)
 @click.option('--train-output', type=str, required=True)
@@ -22,6 +63,7 @@ class Split(object):
 @click.option('--validation-prob', default=0.25)
 @click.option('--test-prob', default=0.25)
 @click.option('--random-seed', default=2137)
+@click.option('--by-tokens', is_flag=True, help="Balance splits by number of tokens instead of number of documents")
 def split_data(
         input_file, 
         train_output, 
@@ -30,22 +72,20 @@ def split_data(
         train_prob, 
         validation_prob, 
         test_prob, 
-        random_seed
+        random_seed,
+        by_tokens
 ):
-    print('Loading input...')
-    js = json.load(open(input_file, 'r'))
     print('Splitting...')
-    split = Split(train_prob, validation_prob, test_prob, n_docs=len(js), random_seed=random_seed)
-    js_train = [doc for idx, doc in enumerate(js) if idx in split.train]
-    js_valid = [doc for idx, doc in enumerate(js) if idx in split.validation]
-    js_test = [doc for idx, doc in enumerate(js) if idx in split.test]
-    print('Saving output...')
-    with open(train_output, 'w') as f:
-        json.dump(js_train, f)
-    with open(validation_output, 'w') as f:
-        json.dump(js_valid, f)
-    with open(test_output, 'w') as f:
-        json.dump(js_test, f)
+    assignments = split_assignments(train_prob, validation_prob, test_prob, random_seed=random_seed)
+    assigned_docs = zip(assignments, iter_documents(input_file))
+    if by_tokens:
+        assigned_docs = balance_by_tokens(assigned_docs, [train_prob, validation_prob, test_prob])
+    with DocumentWriter(train_output) as train_writer, \
+            DocumentWriter(validation_output) as validation_writer, \
+            DocumentWriter(test_output) as test_writer:
+        writers = (train_writer, validation_writer, test_writer)
+        for split_id, doc in assigned_docs:
+            writers[split_id].write(doc)
     print('Done.')
 
 
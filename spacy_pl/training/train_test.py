@@ -1,6 +1,7 @@
 import click
 import pandas as pd
 
+from spacy_pl.training.benchmark import benchmark_model, save_benchmark, speed_summary, BENCHMARK_FILENAME
 from spacy_pl.training.model import TrainParams, SpacyModel
 
 
@@ -20,7 +21,11 @@ from spacy_pl.training.model import TrainParams, SpacyModel
     "-v", "--vectors", type=str, default="models/blank/fasttext",
     help="Path to model from which vectors will be taken"
 )
-def run_train_test(train_data, dev_data, test_data, output_dir, pipeline, vectors):
+@click.option(
+    "--benchmark/--no-benchmark", default=False,
+    help="Measure speed of the model on test data and add it to scores"
+)
+def run_train_test(train_data, dev_data, test_data, output_dir, pipeline, vectors, benchmark):
     train_params = TrainParams(
         n_iter=5,
     )
@@ -34,6 +39,11 @@ def run_train_test(train_data, dev_data, test_data, output_dir, pipeline, vector
     model.fit(train_path=train_data, dev_path=dev_data, train_params=train_params)
 
     scores = model.score(test_data)
+    if benchmark:
+        benchmark_results = benchmark_model(model, test_data)
+        save_benchmark(benchmark_results, model.location / BENCHMARK_FILENAME)
+        scores = {**scores, **speed_summary(benchmark_results)}
+
     scores_df = pd.DataFrame(
         {"test_data": test_data, "model_location": model.location, **scores}, index=[0]
     )
@@ -0,0 +1,129 @@
+"""
+Compares vector storage modes (see spacy_pl.vectors.quantization): for every mode, vectors from a float32 store
+are quantized, restored into a blank model and used to train a model on one train/dev/test split of the corpus.
+The trained model is saved without vectors and scored on test data when loaded with the quantized store.
+Reports, for every mode:
+    store_size_mb, vectors_size_mb - size of the quantized store and of its vectors table alone
+    restore_seconds - time of reading the store and restoring float32 vectors
+    model_size_mb, model_load_seconds - size of the trained model with float32 vectors and time of spacy.load of it
+    store_model_size_mb, store_model_load_seconds - the same for the model saved without vectors (plus the store),
+        loaded with load_model_with_store
+    mean_cosine - mean cosine similarity of restored vectors to the original ones
+    test scores
+Load times are measured in the benchmark process, with model files already in page cache.
+"""
+import json
+import os
+import time
+from pathlib import Path
+
+import click
+import numpy as np
+import pandas as pd
+import spacy
+
+from spacy_pl.training.cv import split_indices_kfold, write_fold
+from spacy_pl.training.documents import count_documents
+from spacy_pl.training.model import SpacyModel, TrainParams
+from spacy_pl.vectors.blank_model import make_blank_model
+from spacy_pl.vectors.get_fasttext import get_file_size
+from spacy_pl.vectors.quantization import QUANTIZATIONS
+from spacy_pl.vectors.store import (
+    VectorStore, write_vector_store, save_model_without_vectors, load_model_with_store, VECTORS_FILENAME
+)
+
+
+def mean_cosine(original: np.ndarray, restored: np.ndarray) -> float:
+    norms = np.linalg.norm(original, axis=1) * np.linalg.norm(restored, axis=1)
+    norms[norms == 0] = 1
+    return float(((original * restored).sum(axis=1) / norms).mean())
+
+
+def get_dir_size(path) -> float:
+    """Size of all files in directory (recursively) in MB"""
+    return sum(
+        get_file_size(os.path.join(root, filename)) for root, _, filenames in os.walk(path) for filename in filenames
+    )
+
+
+def timed(function, *args):
+    start = time.time()
+    result = function(*args)
+    return result, time.time() - start
+
+
+@click.command(help="Train and score models using vectors stored with different precision")
+@click.argument("input-file", type=str, default="data/processed/pos/NKJP_justpos.json")
+@click.argument("store-dir", type=str, default="data/processed/vectors/fasttext_store")
+@click.argument("output-dir", type=str, default="models/pos/benchmark_quantization")
+@click.option(
+    "-p", "--pipeline", type=str, default="tagger",
+    help="Pipeline of tasks to train the model for, same format as for spacy.cli.train"
+)
+@click.option(
+    "-q", "--quantization", type=click.Choice(QUANTIZATIONS), multiple=True, default=QUANTIZATIONS,
+    help="Storage modes to compare, can be given multiple times"
+)
+@click.option("--pq-subspaces", type=int, default=50)
+@click.option("--n-iter", type=int, default=5)
+def benchmark_quantization(input_file, store_dir, output_dir, pipeline, quantization, pq_subspaces, n_iter):
+    output_dir = Path(output_dir)
+    store = VectorStore(store_dir)
+    keys = store.keys()
+    original = np.asarray(store.vectors())
+
+    # the same split is used for all modes
+    folds = split_indices_kfold(count_documents(input_file), n_splits=5, train_frac=0.75)
+    train_path, dev_path, test_path = write_fold(input_file, folds[0], output_dir / "data")
+
+    rows = list()
+    for mode in quantization:
+        print(f"Benchmarking {mode} vectors...")
+        mode_dir = output_dir / mode
+        mode_store_dir = mode_dir / "store"
+        write_vector_store(mode_store_dir, keys, original, name=store.name, quantization=mode,
+                           pq_subspaces=pq_subspaces)
+
+        # forces reading memory-mapped data
+        restored, restore_seconds = timed(lambda: np.array(VectorStore(mode_store_dir).vectors()))
+
+        blank_path = mode_dir / "blank"
+        make_blank_model(keys, restored).to_disk(blank_path)
+
+        model = SpacyModel(pipeline=pipeline, vectors_path=str(blank_path), location=mode_dir / "model")
+        model.fit(train_path=str(train_path), dev_path=str(dev_path), train_params=TrainParams(n_iter=n_iter))
+
+        store_model = SpacyModel(
+            pipeline=pipeline, vectors_path=str(blank_path), location=mode_dir / "model-without-vectors",
+            vectors_store=str(mode_store_dir)
+        )
+        nlp, model_load_seconds = timed(spacy.load, model.model_path)
+        save_model_without_vectors(nlp, store_model.best_model_path)
+        del nlp
+        _, store_model_load_seconds = timed(load_model_with_store, store_model.model_path, mode_store_dir)
+        scores = store_model.score(str(test_path))
+
+        store_size_mb = get_dir_size(mode_store_dir)
+        rows.append({
+            "quantization": mode,
+            "store_size_mb": store_size_mb,
+            "vectors_size_mb": get_file_size(os.path.join(mode_store_dir, VECTORS_FILENAME)),
+            "restore_seconds": restore_seconds,
+            "model_size_mb": get_dir_size(model.model_path),
+            "model_load_seconds": model_load_seconds,
+            "store_model_size_mb": get_dir_size(store_model.model_path) + store_size_mb,
+            "store_model_load_seconds": store_model_load_seconds,
+            "mean_cosine": mean_cosine(original, restored),
+            **scores,
+        })
+
+    results_df = pd.DataFrame(rows)
+    with open(output_dir / "results.json", "w") as f:
+        json.dump(rows, f, indent=4)
+    with pd.option_context("display.max_rows", 10, "display.max_columns", 20):
+        print(results_df)
+    return results_df
+
+
+if __name__ == "__main__":
+    benchmark_quantization()
@@ -0,0 +1,40 @@
+"""
+Building spacy Vectors and blank models straight from keys and vectors in memory,
+without writing vectors in text format and running `spacy init-model` on them.
+"""
+import numpy as np
+import spacy
+from spacy.vectors import Vectors
+
+
+def make_spacy_vectors(keys: list, vectors: np.ndarray, rows=None) -> Vectors:
+    """
+    :param rows: row of vectors for every key, if not provided keys correspond to consecutive rows
+        (more keys can point to the same row, eg. after pruning)
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if rows is None:
+        return Vectors(data=vectors, keys=keys)
+
+    spacy_vectors = Vectors(data=vectors)
+    for key, row in zip(keys, rows.tolist()):
+        spacy_vectors.add(key, row=row)
+    return spacy_vectors
+
+
+def make_blank_model(keys: list, vectors: np.ndarray, lang: str = "pl", name: str = None, rows=None):
+    """
+    Creates blank spacy model with given vectors, same as `spacy init-model --vectors-loc` does
+    :param name: name of the vectors, "<lang>_model.vectors" by default
+    :param rows: row of vectors for every key (see make_spacy_vectors)
+    """
+    nlp = spacy.blank(lang)
+    for word in keys:
+        if word not in nlp.vocab:
+            lexeme = nlp.vocab[word]
+            lexeme.is_oov = False
+
+    nlp.vocab.vectors = make_spacy_vectors(keys, vectors, rows)
+    nlp.vocab.vectors.name = name if name is not None else "%s_model.vectors" % nlp.meta["lang"]
+    nlp.meta["vectors"]["name"] = nlp.vocab.vectors.name
+    return nlp
@@ -0,0 +1,54 @@
+"""
+Selection of vectors by frequencies of tokens in training corpora: instead of keeping first N rows of fastText table,
+rows of words that are most frequent in our data are kept, until they cover the chosen fraction of corpus tokens.
+"""
+from collections import Counter
+
+import numpy as np
+
+from spacy_pl.training.documents import iter_documents
+
+
+def count_token_frequencies(paths) -> Counter:
+    """Counts orths of tokens in corpora in spacy JSON (or JSONL) format, reading one document at a time"""
+    frequencies = Counter()
+    for path in paths:
+        for document in iter_documents(path):
+            for paragraph in document["paragraphs"]:
+                for sentence in paragraph["sentences"]:
+                    frequencies.update(token["orth"] for token in sentence["tokens"])
+    return frequencies
+
+
+def key_frequencies(keys: list, frequencies: Counter) -> np.ndarray:
+    return np.fromiter((frequencies.get(key, 0) for key in keys), dtype=np.int64, count=len(keys))
+
+
+def token_coverage_curve(key_freqs: np.ndarray, n_tokens: int) -> np.ndarray:
+    """
+    Fraction of corpus tokens that have a vector, for every table size - computed with one cumulative sum
+    :param key_freqs: corpus frequencies of table keys, in order in which rows are added to the table
+    :param n_tokens: number of all tokens in corpus
+    :return: array where i-th element is coverage of a table made of first i+1 rows
+    """
+    return np.cumsum(key_freqs) / max(n_tokens, 1)
+
+
+def select_rows_by_frequency(keys: list, frequencies: Counter, coverage: float, max_size: int = None):
+    """
+    Chooses the smallest set of rows that covers given fraction of corpus tokens, taking most frequent words first
+    :return: sorted indices of chosen rows and coverage they reach
+    """
+    key_freqs = key_frequencies(keys, frequencies)
+    # stable sort keeps original (fastText) order between words with the same frequency
+    ranking = np.argsort(-key_freqs, kind="stable")
+    ranking = ranking[key_freqs[ranking] > 0]
+
+    curve = token_coverage_curve(key_freqs[ranking], sum(frequencies.values()))
+    if len(curve) == 0:
+        return np.array([], dtype=np.int64), 0.0
+
+    size = min(int(np.searchsorted(curve, coverage)) + 1, len(curve))
+    if max_size is not None:
+        size = min(size, max_size)
+    return np.sort(ranking[:size]), float(curve[size - 1])
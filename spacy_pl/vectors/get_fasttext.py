@@ -1,7 +1,75 @@
 import click
 import os
+from collections import deque
+from functools import partial
+from itertools import islice
+from multiprocessing import Pool
+
 import numpy as np
-from spacy.vectors import Vectors
+import pandas as pd
+
+from spacy_pl.instrumentation import Metrics
+from spacy_pl.vectors.blank_model import make_blank_model, make_spacy_vectors
+from spacy_pl.vectors.frequencies import count_token_frequencies, select_rows_by_frequency, key_frequencies, \
+    token_coverage_curve
+from spacy_pl.vectors.prune import prune_vectors
+from spacy_pl.vectors.quantization import QUANTIZATIONS
+from spacy_pl.vectors.store import write_vector_store
+
+CHUNK_LINES = 20000
+
+
+def _split_keys(lines, nr_dim, keys_with_spaces):
+    keys, values = [], []
+    for line in lines:
+        if keys_with_spaces:
+            pieces = line.rstrip().rsplit(b' ', nr_dim)
+            key, rest = pieces[0], b' '.join(pieces[1:])
+        else:
+            key, _, rest = line.partition(b' ')
+        keys.append(key)
+        values.append(rest)
+    return keys, b' '.join(values)
+
+
+def parse_vec_lines(lines, nr_dim):
+    """Parses a chunk of lines from .vec file into list of keys and float32 array of vectors"""
+    keys, values = _split_keys(lines, nr_dim, keys_with_spaces=False)
+    try:
+        data = np.array(values.split(), dtype=np.float32)
+    except ValueError:
+        data = None
+
+    if data is None or data.size != len(lines) * nr_dim:
+        # some keys contain spaces - split vector values from the end of line instead
+        keys, values = _split_keys(lines, nr_dim, keys_with_spaces=True)
+        data = np.array(values.split(), dtype=np.float32)
+
+    keys = [key.decode('utf8') for key in keys]
+    return keys, data.reshape(len(lines), nr_dim)
+
+
+def remap_lines(keys, lines, key_rows, nr_dim):
+    """
+    Lines of .vec file in which every key gets values of its row (eg. of its nearest kept vector after pruning)
+    :param lines: lines of .vec file with vectors of consecutive rows
+    """
+    values = [b' '.join(line.rstrip().rsplit(b' ', nr_dim)[1:]) for line in lines]
+    return [key.encode('utf8') + b' ' + values[row] + b'\n' for key, row in zip(keys, key_rows.tolist())]
+
+
+def imap_bounded(pool, func, iterable, max_pending: int):
+    """
+    Like pool.imap, but submits at most max_pending tasks ahead of the consumer,
+    so that lazily read inputs aren't all read and queued at once
+    """
+    pending = deque()
+    for item in iterable:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= max_pending:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
 
 
 class MyVec:
@@ -18,31 +86,82 @@ class MyVec:
     def size(self):
         return get_file_size(self.filepath)
 
-    def _get_key(self, line):
-        line = line.rstrip().decode('utf8')
-        pieces = line.rsplit(' ', self.nr_dim)
-        return pieces[0]
+    def _iter_line_chunks(self, size, chunk_lines, rows=None):
+        """
+        Yields chunks of lines following the header
+        :param rows: sorted numbers of lines (counting from 0, after header) to read, first `size` lines if None
+        """
+        if rows is not None:
+            size = int(rows[-1]) + 1 if len(rows) else 0
+            selected = np.zeros(size, dtype=bool)
+            selected[rows] = True
 
-    def _get_vector(self, line):
-        line = line.rstrip().decode('utf8')
-        pieces = line.rsplit(' ', self.nr_dim)
-        vec = np.asarray(list(map(float, pieces[1:])), dtype='f')
-        return vec
-
-    def keys(self, size=None):
         with open(self.filepath, 'rb') as file_:
             file_.readline()  # first line
-            words = [self._get_key(line) for count, line in enumerate(file_, 1)
-                     if size is None or count <= size]
-        return words
+            start = 0
+            while start < size:
+                lines = list(islice(file_, min(chunk_lines, size - start)))
+                if not lines:
+                    break
+                if rows is not None:
+                    lines = [line for line, chosen in zip(lines, selected[start:start + len(lines)]) if chosen]
+                start += chunk_lines
+                if lines:
+                    yield lines
 
-    def vectors(self, size=None):
+    def read_keys(self, size=None):
+        """Reads keys of first `size` (all if None) rows without parsing vectors"""
+        keys = []
         with open(self.filepath, 'rb') as file_:
             file_.readline()  # first line
-            vectors = [self._get_vector(line) for count, line in enumerate(file_, 1)
-                       if size is None or count <= size]
-        vectors = np.array(vectors)
-        return vectors
+            for line in islice(file_, size):
+                line = line.rstrip()
+                if line.count(b' ') > self.nr_dim:
+                    # key contains spaces
+                    key = line.rsplit(b' ', self.nr_dim)[0]
+                else:
+                    key = line.partition(b' ')[0]
+                keys.append(key.decode('utf8'))
+        return keys
+
+    def load(self, size=None, jobs=1, chunk_lines=CHUNK_LINES, rows=None):
+        """
+        Reads keys and vectors in a single pass over the file.
+        Chunks of lines are parsed in parallel and copied into one preallocated float32 array,
+        at most 2 chunks per process are read ahead of copying, so memory use doesn't depend on file size.
+        :param size: number of first vectors to read, all if None
+        :param jobs: number of processes parsing chunks
+        :param rows: if provided, sorted indices of rows to read instead of first `size` rows
+        :return: keys, vectors of shape (size, nr_dim)
+        """
+        size = self.nr_row if size is None else min(size, self.nr_row)
+        if rows is not None:
+            size = len(rows)
+        vectors = np.empty((size, self.nr_dim), dtype=np.float32)
+        keys = []
+
+        parse = partial(parse_vec_lines, nr_dim=self.nr_dim)
+        chunks = self._iter_line_chunks(size, chunk_lines, rows)
+        pool = Pool(jobs) if jobs > 1 else None
+        try:
+            parsed_chunks = imap_bounded(pool, parse, chunks, 2 * jobs) if pool else map(parse, chunks)
+            for chunk_keys, chunk_vectors in parsed_chunks:
+                vectors[len(keys):len(keys) + len(chunk_keys)] = chunk_vectors
+                keys.extend(chunk_keys)
+        finally:
+            if pool:
+                pool.terminate()
+
+        # header may declare more rows than the file contains
+        return keys, vectors[:len(keys)]
+
+    def keys(self, size=None):
+        """Keys of first `size` vectors, use load() if vectors are needed too"""
+        return self.read_keys(size)
+
+    def vectors(self, size=None):
+        """Vectors of first `size` keys, use load() if keys are needed too"""
+        return self.load(size)[1]
 
     def get_first_n(self, n):
         lines = [""] * n
@@ -54,6 +173,10 @@ class MyVec:
                 lines[count] = line
         return lines
 
+    def get_lines(self, rows):
+        """Lines of given sorted rows"""
+        return [line for chunk in self._iter_line_chunks(None, CHUNK_LINES, rows) for line in chunk]
+
 
 def get_file_size(filepath):
     statinfo = os.stat(filepath)
@@ -62,48 +185,141 @@ def get_file_size(filepath):
 
 
 def get_ints_sizes(for_cutting, ref, n=100):
-    ref_s = set(ref)
     sizes = np.linspace(len(ref), len(for_cutting), n)
     sizes = list(map(int, sizes))
-    ints_s = [len(set(for_cutting[:s]) & ref_s) for s in sizes]
+
+    # positions at which words from ref first appear in for_cutting,
+    # words in set(for_cutting[:s]) & set(ref) are exactly those first appearing before s
+    codes, uniques = pd.factorize(pd.Series(for_cutting, dtype=object))
+    # codes are numbered in order of first appearance, so a word first appears where the running max of codes grows
+    first_appearances = np.flatnonzero(np.diff(np.maximum.accumulate(codes), prepend=-1) > 0)
+    first_positions = first_appearances[pd.Index(uniques).isin(ref)]
+    ints_s = np.searchsorted(first_positions, sizes, side='left')
+
     ints_s = [s/len(ref) for s in ints_s]
     sizes = [s/1000 for s in sizes]
     return ints_s, sizes
 
 
-@click.command(help="Write chosen amount of fasttext vectors to specified files")
+@click.command(help="Write chosen amount of fasttext vectors to specified files and build blank model with them")
 @click.option('--bin-file', type=str, default="data/processed/vectors/fasttext_spacy")
-@click.option('--txt-file', type=str, default="data/processed/vectors/fasttext.txt")
+@click.option(
+    '--txt-file', type=str, default=None,
+    help="If provided, chosen vectors are also saved in fasttext text format"
+)
+@click.option(
+    '--blank-model-dir', type=str, default="models/blank/fasttext",
+    help="Blank spacy model with chosen vectors is saved here (same as made by `spacy init-model --vectors-loc`)"
+)
 @click.option('--fasttext-file', type=str, default="data/raw/cc.pl.300.vec")
-@click.option('--size', type=int, default=700000)
+@click.option('--size', type=int, default=700000, help="Number of vectors to keep (upper bound if selecting by frequency)")
+@click.option(
+    '--frequency-data', type=str, multiple=True,
+    help="Corpora in spacy JSON format (can be given multiple times), if provided, vectors of the most frequent "
+         "tokens in them are kept instead of first vectors from fasttext file"
+)
+@click.option('--coverage', type=float, default=0.99, help="Fraction of corpus tokens that should have a vector")
+@click.option(
+    '--prune-to', type=int, default=None,
+    help="If provided, only this many vectors are kept and the rest of words are mapped to their nearest kept vectors"
+)
+@click.option('-j', '--jobs', type=int, default=1, help="Number of processes parsing vectors")
+@click.option(
+    '--store-dir', type=str, default=None,
+    help="If provided, vectors are also saved as memory-mappable store (see spacy_pl.vectors.store)"
+)
+@click.option(
+    '--store-quantization', type=click.Choice(QUANTIZATIONS), default="float32",
+    help="Precision of vectors saved in store (see spacy_pl.vectors.quantization), "
+         "quantized stores are restored to float32 when used by models as vectors_store"
+)
+@click.option(
+    '--metrics-path', type=str, default=None,
+    help="If provided, time and peak memory of every step are saved to this JSON file"
+)
 def get_fasttext(
     bin_file,
     txt_file,
+    blank_model_dir,
     fasttext_file,
     size,
+    frequency_data,
+    coverage,
+    prune_to,
+    jobs,
+    store_dir,
+    store_quantization,
+    metrics_path,
 ):
-    print("Reading data...")
+    metrics = Metrics()
     fst = MyVec(fasttext_file)
-    fst_short_k = fst.keys(size)
-    fst_short_v = fst.vectors(size)
+    rows = None
+    if frequency_data:
+        print("Counting token frequencies...")
+        with metrics.phase("frequencies"):
+            frequencies = count_token_frequencies(frequency_data)
+            all_keys = fst.read_keys()
+            rows, reached_coverage = select_rows_by_frequency(all_keys, frequencies, coverage, max_size=size)
+            first_n_curve = token_coverage_curve(
+                key_frequencies(all_keys[:len(rows)], frequencies), sum(frequencies.values())
+            )
+        first_n_coverage = first_n_curve[-1] if len(first_n_curve) else 0.0
+        print("Chosen {} vectors cover {:.4f} of corpus tokens (first {} vectors cover {:.4f})".format(
+            len(rows), reached_coverage, len(rows), first_n_coverage
+        ))
+        size = len(rows)
+
+    print("Reading data...")
+    with metrics.phase("read"):
+        fst_short_k, fst_short_v = fst.load(size, jobs=jobs, rows=rows)
+    metrics.set("n_vectors", len(fst_short_k))
+
+    key_rows = None
+    if prune_to is not None:
+        print("Pruning vectors...")
+        with metrics.phase("prune"):
+            fst_short_v, key_rows, similarities = prune_vectors(fst_short_v, prune_to)
+        remapped_similarities = similarities[len(fst_short_v):]
+        print("Kept {} vectors, {} words remapped with mean similarity {:.4f}".format(
+            len(fst_short_v), len(remapped_similarities),
+            remapped_similarities.mean() if len(remapped_similarities) else 1.0
+        ))
 
     # save bin vectors
     print("Saving bin version...")
     os.makedirs(os.path.dirname(bin_file), exist_ok=True)
-    fst_spacy = Vectors(data=fst_short_v, keys=fst_short_k)
-    fst_spacy.to_disk(bin_file)
+    with metrics.phase("save_bin"):
+        fst_spacy = make_spacy_vectors(fst_short_k, fst_short_v, key_rows)
+        fst_spacy.to_disk(bin_file)
     s = get_file_size(os.path.join(bin_file, 'vectors'))
     print("Chosen fasttexts in binary format weight {} MB".format(round(s)))
 
-    # save txt vectors
-    os.makedirs(os.path.dirname(txt_file), exist_ok=True)
-    print("Saving txt version...")
-    chosen_lines = fst.get_first_n(size)
-    with open(txt_file, 'wb') as f:
-        f.write(bytes("{} {}\n".format(size, fst.nr_dim), 'utf-8'))
-        f.writelines(chosen_lines)
-    s = get_file_size(txt_file)
-    print("Chosen fasttexts in txt format weight {} MB".format(round(s)))
+    if store_dir is not None:
+        print("Saving memory-mappable store...")
+        with metrics.phase("save_store"):
+            write_vector_store(store_dir, fst_short_k, fst_short_v, quantization=store_quantization, rows=key_rows)
+
+    # blank model is built straight from vectors in memory, without re-parsing them from text file
+    print("Saving blank model...")
+    with metrics.phase("save_blank_model"):
+        make_blank_model(fst_short_k, fst_short_v, rows=key_rows).to_disk(blank_model_dir)
+
+    if txt_file is not None:
+        os.makedirs(os.path.dirname(txt_file), exist_ok=True)
+        print("Saving txt version...")
+        with metrics.phase("save_txt"):
+            chosen_lines = fst.get_first_n(size) if rows is None else fst.get_lines(rows)
+            if key_rows is not None:
+                # the same vectors as in the bin version: pruned words get vectors of their nearest kept words
+                chosen_lines = remap_lines(fst_short_k, chosen_lines[:len(fst_short_v)], key_rows, fst.nr_dim)
+            with open(txt_file, 'wb') as f:
+                f.write(bytes("{} {}\n".format(size, fst.nr_dim), 'utf-8'))
+                f.writelines(chosen_lines)
+        s = get_file_size(txt_file)
+        print("Chosen fasttexts in txt format weight {} MB".format(round(s)))
+
+    if metrics_path is not None:
+        metrics.save(metrics_path)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,57 @@
+"""
+Pruning of vectors table: only first rows are kept and every dropped word is mapped to the row
+of its nearest (by cosine similarity) kept vector, the same way spacy's Vocab.prune_vectors does.
+Nearest neighbours are found with matrix multiplications of normalized float32 vectors, one batch of dropped vectors
+at a time (BLAS uses all cores for each multiplication), with batches sized to keep similarity matrices within
+a memory budget.
+"""
+import numpy as np
+
+MEMORY_BUDGET_MB = 256
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def batch_size_for(n_candidates: int, memory_budget_mb: float = MEMORY_BUDGET_MB) -> int:
+    """Number of queries whose float32 similarities to all candidates fit into memory budget"""
+    return max(1, int(memory_budget_mb * 1024 * 1024) // (4 * max(1, n_candidates)))
+
+
+def nearest_neighbours(queries: np.ndarray, candidates: np.ndarray, batch_size: int = None):
+    """
+    For every query vector finds the most similar candidate vector (cosine similarity)
+    :param batch_size: number of queries compared with candidates at once, derived from memory budget if None
+    :return: indices of nearest candidates and their similarities
+    """
+    candidates = normalize(candidates)
+    batch_size = batch_size or batch_size_for(len(candidates))
+    neighbours = np.empty(len(queries), dtype=np.int64)
+    similarities = np.empty(len(queries), dtype=np.float32)
+
+    for start in range(0, len(queries), batch_size):
+        batch = normalize(queries[start:start + batch_size])
+        batch_similarities = batch @ candidates.T
+        best = batch_similarities.argmax(axis=1)
+        neighbours[start:start + batch_size] = best
+        similarities[start:start + batch_size] = batch_similarities[np.arange(len(best)), best]
+
+    return neighbours, similarities
+
+
+def prune_vectors(vectors: np.ndarray, n_keep: int, batch_size: int = None):
+    """
+    Keeps first n_keep vectors, remapping the rest to their nearest kept vectors
+    :return: kept vectors, row of kept vectors for every original row, similarity of every row to its kept vector
+    """
+    n_keep = min(n_keep, len(vectors))
+    kept = vectors[:n_keep]
+    neighbours, similarities = nearest_neighbours(vectors[n_keep:], kept, batch_size=batch_size)
+
+    rows = np.concatenate([np.arange(n_keep), neighbours])
+    similarities = np.concatenate([np.ones(n_keep, dtype=np.float32), similarities])
+    return kept, rows, similarities
@@ -0,0 +1,105 @@
+"""
+Reduced-precision and quantized storage of vectors tables:
+    float32 - vectors as they are
+    float16 - half precision, 2x smaller
+    int8 - every row scaled to [-127, 127] and rounded, 4x smaller (plus one float32 scale per row)
+    pq - product quantization: dimensions are split into subspaces and every subspace of a row is replaced
+         with id of the nearest of 256 centroids (k-means), so a row takes one byte per subspace
+"""
+import numpy as np
+
+QUANTIZATIONS = ("float32", "float16", "int8", "pq")
+
+PQ_CENTROIDS = 256
+PQ_TRAIN_SIZE = 50000
+BLOCK_SIZE = 20000
+
+
+def quantize_int8(vectors: np.ndarray):
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return codes, {"scales": scales.astype(np.float32)}
+
+
+def nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Ids of nearest centroids (squared euclidean distance), computed in blocks to limit memory usage"""
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    ids = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), BLOCK_SIZE):
+        block = vectors[start:start + BLOCK_SIZE]
+        # ||x||^2 is the same for all centroids, so it doesn't affect argmin
+        distances = centroid_norms[None, :] - 2 * block @ centroids.T
+        ids[start:start + BLOCK_SIZE] = distances.argmin(axis=1)
+    return ids
+
+
+def kmeans(vectors: np.ndarray, k: int, n_iter: int, random_state: np.random.RandomState) -> np.ndarray:
+    centroids = vectors[random_state.choice(len(vectors), k, replace=len(vectors) < k)].copy()
+    for _ in range(n_iter):
+        ids = nearest_centroids(vectors, centroids)
+        counts = np.bincount(ids, minlength=k)
+        sums = np.stack([np.bincount(ids, weights=column, minlength=k) for column in vectors.T], axis=1)
+        non_empty = counts > 0
+        centroids[non_empty] = sums[non_empty] / counts[non_empty, None]
+    return centroids
+
+
+def quantize_pq(vectors: np.ndarray, n_subspaces: int, n_iter: int = 15, seed: int = 0):
+    n_rows, nr_dim = vectors.shape
+    if nr_dim % n_subspaces != 0:
+        raise ValueError(f"Number of dimensions ({nr_dim}) is not divisible by number of subspaces ({n_subspaces})")
+    sub_dim = nr_dim // n_subspaces
+
+    random_state = np.random.RandomState(seed)
+    train_ids = random_state.choice(n_rows, min(n_rows, PQ_TRAIN_SIZE), replace=False)
+
+    codebooks = np.empty((n_subspaces, PQ_CENTROIDS, sub_dim), dtype=np.float32)
+    codes = np.empty((n_rows, n_subspaces), dtype=np.uint8)
+    for sub in range(n_subspaces):
+        sub_vectors = vectors[:, sub * sub_dim:(sub + 1) * sub_dim]
+        codebooks[sub] = kmeans(sub_vectors[train_ids], PQ_CENTROIDS, n_iter, random_state)
+        codes[:, sub] = nearest_centroids(sub_vectors, codebooks[sub])
+    return codes, {"codebooks": codebooks}
+
+
+def quantize(vectors: np.ndarray, quantization: str, pq_subspaces: int = 50):
+    """
+    :return: data (array stored in place of vectors) and dict of extra arrays needed to restore vectors
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if quantization == "float32":
+        return vectors, {}
+    elif quantization == "float16":
+        return vectors.astype(np.float16), {}
+    elif quantization == "int8":
+        return quantize_int8(vectors)
+    elif quantization == "pq":
+        return quantize_pq(vectors, pq_subspaces)
+    else:
+        raise ValueError(f"Quantization {quantization} does not exist")
+
+
+def dequantize(data: np.ndarray, extras: dict, quantization: str, rows=None) -> np.ndarray:
+    """
+    Restores float32 vectors from quantized data
+    :param rows: if provided, only these rows are restored
+    """
+    if rows is not None:
+        data = data[rows]
+        if "scales" in extras:
+            extras = dict(extras, scales=extras["scales"][rows])
+
+    if quantization == "float32":
+        return data
+    elif quantization == "float16":
+        return data.astype(np.float32)
+    elif quantization == "int8":
+        return data.astype(np.float32) * extras["scales"][:, None]
+    elif quantization == "pq":
+        codebooks = extras["codebooks"]
+        n_subspaces = codebooks.shape[0]
+        parts = [codebooks[sub][data[:, sub]] for sub in range(n_subspaces)]
+        return np.concatenate(parts, axis=1)
+    else:
+        raise ValueError(f"Quantization {quantization} does not exist")
@@ -0,0 +1,173 @@
+"""
+Vector store that can be memory-mapped instead of deserialized, so that many processes
+share one page-cached copy of the vectors table and start without reading it whole
+(quantized stores are smaller on disk and are restored to float32 when a model is loaded with them,
+so they aren't shared - see VectorStore.to_spacy_vectors). Models used with a store can be saved without
+their own copy of vectors (see save_model_without_vectors).
+
+Store is a directory with:
+    meta.json - shape, dtype, quantization and spacy name of the vectors
+    vectors.bin - raw row-major vectors matrix (quantized, see spacy_pl.vectors.quantization)
+    keys.txt - words, one per line (of consecutive rows, unless more words share a row, eg. after pruning)
+    key_hashes.npy, key_rows.npy - hash index: sorted spacy hashes of words and rows they point to
+    <extra>.npy - arrays needed to restore quantized vectors (eg. scales or codebooks)
+"""
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import spacy
+from spacy._ml import link_vectors_to_models
+from spacy.strings import hash_string
+from spacy.vectors import Vectors
+
+from spacy_pl.vectors.quantization import quantize, dequantize
+
+META_FILENAME = "meta.json"
+VECTORS_FILENAME = "vectors.bin"
+KEYS_FILENAME = "keys.txt"
+HASHES_FILENAME = "key_hashes.npy"
+ROWS_FILENAME = "key_rows.npy"
+
+
+class VectorStore(object):
+
+    def __init__(self, path: str, mmap: bool = True):
+        """
+        Opens the store, vectors and hash index are memory-mapped (read-only) unless mmap=False
+        """
+        self.path = Path(path)
+        with open(self.path / META_FILENAME, "r") as f:
+            self.meta = json.load(f)
+        self.name = self.meta.get("name")
+        self.quantization = self.meta.get("quantization", "float32")
+        self.shape = tuple(self.meta["shape"])
+        dtype = np.dtype(self.meta["dtype"])
+
+        if mmap:
+            self.data = np.memmap(self.path / VECTORS_FILENAME, dtype=dtype, mode="r", shape=self.shape)
+        else:
+            self.data = np.fromfile(str(self.path / VECTORS_FILENAME), dtype=dtype).reshape(self.shape)
+        mmap_mode = "r" if mmap else None
+        self.key_hashes = np.load(str(self.path / HASHES_FILENAME), mmap_mode=mmap_mode)
+        self.key_rows = np.load(str(self.path / ROWS_FILENAME), mmap_mode=mmap_mode)
+        self.extras = {name: np.load(str(self.path / f"{name}.npy")) for name in self.meta.get("extras", [])}
+
+    def __len__(self):
+        return self.shape[0]
+
+    def vectors(self) -> np.ndarray:
+        """float32 vectors - memory-mapped data itself if store isn't quantized, restored copy otherwise"""
+        return dequantize(self.data, self.extras, self.quantization)
+
+    def keys(self):
+        with open(self.path / KEYS_FILENAME, "r", encoding="utf8") as f:
+            return [line.rstrip("\n") for line in f]
+
+    def rows(self, words) -> np.ndarray:
+        """Rows of given words in vectors matrix, -1 for missing words"""
+        hashes = np.array([hash_string(word) for word in words], dtype=np.uint64)
+        positions = np.searchsorted(self.key_hashes, hashes)
+        positions = np.minimum(positions, len(self.key_hashes) - 1)
+        found = self.key_hashes[positions] == hashes
+        return np.where(found, self.key_rows[positions], -1)
+
+    def get(self, word: str):
+        row = self.rows([word])[0]
+        return dequantize(self.data, self.extras, self.quantization, rows=[row])[0] if row >= 0 else None
+
+    def __contains__(self, word: str):
+        return self.rows([word])[0] >= 0
+
+    def to_spacy_vectors(self, name: str = None, restore: bool = False) -> Vectors:
+        """
+        Read-only spacy Vectors sharing memory-mapped data (no copy of the table is made).
+        Only float32 stores can be shared - quantized vectors have to be restored to private float32 memory.
+        :param restore: if True, vectors of quantized stores are restored to float32, otherwise they're rejected
+        """
+        if self.quantization != "float32" and not restore:
+            raise ValueError(
+                f"Store {self.path} is quantized ({self.quantization}), only float32 stores can be shared by spacy "
+                f"vectors (pass restore=True to restore quantized vectors to float32 instead)"
+            )
+        data = self.data if self.quantization == "float32" else self.vectors()
+        vectors = Vectors(data=data, name=name or self.name)
+        # key -> row mapping is restored from hash index at once instead of adding keys one by one,
+        # rows aren't marked as used, so the vectors shouldn't be extended with Vectors.add
+        vectors.key2row = dict(zip(self.key_hashes.tolist(), self.key_rows.tolist()))
+        return vectors
+
+
+def write_vector_store(
+        path: str,
+        keys: list,
+        vectors: np.ndarray,
+        name: str = None,
+        quantization: str = "float32",
+        pq_subspaces: int = 50,
+        rows=None
+):
+    """
+    Writes keys and vectors as a vector store
+    :param quantization: one of spacy_pl.vectors.quantization.QUANTIZATIONS
+    :param pq_subspaces: number of subspaces (bytes per row) for product quantization
+    :param rows: row of vectors for every key, if not provided keys correspond to consecutive rows
+    """
+    path = Path(path)
+    os.makedirs(path, exist_ok=True)
+    data, extras = quantize(vectors, quantization, pq_subspaces=pq_subspaces)
+    data = np.ascontiguousarray(data)
+
+    meta = {
+        "shape": list(data.shape),
+        "dtype": data.dtype.str,
+        "name": name,
+        "quantization": quantization,
+        "extras": sorted(extras),
+    }
+    with open(path / META_FILENAME, "w") as f:
+        json.dump(meta, f, indent=4)
+    data.tofile(str(path / VECTORS_FILENAME))
+    for extra_name, extra in extras.items():
+        np.save(str(path / f"{extra_name}.npy"), extra)
+    with open(path / KEYS_FILENAME, "w", encoding="utf8") as f:
+        for key in keys:
+            f.write(key + "\n")
+
+    hashes = np.array([hash_string(key) for key in keys], dtype=np.uint64)
+    order = np.argsort(hashes, kind="stable")
+    np.save(str(path / HASHES_FILENAME), hashes[order])
+    key_rows = order if rows is None else np.asarray(rows)[order]
+    np.save(str(path / ROWS_FILENAME), key_rows.astype(np.int32))
+
+
+def save_model_without_vectors(nlp, path: str):
+    """Saves spacy model without its vectors table, so that it can be loaded only with load_model_with_store"""
+    path = Path(path)
+    nlp.to_disk(path, exclude=["vocab"])
+    nlp.vocab.to_disk(path / "vocab", exclude=["vectors"])
+
+
+def load_model_with_store(model_path: str, store_path: str):
+    """
+    Loads spacy model, taking its vectors from memory-mapped store instead of deserializing them from model directory
+    (the same steps as spacy.util.load_model_from_path, but vocab is loaded without vectors).
+    Vectors of quantized stores are restored to float32 on load.
+    """
+    model_path = Path(model_path)
+    meta = spacy.util.get_model_meta(model_path)
+    nlp = spacy.util.get_lang_class(meta["lang"])(meta=meta)
+    nlp.vocab.from_disk(model_path / "vocab", exclude=["vectors"])
+    vectors_name = meta.get("vectors", {}).get("name")
+    nlp.vocab.vectors = VectorStore(store_path).to_spacy_vectors(name=vectors_name, restore=True)
+
+    factories = meta.get("factories", {})
+    for name in meta.get("pipeline", []):
+        config = meta.get("pipeline_args", {}).get(name, {})
+        nlp.add_pipe(nlp.create_pipe(factories.get(name, name), config=config), name=name)
+    nlp.from_disk(model_path, exclude=["vocab"])
+
+    # pipes look up static vectors by name, so they have to be linked again
+    link_vectors_to_models(nlp.vocab)
+    return nlp
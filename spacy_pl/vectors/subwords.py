@@ -0,0 +1,235 @@
+"""
+Subword (character n-gram) vectors for words missing from the vectors table, composed the same way fastText does:
+the word is wrapped in "<" and ">", its n-grams (minn to maxn characters long) are hashed with FNV-1a
+into one of `bucket` rows and the vector is the mean of these rows.
+
+Bucket matrix is extracted from fastText binary model (eg. cc.pl.300.bin) into a raw file that is memory-mapped,
+composed vectors are kept in a per-process LRU cache.
+
+Pipes using static vectors as features (eg. tagger) read them from the vectors table by row, so they only see
+subword vectors added to the table with add_subword_rows (SpacyModel does it for words of training and dev data
+when given subwords_path). The "subword_vectors" pipeline component sets only token.vector and token.has_vector
+(and so similarity) for words still missing from the table, it doesn't change what trained pipes predict.
+"""
+import json
+import os
+import struct
+from functools import lru_cache
+from pathlib import Path
+
+import click
+import numpy as np
+import spacy
+from spacy.language import Language
+
+from spacy_pl.vectors.frequencies import count_token_frequencies
+
+META_FILENAME = "meta.json"
+BUCKETS_FILENAME = "buckets.bin"
+
+FASTTEXT_MAGIC = 793712314
+FNV_OFFSET = 2166136261
+FNV_PRIME = 16777619
+BOW, EOW = "<", ">"
+WRITE_ROWS = 100000
+
+
+def fasttext_hash(ngram: str) -> int:
+    """32-bit FNV-1a over UTF-8 bytes, with bytes sign-extended as in fastText"""
+    h = FNV_OFFSET
+    for byte in ngram.encode("utf8"):
+        if byte >= 0x80:
+            byte |= 0xFFFFFF00
+        h = ((h ^ byte) * FNV_PRIME) & 0xFFFFFFFF
+    return h
+
+
+def ngram_buckets(word: str, minn: int, maxn: int, bucket: int) -> list:
+    """Bucket ids of character n-grams of the word, same as fastText's Dictionary::computeSubwords"""
+    word = BOW + word + EOW
+    buckets = []
+    for i in range(len(word)):
+        for n in range(1, maxn + 1):
+            if i + n > len(word):
+                break
+            # single boundary characters are not used as n-grams
+            if n >= minn and not (n == 1 and (i == 0 or i + n == len(word))):
+                buckets.append(fasttext_hash(word[i:i + n]) % bucket)
+    return buckets
+
+
+class SubwordVectors(object):
+
+    def __init__(self, path: str, cache_size: int = 100000):
+        """
+        Opens bucket matrix (memory-mapped) extracted by extract_subword_buckets
+        :param cache_size: number of composed vectors kept in LRU cache of this process
+        """
+        path = Path(path)
+        with open(path / META_FILENAME, "r") as f:
+            self.meta = json.load(f)
+        self.minn = self.meta["minn"]
+        self.maxn = self.meta["maxn"]
+        self.bucket = self.meta["bucket"]
+        self.dim = self.meta["dim"]
+        self.buckets = np.memmap(
+            path / BUCKETS_FILENAME, dtype=np.dtype(self.meta["dtype"]), mode="r", shape=(self.bucket, self.dim)
+        )
+        self.vector = lru_cache(maxsize=cache_size)(self._compose)
+
+    def to_disk(self, path: str):
+        """Writes meta and bucket matrix to directory, so that it can be opened with SubwordVectors(path)"""
+        path = Path(path)
+        os.makedirs(path, exist_ok=True)
+        with open(path / META_FILENAME, "w") as f:
+            json.dump(self.meta, f, indent=4)
+        with open(path / BUCKETS_FILENAME, "wb") as f:
+            for start in range(0, len(self.buckets), WRITE_ROWS):
+                f.write(np.ascontiguousarray(self.buckets[start:start + WRITE_ROWS]).tobytes())
+
+    def has_vector(self, word: str) -> bool:
+        """Whether the word has any n-grams, so that its vector can be composed"""
+        return len(ngram_buckets(word, self.minn, self.maxn, self.bucket)) > 0
+
+    def _compose(self, word: str) -> np.ndarray:
+        buckets = ngram_buckets(word, self.minn, self.maxn, self.bucket)
+        if not buckets:
+            return np.zeros(self.dim, dtype=np.float32)
+        return self.buckets[buckets].astype(np.float32).mean(axis=0)
+
+
+class SubwordVectorsComponent(object):
+    """
+    spacy pipeline component giving vectors composed from subwords to tokens that have no vector in vocab
+    (sets token.vector hooks, static vectors used as features by trained pipes are not affected - see add_subword_rows)
+    """
+    name = "subword_vectors"
+
+    def __init__(self, subword_vectors: SubwordVectors = None):
+        """
+        :param subword_vectors: bucket matrix, if not provided it has to be loaded with from_disk
+        """
+        self.subword_vectors = subword_vectors
+
+    def __call__(self, doc):
+        doc.user_token_hooks["vector"] = self.token_vector
+        doc.user_token_hooks["has_vector"] = self.token_has_vector
+        return doc
+
+    def token_has_vector(self, token) -> bool:
+        return token.vocab.has_vector(token.orth) or self.subword_vectors.has_vector(token.text)
+
+    def token_vector(self, token):
+        if token.vocab.has_vector(token.orth):
+            return token.vocab.get_vector(token.orth)
+        return self.subword_vectors.vector(token.text)
+
+    def to_disk(self, path, exclude=tuple(), **kwargs):
+        self.subword_vectors.to_disk(path)
+
+    def from_disk(self, path, exclude=tuple(), **kwargs):
+        self.subword_vectors = SubwordVectors(path)
+        return self
+
+
+def create_subword_vectors_component(nlp, **cfg):
+    """
+    Factory of the component used by nlp.create_pipe and when loading models
+    :param cfg: subwords_path - directory made by extract_subword_buckets (not needed if component is loaded from disk)
+    """
+    subwords_path = cfg.get("subwords_path")
+    return SubwordVectorsComponent(SubwordVectors(subwords_path) if subwords_path is not None else None)
+
+
+Language.factories[SubwordVectorsComponent.name] = create_subword_vectors_component
+
+
+def add_subword_rows(vocab, subword_vectors: SubwordVectors, words) -> int:
+    """
+    Adds vectors composed from subwords of words missing from vocab vectors as new rows of the table,
+    so that pipes using static vectors as features see them too
+    :return: number of added rows
+    """
+    missing = sorted({word for word in words if not vocab.has_vector(word) and subword_vectors.has_vector(word)})
+    if not missing:
+        return 0
+    n_rows, dim = vocab.vectors.shape
+    vocab.vectors.resize((n_rows + len(missing), dim))
+    for word in missing:
+        vocab.set_vector(word, subword_vectors.vector(word))
+    return len(missing)
+
+
+def make_subword_vectors_model(vectors_path: str, subwords_path: str, data_paths, output_path: str) -> int:
+    """
+    Saves a copy of model with vectors (eg. blank fastText model) with subword vectors of words from given corpora
+    added to the table (see add_subword_rows)
+    :param data_paths: corpora in spacy JSON (or JSONL) format
+    :return: number of added rows
+    """
+    nlp = spacy.load(vectors_path)
+    n_added = add_subword_rows(nlp.vocab, SubwordVectors(subwords_path), count_token_frequencies(data_paths))
+    nlp.to_disk(output_path)
+    return n_added
+
+
+def read_fasttext_header(file_):
+    """Reads args and dictionary of fastText binary model, leaving file at the start of input matrix"""
+    magic, _version = struct.unpack("<ii", file_.read(8))
+    if magic != FASTTEXT_MAGIC:
+        raise ValueError("Not a fastText binary model")
+    dim, _ws, _epoch, _min_count, _neg, _word_ngrams, _loss, _model, bucket, minn, maxn, _lr_update_rate = \
+        struct.unpack("<12i", file_.read(48))
+    file_.read(8)  # sampling threshold (double)
+
+    size, nwords, _nlabels = struct.unpack("<3i", file_.read(12))
+    _ntokens, pruneidx_size = struct.unpack("<2q", file_.read(16))
+    for _ in range(size):
+        # null-terminated word, count (int64) and entry type (int8)
+        while file_.read(1) != b"\0":
+            pass
+        file_.read(9)
+    file_.read(8 * max(pruneidx_size, 0))
+
+    quant_input = struct.unpack("<?", file_.read(1))[0]
+    if quant_input:
+        raise ValueError("Quantized fastText models are not supported")
+    return {"dim": dim, "bucket": bucket, "minn": minn, "maxn": maxn, "nwords": nwords}
+
+
+@click.command(help="Extract subword bucket vectors from fastText binary model")
+@click.option("--fasttext-bin", type=str, default="data/raw/cc.pl.300.bin")
+@click.option("--output-dir", type=str, default="data/processed/vectors/subwords")
+@click.option("--dtype", type=click.Choice(["float32", "float16"]), default="float16")
+def extract_subword_buckets(fasttext_bin, output_dir, dtype):
+    print("Reading fastText header...")
+    with open(fasttext_bin, "rb") as f:
+        args = read_fasttext_header(f)
+        n_rows, n_cols = struct.unpack("<2q", f.read(16))
+        matrix_offset = f.tell()
+
+    if n_cols != args["dim"] or n_rows != args["nwords"] + args["bucket"]:
+        raise ValueError(f"Unexpected input matrix shape ({n_rows}, {n_cols})")
+
+    # bucket rows follow word rows in fastText input matrix
+    matrix = np.memmap(fasttext_bin, dtype=np.float32, mode="r", offset=matrix_offset, shape=(n_rows, n_cols))
+    buckets = matrix[args["nwords"]:]
+
+    print(f"Saving {args['bucket']} buckets...")
+    output_dir = Path(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    with open(output_dir / BUCKETS_FILENAME, "wb") as f:
+        for start in range(0, len(buckets), WRITE_ROWS):
+            f.write(np.ascontiguousarray(buckets[start:start + WRITE_ROWS], dtype=dtype).tobytes())
+    with open(output_dir / META_FILENAME, "w") as f:
+        json.dump({
+            "minn": args["minn"],
+            "maxn": args["maxn"],
+            "bucket": args["bucket"],
+            "dim": args["dim"],
+            "dtype": np.dtype(dtype).str,
+        }, f, indent=4)
+
+
+if __name__ == "__main__":
+    extract_subword_buckets()
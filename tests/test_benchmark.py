@@ -0,0 +1,25 @@
+import pytest
+
+pytest.importorskip("spacy")
+
+from spacy_pl.training import benchmark  # noqa: E402
+
+
+class FakeNlp(object):
+
+    def pipe(self, texts, batch_size, n_process):
+        for text in texts:
+            yield text.split()
+
+
+def test_latency_is_per_document(monkeypatch):
+    # batches of 2, 2 and 1 documents come out after 2, 4 and 1 seconds
+    times = iter([0.0, 2.0, 6.0, 7.0, 7.0])
+    monkeypatch.setattr(benchmark.time, "perf_counter", lambda: next(times))
+
+    run = benchmark.run_config(FakeNlp(), ["a b", "c", "d e f", "g", "h"], batch_size=2, n_process=1)
+
+    assert run["n_words"] == 8 and run["seconds"] == 7.0
+    assert run["latency_p50_ms"] == 1000.0
+    assert run["latency_p99_ms"] == pytest.approx(2000.0)
+    assert run["peak_rss_mb"] is not None
@@ -0,0 +1,72 @@
+import pytest
+
+from spacy_pl.conversion.columnar import ColumnarCorpus, ColumnarCorpusWriter
+
+TAGGED_DOCUMENTS = [
+    (3, [[[("Ala", "subst"), ("ma", "fin"), ("kota", "subst")], [(".", "interp")]]]),
+    (5, [[[("Żółw", "subst")]], [[("śpi", "fin"), (".", "interp")]]]),
+]
+TREE_DOCUMENTS = [
+    (0, [[[("Ala", "subst", 1, "nsubj"), ("ma", "fin", 0, "ROOT"), ("kota", "subst", -1, "obj")]]]),
+    (1, [[[("Śpi", "fin", 0, "ROOT"), (".", "interp", -1, "punct")]]]),
+]
+
+
+def expected_document(index, paragraphs):
+    token_id = 0
+    json_paragraphs = []
+    for sentences in paragraphs:
+        json_sentences = []
+        for tokens in sentences:
+            json_tokens = []
+            for orth, tag, *tree in tokens:
+                token = {"id": token_id, "head": 0, "tag": tag, "orth": orth}
+                if tree:
+                    token["head"], token["dep"] = tree
+                json_tokens.append(token)
+                token_id += 1
+            json_sentences.append({"tokens": json_tokens})
+        json_paragraphs.append({"sentences": json_sentences})
+    return {"id": index, "paragraphs": json_paragraphs}
+
+
+def write_corpus(documents) -> ColumnarCorpus:
+    writer = ColumnarCorpusWriter()
+    for index, paragraphs in documents:
+        writer.add_document(index, paragraphs)
+    return writer.to_corpus()
+
+
+@pytest.mark.parametrize("documents", [TAGGED_DOCUMENTS, TREE_DOCUMENTS])
+@pytest.mark.parametrize("mmap", [True, False])
+def test_round_trip(tmp_path, documents, mmap):
+    corpus = write_corpus(documents)
+    corpus.save(str(tmp_path))
+    loaded = ColumnarCorpus.load(str(tmp_path), mmap=mmap)
+
+    expected = [expected_document(index, paragraphs) for index, paragraphs in documents]
+    assert list(corpus.iter_documents()) == expected
+    assert list(loaded.iter_documents()) == expected
+    assert list(loaded.iter_documents([1])) == expected[1:]
+    assert len(loaded) == len(documents)
+    assert loaded.has_trees == (documents is TREE_DOCUMENTS)
+
+
+def test_remap_tags():
+    corpus = write_corpus(TAGGED_DOCUMENTS).remap_tags({"subst": "NOUN", "fin": "VERB"})
+    tags = [
+        token["tag"]
+        for document in corpus.iter_documents()
+        for paragraph in document["paragraphs"]
+        for sentence in paragraph["sentences"]
+        for token in sentence["tokens"]
+    ]
+    assert tags == ["NOUN", "VERB", "NOUN", "interp", "NOUN", "VERB", "interp"]
+
+
+def test_mixed_trees_are_rejected():
+    writer = ColumnarCorpusWriter()
+    writer.add_document(0, TAGGED_DOCUMENTS[0][1])
+    writer.add_document(1, TREE_DOCUMENTS[1][1])
+    with pytest.raises(ValueError):
+        writer.to_corpus()
@@ -0,0 +1,78 @@
+import pytest
+
+pytest.importorskip("spacy")
+
+from spacy_pl.conversion.conllu import convert_file, has_ner_tags, simplify_tag  # noqa: E402
+from spacy_pl.training.documents import iter_documents  # noqa: E402
+
+
+def conllu_line(id_, word, head, dep, misc):
+    return "\t".join([id_, word, word.lower(), "NOUN", "subst", "_", head, dep, "_", misc])
+
+
+NER_CONLLU = "\n".join([
+    "# sent_id = 1",
+    conllu_line("1", "Jan", "2", "nsubj", "B-PER"),
+    conllu_line("2", "Kowalski", "0", "root", "I-PER"),
+    conllu_line("3-4", "żeśmy", "_", "_", "_"),
+    conllu_line("3", "że", "2", "mark", "O"),
+    conllu_line("4", "śmy", "3", "aux", "O"),
+    conllu_line("5", "Kraków", "2", "obl", "B-GPE_LOC"),
+    "",
+    conllu_line("1", "Orlen", "0", "root", "B-GPE_ORG"),
+    conllu_line("2", "SA", "1", "flat", "I-GPE_ORG"),
+    conllu_line("3", "Wisła", "1", "conj", "B-GEOG"),
+    "",
+    "",
+])
+
+NO_NER_CONLLU = "\n".join([
+    conllu_line("1", "Ala", "2", "nsubj", "_"),
+    conllu_line("2", "ma", "0", "root", "B-PER"),
+    "",
+])
+
+
+def write(tmp_path, text):
+    path = tmp_path / "input.conllu"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def convert(tmp_path, text, n_sents=1):
+    output_path = str(tmp_path / "output.json")
+    convert_file((write(tmp_path, text), output_path, None, n_sents))
+    return list(iter_documents(output_path))
+
+
+def test_ner_tags_are_detected_by_first_token(tmp_path):
+    assert has_ner_tags(write(tmp_path, NER_CONLLU))
+    assert not has_ner_tags(write(tmp_path, NO_NER_CONLLU))
+    tokens = convert(tmp_path, NO_NER_CONLLU)[0]["paragraphs"][0]["sentences"][0]["tokens"]
+    assert all("ner" not in token for token in tokens)
+
+
+@pytest.mark.parametrize("tag,simplified", [
+    ("B-PER", "B-PER"), ("I-GPE_LOC", "I-LOC"), ("L-GPE_ORG", "L-ORG"), ("U-GEOG", "U-MISC"), ("O", "O"), ("_", "_")
+])
+def test_simplify_tag(tag, simplified):
+    assert simplify_tag(tag) == simplified
+
+
+def sentence_tokens(documents):
+    return [
+        [(token["orth"], token["tag"], token["head"], token["dep"], token.get("ner")) for token in sentence["tokens"]]
+        for document in documents for paragraph in document["paragraphs"] for sentence in paragraph["sentences"]
+    ]
+
+
+@pytest.mark.parametrize("text", [NER_CONLLU, NO_NER_CONLLU])
+@pytest.mark.parametrize("n_sents", [1, 10])
+def test_same_as_spacy_conllu2json(tmp_path, text, n_sents):
+    converters = pytest.importorskip("spacy.cli.converters.conllu2json")
+    if not hasattr(converters, "simplify_tags"):
+        pytest.skip("spacy's conllu2json doesn't simplify NER tags in this version")
+    expected = converters.conllu2json(text, n_sents=n_sents)
+    documents = convert(tmp_path, text, n_sents)
+    assert len(documents) == len(expected)
+    assert sentence_tokens(documents) == sentence_tokens(expected)
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+pytest.importorskip("spacy")
+
+from spacy_pl.training import corpus_cache  # noqa: E402
+from spacy_pl.training.documents import DocumentWriter  # noqa: E402
+from spacy_pl.training.model import SpacyModel  # noqa: E402
+from tests.test_documents import DOCUMENTS, make_document  # noqa: E402
+
+
+def write_documents(path, documents):
+    with DocumentWriter(str(path)) as writer:
+        for document in documents:
+            writer.write(document)
+    return str(path)
+
+
+@pytest.fixture
+def conversions(monkeypatch):
+    calls = []
+    read_json_object = corpus_cache.read_json_object
+    monkeypatch.setattr(
+        corpus_cache, "read_json_object", lambda documents: calls.append(1) or read_json_object(documents)
+    )
+    return calls
+
+
+def test_unchanged_corpus_is_read_from_cache(tmp_path, conversions):
+    data_path = write_documents(tmp_path / "train.json", DOCUMENTS)
+    # eg. the same fold trained by two runs of cross validation
+    models = [
+        SpacyModel("tagger", "vectors", str(tmp_path / f"model-{i}"), corpus_cache_dir=str(tmp_path / "cache"))
+        for i in range(2)
+    ]
+
+    first_path = models[0].corpus_path(data_path)
+    assert models[1].corpus_path(data_path) == first_path
+    assert len(conversions) == 1
+    assert os.listdir(tmp_path / "cache") == [first_path.name]
+
+    write_documents(tmp_path / "train.json", DOCUMENTS + [make_document(len(DOCUMENTS), 3)])
+    assert models[1].corpus_path(data_path) != first_path
+    assert len(conversions) == 2
+
+
+def test_corpus_cache_disabled(tmp_path, conversions):
+    data_path = write_documents(tmp_path / "train.json", DOCUMENTS)
+    model = SpacyModel("tagger", "vectors", str(tmp_path / "model"))
+    assert str(model.corpus_path(data_path)) == data_path
+    assert not conversions
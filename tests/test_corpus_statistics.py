@@ -0,0 +1,62 @@
+import os
+import shutil
+
+import pytest
+
+from spacy_pl.tagset.corpus_statistics import load_tag_statistics, TagStatistics
+
+FILES = {
+    "a/text1": "Ala/subst:sg ma/fin kota/subst:sg\n\nkot/subst:sg\n",
+    "a/text2": "psy/subst:pl\n",
+    "text3": "śpi/fin\n",
+}
+
+
+@pytest.fixture
+def corpus_root(tmp_path):
+    root = tmp_path / "corpus"
+    for fileid, text in FILES.items():
+        path = root.joinpath(*fileid.split("/"))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf8")
+    return root
+
+
+def load(corpus_root, tmp_path, **kwargs):
+    return load_tag_statistics(
+        str(corpus_root), str(tmp_path / "statistics"), hash_cache_dir=str(tmp_path / "hashes"), **kwargs
+    )
+
+
+def test_only_changed_files_are_hashed(corpus_root, tmp_path, capsys):
+    statistics = load(corpus_root, tmp_path)
+    assert statistics.tag_counts == {"SUBST:SG": 3, "FIN": 2, "SUBST:PL": 1}
+    assert "Hashing 3 new or changed files" in capsys.readouterr().out
+
+    assert load(corpus_root, tmp_path) == statistics
+    assert "Hashing" not in capsys.readouterr().out
+
+    (corpus_root / "text3").write_text("śpi/fin\nśpi/fin\n", encoding="utf8")
+    changed = load(corpus_root, tmp_path)
+    assert "Hashing 1 new or changed files" in capsys.readouterr().out
+    assert changed.tag_counts["FIN"] == 3 and changed.corpus_hash != statistics.corpus_hash
+
+
+def test_statistics_dir_contains_only_statistics(corpus_root, tmp_path):
+    statistics = load(corpus_root, tmp_path)
+    assert os.listdir(tmp_path / "statistics") == [f"{statistics.corpus_hash}.json"]
+
+    # eg. corpus checked out in another place, its files are hashed again but statistics are reused
+    moved_root = tmp_path / "moved"
+    shutil.copytree(corpus_root, moved_root)
+    assert load(moved_root, tmp_path, read_only=True) == statistics
+
+
+def test_read_only_doesnt_write_statistics(corpus_root, tmp_path):
+    load(corpus_root, tmp_path, read_only=True)
+    assert not os.path.exists(tmp_path / "statistics")
+
+
+def test_most_common_breaks_ties_by_tag():
+    statistics = TagStatistics("hash", {"b": 2, "c": 1, "a": 2, "d": 3})
+    assert statistics.most_common() == [("d", 3), ("a", 2), ("b", 2), ("c", 1)]
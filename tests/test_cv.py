@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("spacy")
+
+from spacy_pl.training.cv import split_indices_kfold, write_fold  # noqa: E402
+from spacy_pl.training.documents import iter_documents, DocumentWriter  # noqa: E402
+from tests.test_documents import make_document  # noqa: E402
+
+
+def test_folds_partition_documents():
+    folds = split_indices_kfold(100, 5, 0.75)
+    test_ids = np.concatenate([fold.test_ids for fold in folds])
+    assert sorted(test_ids.tolist()) == list(range(100))
+    for fold in folds:
+        ids = np.concatenate([fold.train_ids, fold.dev_ids, fold.test_ids])
+        assert sorted(ids.tolist()) == list(range(100))
+
+
+def test_write_fold_selects_documents_in_order(tmp_path):
+    documents = [make_document(i, i % 5 + 1) for i in range(50)]
+    input_file = str(tmp_path / "corpus.json")
+    with DocumentWriter(input_file) as writer:
+        for document in documents:
+            writer.write(document)
+
+    fold = split_indices_kfold(len(documents), 3, 0.75)[1]
+    paths = write_fold(input_file, fold, str(tmp_path / "fold"))
+
+    for path, ids in zip(paths, (fold.train_ids, fold.dev_ids, fold.test_ids)):
+        assert list(iter_documents(str(path))) == [documents[i] for i in ids]
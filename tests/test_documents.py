@@ -0,0 +1,61 @@
+import io
+import json
+
+import pytest
+
+from spacy_pl.training.documents import _iter_json_list, iter_documents, count_tokens, DocumentWriter
+
+
+def make_document(index: int, n_tokens: int) -> dict:
+    tokens = [{"id": i, "orth": f"słowo{index}_{i}", "tag": "subst", "head": 0} for i in range(n_tokens)]
+    return {"id": index, "paragraphs": [{"sentences": [{"tokens": tokens}]}]}
+
+
+DOCUMENTS = [make_document(index, n_tokens) for index, n_tokens in enumerate([1, 30, 0, 7, 120])]
+
+
+@pytest.mark.parametrize("indent", [None, 4])
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_iter_json_list_same_as_json_load(indent, chunk_size):
+    text = json.dumps(DOCUMENTS, indent=indent, ensure_ascii=False) + "\n"
+    assert list(_iter_json_list(io.StringIO(text), chunk_size)) == json.loads(text)
+
+
+@pytest.mark.parametrize("text", ["[]", " [ \n ] ", "[{}]", '[{"a": "]"} , {"b": [1, 2]}]'])
+def test_iter_json_list_edge_cases(text):
+    assert list(_iter_json_list(io.StringIO(text), 2)) == json.loads(text)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3])
+def test_iter_json_list_leading_whitespace(chunk_size):
+    text = "\n \n\t" + json.dumps(DOCUMENTS)
+    assert list(_iter_json_list(io.StringIO(text), chunk_size)) == DOCUMENTS
+
+
+@pytest.mark.parametrize("text", ['{"id": 0}', '[{"id": 0}', "", "  \n "])
+def test_iter_json_list_rejects_invalid_input(text):
+    with pytest.raises(ValueError):
+        list(_iter_json_list(io.StringIO(text), 4))
+
+
+@pytest.mark.parametrize("filename", ["corpus.json", "corpus.jsonl"])
+def test_writer_round_trip(tmp_path, filename):
+    path = str(tmp_path / filename)
+    with DocumentWriter(path) as writer:
+        for document in DOCUMENTS:
+            writer.write(document)
+    assert writer.n_docs == len(DOCUMENTS)
+    assert list(iter_documents(path)) == DOCUMENTS
+
+
+def test_writer_output_same_as_json_dump(tmp_path):
+    path = str(tmp_path / "corpus.json")
+    with DocumentWriter(path) as writer:
+        for document in DOCUMENTS:
+            writer.write(document)
+    with open(path, "r") as f:
+        assert f.read() == json.dumps(DOCUMENTS)
+
+
+def test_count_tokens():
+    assert [count_tokens(document) for document in DOCUMENTS] == [1, 30, 0, 7, 120]
@@ -0,0 +1,66 @@
+import pytest
+
+import heapq
+
+from spacy_pl.lemmatizer.form_lookup import FormLookup, write_form_lookup
+from spacy_pl.lemmatizer.generate_lemma_lookup import entry_key, read_run, write_run
+
+ENTRIES = sorted([
+    ("kot", "kot", "NOUN"),
+    ("kota", "kot", "NOUN"),
+    ("mam", "mieć", "VERB"),
+    ("ma", "mieć", "VERB"),
+    ("ma", "mój", "ADJ"),
+    ("żółwia", "żółw", "NOUN"),
+    ("źle", "zły", "ADJ"),
+    ("Ala", "Ala", "NOUN"),
+], key=lambda entry: entry[0].encode("utf8"))
+
+
+@pytest.fixture
+def lookup(tmp_path):
+    write_form_lookup(str(tmp_path), ENTRIES)
+    return FormLookup(str(tmp_path))
+
+
+def test_find_every_form(lookup):
+    forms = sorted(set(form for form, _, _ in ENTRIES), key=lambda form: form.encode("utf8"))
+    assert len(lookup) == len(forms)
+    for i, form in enumerate(forms):
+        assert lookup.find(form) == i
+        assert form in lookup
+
+
+@pytest.mark.parametrize("form", ["", "A", "Alb", "ko", "kotb", "m", "zzz", "ż", "żółwiak", "￿"])
+def test_find_missing_forms(lookup, form):
+    assert lookup.find(form) is None
+    assert lookup.lookup(form) == []
+    assert lookup.lemmatize(form) is None
+
+
+def test_lemmatize(lookup):
+    assert sorted(lookup.lookup("ma")) == [("mieć", "VERB"), ("mój", "ADJ")]
+    assert lookup.lemmatize("ma", "ADJ") == "mój"
+    assert lookup.lemmatize("ma", "VERB") == "mieć"
+    assert lookup.lemmatize("żółwia", "VERB") == "żółw"
+
+
+def test_empty_lookup(tmp_path):
+    write_form_lookup(str(tmp_path), [])
+    lookup = FormLookup(str(tmp_path))
+    assert len(lookup) == 0
+    assert lookup.find("kot") is None
+
+
+def test_merged_runs_same_as_sorted_entries(tmp_path):
+    runs = [sorted(ENTRIES[i::3] + ENTRIES[:2], key=entry_key) for i in range(3)]
+    for i, run in enumerate(runs):
+        write_run(str(tmp_path / f"run{i}.tsv"), run)
+    merged = heapq.merge(*(read_run(str(tmp_path / f"run{i}.tsv")) for i in range(3)), key=entry_key)
+    write_form_lookup(str(tmp_path / "merged"), merged)
+    write_form_lookup(str(tmp_path / "sorted"), sorted(ENTRIES, key=entry_key))
+
+    merged_lookup, sorted_lookup = FormLookup(str(tmp_path / "merged")), FormLookup(str(tmp_path / "sorted"))
+    assert merged_lookup.meta["n_entries"] == len(ENTRIES)
+    for form, _, _ in ENTRIES:
+        assert merged_lookup.lookup(form) == sorted_lookup.lookup(form)
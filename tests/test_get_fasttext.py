@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("spacy")
+
+from spacy_pl.vectors.get_fasttext import get_ints_sizes, parse_vec_lines, remap_lines  # noqa: E402
+
+
+def get_ints_sizes_with_sets(for_cutting, ref, n=100):
+    """Version which intersects sets of every prefix"""
+    ref_s = set(ref)
+    sizes = np.linspace(len(ref), len(for_cutting), n)
+    sizes = list(map(int, sizes))
+    ints_s = [len(set(for_cutting[:s]) & ref_s) for s in sizes]
+    ints_s = [s/len(ref) for s in ints_s]
+    sizes = [s/1000 for s in sizes]
+    return ints_s, sizes
+
+
+@pytest.mark.parametrize("n", [2, 7, 100])
+def test_get_ints_sizes_same_as_with_sets(n):
+    random_state = np.random.RandomState(0)
+    for_cutting = [f"w{i}" for i in random_state.randint(0, 500, size=2000)]
+    ref = [f"w{i}" for i in random_state.permutation(700)[:300]]
+
+    ints, sizes = get_ints_sizes(for_cutting, ref, n)
+    expected_ints, expected_sizes = get_ints_sizes_with_sets(for_cutting, ref, n)
+    assert sizes == expected_sizes
+    np.testing.assert_allclose(ints, expected_ints)
+
+
+def test_remap_lines():
+    lines = [b"kot 0.1 0.2 \n", b"dwa slowa 0.3 0.4 \n"]
+    keys = ["kot", "dwa slowa", "pies", "koty"]
+    remapped = remap_lines(keys, lines, np.array([0, 1, 1, 0]), nr_dim=2)
+
+    parsed_keys, vectors = parse_vec_lines(remapped, nr_dim=2)
+    assert parsed_keys == keys
+    np.testing.assert_array_equal(vectors, np.array([[0.1, 0.2], [0.3, 0.4], [0.3, 0.4], [0.1, 0.2]], dtype=np.float32))
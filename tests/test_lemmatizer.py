@@ -0,0 +1,80 @@
+from itertools import product
+
+import pytest
+from click.testing import CliRunner
+
+from spacy_pl.lemmatizer.benchmark_lemmatizer import collect_rules, lemmatize_linear
+from spacy_pl.lemmatizer.build_lemma_index import FlagIndex, main as build_lemma_index, write_flag_index
+from spacy_pl.lemmatizer.lemmatizer import PolishLemmatizer, parse_pattern, build_trie
+
+RULES = {
+    "NOUN": [["ami", "-"], ["y", "a"], ["[^aeiou]y", "[^aeiou]"], ["ą", "a"], ["kiem", "k"], ["iem", "-"],
+             ["em", "-"], ["ach", "a"], ["ach", "-"], ["[^k]ami", "-"]],
+    "ADJ": [["ego", "y"], ["[^k]iego", "[^k]i"], ["kiego", "ki"], ["ej", "y"], ["kiej", "ki"], [".ą", ".y"]],
+}
+INDEX = {
+    "NOUN": ["kot", "kobieta", "ręka", "Warszawa", "ptak", "kość"],
+    "ADJ": ["dobry", "tani", "wielki", "mały"],
+}
+WORDS = ["kotami", "kobiety", "kobietą", "ptakiem", "kotem", "Warszawy", "warszawach", "kość", "kościami",
+         "dobrego", "taniego", "wielkiego", "wielkiej", "małą", "dobry", "", "y", "xyz"]
+
+
+def test_parse_pattern():
+    assert parse_pattern("[^ą]a") == [(frozenset("ą"), True), (frozenset("a"), False)]
+    assert parse_pattern(".k") == [(frozenset(), True), (frozenset("k"), False)]
+
+
+def test_trie_matches_all_rules_with_matching_ending():
+    for pos, pos_rules in RULES.items():
+        trie = build_trie(pos_rules)
+        rules = collect_rules(trie.root)
+        endings = ["", "a", "y", "ą", "em", "iem", "kiem", "ami", "kami", "ach", "ego", "iego", "kiego", "ej"]
+        for prefix, ending in product(["", "k", "kot", "wiel"], endings):
+            word = prefix + ending
+            matched = list(trie.matches(word))
+            assert sorted(map(id, matched)) == sorted(id(rule) for rule in rules if word.endswith(rule.suffix))
+            assert [len(rule.suffix) for rule in matched] == sorted((len(r.suffix) for r in matched), reverse=True)
+
+
+def test_trie_lemmatizer_same_as_linear_scan():
+    lemmatizer = PolishLemmatizer(RULES, INDEX)
+    rules = {
+        pos: sorted(collect_rules(trie.root), key=lambda rule: -len(rule.suffix))
+        for pos, trie in lemmatizer.tries.items()
+    }
+    for word, pos in product(WORDS, ["NOUN", "ADJ", None]):
+        assert lemmatizer.lemmatize(word, pos) == lemmatize_linear(lemmatizer, rules, word, pos)
+
+
+@pytest.mark.parametrize("word, pos, lemma", [
+    ("kotami", "NOUN", "kot"),
+    ("kobiety", "NOUN", "kobieta"),
+    ("Warszawy", "NOUN", "warszawa"),
+    ("taniego", "ADJ", "tani"),
+    ("wielkiego", "ADJ", "wielki"),
+    ("dobrego", "ADJ", "dobry"),
+    ("małą", "ADJ", "mały"),
+    ("xyz", "NOUN", "xyz"),
+    ("kotami", None, "kotami"),
+])
+def test_lemmatize(word, pos, lemma):
+    assert PolishLemmatizer(RULES, INDEX).lemmatize(word, pos) == lemma
+
+
+def test_streamed_index_same_as_written_from_memory(tmp_path):
+    lines = ["kot/AB", "Kot/C", "pies", "żółw/A", "kot/D"]
+    (tmp_path / "polish.all").write_bytes("\n".join(lines).encode("iso-8859-2"))
+    result = CliRunner().invoke(build_lemma_index, [str(tmp_path / "polish.all"), str(tmp_path / "streamed")])
+    assert result.exit_code == 0, result.output
+
+    words = [line.split("/")[0] for line in lines]
+    groups = {"A": [0, 3], "B": [0], "C": [1], "D": [4], "NO_FLAG": [2]}
+    write_flag_index(str(tmp_path / "in_memory"), words, groups)
+
+    streamed, in_memory = FlagIndex(str(tmp_path / "streamed")), FlagIndex(str(tmp_path / "in_memory"))
+    assert streamed.word_table() == words
+    assert streamed.to_dict() == in_memory.to_dict()
+    assert list(streamed.lower_order) == list(in_memory.lower_order)
+    assert sorted(streamed.find("KOT")) == [0, 1, 4]
+    assert streamed.contains("C", "kot") and not streamed.contains("B", "pies")
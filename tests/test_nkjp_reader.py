@@ -0,0 +1,41 @@
+import pytest
+
+from spacy_pl.conversion.nkjp_reader import NKJPCorpusReader, find_fileids
+
+nltk = pytest.importorskip("nltk")
+
+FILES = {
+    "a/text1": "Ala/subst ma/fin kota/subst ./interp\nDrugie/adj zdanie/subst\n\n\nŻółw/subst:sg:nom:m2 śpi/fin\n",
+    "a/text2": "bez_tagu a/b/subst  wiele   spacji/subst\n \nkoniec/subst",
+    "b/c/text3": "\n\njedno/num\n\n",
+    "text4": "",
+}
+
+
+@pytest.fixture
+def corpus_root(tmp_path):
+    for fileid, text in FILES.items():
+        path = tmp_path.joinpath(*fileid.split("/"))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf8")
+    return str(tmp_path)
+
+
+def test_same_as_nltk_reader(corpus_root, monkeypatch):
+    # newer nltk reads corpora only from its data directories
+    monkeypatch.setattr(nltk.data, "path", nltk.data.path + [corpus_root])
+    nltk_corpus = nltk.corpus.reader.TaggedCorpusReader(root=corpus_root, fileids=r".*")
+    corpus = NKJPCorpusReader(root=corpus_root)
+
+    assert corpus.fileids() == nltk_corpus.fileids() == find_fileids(corpus_root)
+    for fileid in corpus.fileids():
+        assert list(corpus.tagged_paras(fileid)) == list(nltk_corpus.tagged_paras(fileid))
+        assert list(corpus.tagged_sents(fileid)) == list(nltk_corpus.tagged_sents(fileid))
+    assert list(corpus.tagged_words()) == list(nltk_corpus.tagged_words())
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_iter_files_paras(corpus_root, jobs):
+    corpus = NKJPCorpusReader(root=corpus_root)
+    expected = [(fileid, list(corpus.tagged_paras(fileid))) for fileid in corpus.fileids()]
+    assert list(corpus.iter_files_paras(jobs=jobs)) == expected
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from spacy_pl.vectors.quantization import quantize, dequantize, QUANTIZATIONS, PQ_CENTROIDS
+
+
+@pytest.fixture
+def vectors():
+    vectors = np.random.RandomState(0).normal(size=(300, 20)).astype(np.float32)
+    vectors[5] = 0
+    return vectors
+
+
+def test_float32_is_lossless(vectors):
+    data, extras = quantize(vectors, "float32")
+    np.testing.assert_array_equal(dequantize(data, extras, "float32"), vectors)
+
+
+def test_float16_relative_error(vectors):
+    data, extras = quantize(vectors, "float16")
+    assert data.dtype == np.float16
+    np.testing.assert_allclose(dequantize(data, extras, "float16"), vectors, rtol=2 ** -11, atol=0)
+
+
+def test_int8_error_is_within_half_step(vectors):
+    data, extras = quantize(vectors, "int8")
+    assert data.dtype == np.int8
+    restored = dequantize(data, extras, "int8")
+    half_step = np.abs(vectors).max(axis=1, keepdims=True) / 127 / 2
+    assert np.all(np.abs(restored - vectors) <= half_step * (1 + 1e-5))
+    np.testing.assert_array_equal(restored[5], 0)
+
+
+def test_pq_with_as_many_rows_as_centroids_is_exact(vectors):
+    vectors = vectors[:PQ_CENTROIDS]
+    data, extras = quantize(vectors, "pq", pq_subspaces=4)
+    assert data.dtype == np.uint8 and data.shape == (PQ_CENTROIDS, 4)
+    np.testing.assert_allclose(dequantize(data, extras, "pq"), vectors, rtol=1e-6, atol=1e-6)
+
+
+def test_pq_rejects_indivisible_subspaces(vectors):
+    with pytest.raises(ValueError):
+        quantize(vectors, "pq", pq_subspaces=3)
+
+
+@pytest.mark.parametrize("quantization", [q for q in QUANTIZATIONS if q != "pq"])
+def test_dequantize_rows(vectors, quantization):
+    data, extras = quantize(vectors, quantization)
+    rows = np.array([7, 0, 5, 299])
+    np.testing.assert_array_equal(
+        dequantize(data, extras, quantization, rows=rows), dequantize(data, extras, quantization)[rows]
+    )
@@ -0,0 +1,91 @@
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+spacy = pytest.importorskip("spacy")
+
+from spacy_pl.training import search as search_module  # noqa: E402
+from spacy_pl.training.model import SpacyModel, TrainParams  # noqa: E402
+from spacy_pl.training.search import Search, halving_budgets, hyperband_search, sample_trials  # noqa: E402
+
+SPACE = {"hyperparams": {"learn_rate": {"type": "uniform", "low": 0.0, "high": 1.0}}, "train_params": {}}
+
+
+@pytest.mark.parametrize("min_iter, max_iter, eta, expected", [
+    (1, 27, 3, [1, 3, 9, 27]),
+    (1, 10, 3, [1, 3, 10]),
+    (2, 8, 2, [2, 4, 8]),
+    (5, 5, 3, [5]),
+])
+def test_halving_budgets(min_iter, max_iter, eta, expected):
+    assert halving_budgets(min_iter, max_iter, eta) == expected
+
+
+def fake_run_trial(task):
+    """Score grows with learn rate and budget, no model is trained"""
+    trial, n_iter = task[:2]
+    return trial.trial_id, n_iter, trial.hyperparams["learn_rate"] * n_iter
+
+
+@pytest.fixture
+def search(tmp_path, monkeypatch):
+    monkeypatch.setattr(search_module, "run_trial", fake_run_trial)
+    with Search("train.json", "dev.json", str(tmp_path), "tags_acc", TrainParams(), {}) as search:
+        yield search
+
+
+def test_successive_halving_keeps_best_trials(search):
+    trials = sample_trials(SPACE, 9, np.random.RandomState(0))
+    best = sorted(trials, key=lambda t: t.hyperparams["learn_rate"])[-1]
+
+    survivors = search.successive_halving(trials, [1, 3, 9], eta=3)
+
+    assert [t.trial_id for t in survivors] == [best.trial_id]
+    assert sorted(len(t.scores) for t in trials) == [1] * 6 + [2] * 2 + [3]
+
+
+def test_hyperband_budget(search):
+    hyperband_search(search, SPACE, min_iter=1, max_iter=9, eta=3, random_state=np.random.RandomState(0))
+    # brackets s=2, 1, 0 start with 9, 5 and 3 trials
+    assert len(search.trials) == 17
+    assert sum(len(t.scores) for t in search.trials.values()) == 9 + 3 + 1 + 5 + 1 + 3
+
+
+def test_logged_results_are_reused(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(search_module, "run_trial", lambda task: calls.append(task) or fake_run_trial(task))
+    for _ in range(2):
+        with Search("train.json", "dev.json", str(tmp_path), "tags_acc", TrainParams(), {}) as search:
+            search.successive_halving(sample_trials(SPACE, 3, np.random.RandomState(0)), [1, 3], eta=3)
+    assert len(calls) == 4
+
+
+def fake_spacy_train(output_path, base_model, n_iter, **kwargs):
+    """Writes model directories like spacy.cli.train, including the final copy of model-final to model-best"""
+    def save(path, trained_iter):
+        path.mkdir(parents=True)
+        (path / "meta.json").write_text(json.dumps({"n_iter": trained_iter}))
+
+    output_path = Path(output_path)
+    previous_iter = 0 if base_model is None else json.loads((Path(base_model) / "meta.json").read_text())["n_iter"]
+    for i in range(n_iter):
+        save(output_path / f"model{i}", previous_iter + i + 1)
+    save(output_path / "model-final", previous_iter + n_iter)
+    shutil.copytree(output_path / "model-final", output_path / "model-best")
+
+
+def test_warm_started_rungs(tmp_path, monkeypatch):
+    monkeypatch.setattr(spacy.cli, "train", fake_spacy_train)
+    monkeypatch.setattr(SpacyModel, "score", lambda model, data_path: {"tags_acc": model.hyperparams["learn_rate"]})
+    model_init_params = {"pipeline": "tagger", "vectors_path": "vectors"}
+    trials = sample_trials(SPACE, 3, np.random.RandomState(0))
+
+    with Search("train.json", "dev.json", str(tmp_path), "tags_acc", TrainParams(), model_init_params) as search:
+        [best] = search.successive_halving(trials, [1, 3], eta=3)
+
+    best_location = tmp_path / f"trial-{best.trial_id}"
+    assert json.loads((best_location / "model-best" / "meta.json").read_text())["n_iter"] == 3
+    assert sorted(path.name for path in best_location.iterdir() if path.is_dir()) == ["model-best"]
@@ -0,0 +1,41 @@
+from itertools import islice
+
+import numpy as np
+import pytest
+
+from spacy_pl.training.split_data import Split, split_assignments, balance_by_tokens, ASSIGNMENT_CHUNK_SIZE
+from tests.test_documents import make_document
+
+
+@pytest.mark.parametrize("probs", [(0.5, 0.25, 0.25), (0.6, 0.2, 0.2), (1.0, 0.0, 0.0)])
+@pytest.mark.parametrize("n_docs", [1, 10, ASSIGNMENT_CHUNK_SIZE, 2 * ASSIGNMENT_CHUNK_SIZE + 7])
+def test_split_assignments_same_as_split(probs, n_docs):
+    split = Split(*probs, n_docs=n_docs, random_seed=7)
+    assignments = np.array(list(islice(split_assignments(*probs, random_seed=7), n_docs)))
+
+    assert set(np.flatnonzero(assignments == 0)) == split.train
+    assert set(np.flatnonzero(assignments == 1)) == split.validation
+    assert set(np.flatnonzero(assignments == 2)) == split.test
+
+
+def test_split_assignments_prefix_does_not_depend_on_length():
+    short = list(islice(split_assignments(0.5, 0.25, 0.25), 100))
+    long = list(islice(split_assignments(0.5, 0.25, 0.25), 10000))
+    assert long[:100] == short
+
+
+def test_balance_by_tokens_keeps_documents_and_token_shares():
+    probs = [0.5, 0.25, 0.25]
+    random_state = np.random.RandomState(0)
+    documents = [make_document(i, n_tokens) for i, n_tokens in enumerate(random_state.randint(1, 200, size=2000))]
+    # every long document drawn for train, so that document-based split is far from token shares
+    assignments = [0 if len(document["paragraphs"][0]["sentences"][0]["tokens"]) > 100 else split_id
+                   for document, split_id in zip(documents, split_assignments(*probs))]
+
+    balanced = list(balance_by_tokens(zip(assignments, documents), probs))
+
+    assert [document for _, document in balanced] == documents
+    split_tokens = np.zeros(3)
+    for split_id, document in balanced:
+        split_tokens[split_id] += len(document["paragraphs"][0]["sentences"][0]["tokens"])
+    np.testing.assert_allclose(split_tokens / split_tokens.sum(), probs, atol=0.01)
@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+import pytest
+
+spacy = pytest.importorskip("spacy")
+
+from spacy_pl.vectors.blank_model import make_blank_model  # noqa: E402
+from spacy_pl.vectors.quantization import dequantize, quantize  # noqa: E402
+from spacy_pl.vectors.store import (  # noqa: E402
+    VectorStore, load_model_with_store, save_model_without_vectors, write_vector_store
+)
+
+KEYS = ["kot", "pies", "dom", "Kraków"]
+
+
+@pytest.fixture
+def vectors():
+    return np.random.RandomState(0).normal(size=(len(KEYS), 8)).astype(np.float32)
+
+
+def test_quantized_store_is_restored_only_on_request(tmp_path, vectors):
+    write_vector_store(tmp_path, KEYS, vectors, quantization="int8")
+    store = VectorStore(tmp_path)
+
+    with pytest.raises(ValueError):
+        store.to_spacy_vectors()
+    spacy_vectors = store.to_spacy_vectors(restore=True)
+    expected = dequantize(*quantize(vectors, "int8"), "int8")
+    for row, key in enumerate(KEYS):
+        np.testing.assert_array_equal(spacy_vectors[key], expected[row])
+
+
+@pytest.mark.parametrize("quantization", ["float32", "float16"])
+def test_model_saved_without_vectors_loads_with_store(tmp_path, vectors, quantization):
+    store_path, model_path = tmp_path / "store", tmp_path / "model"
+    nlp = make_blank_model(KEYS, vectors)
+    write_vector_store(store_path, KEYS, vectors, name=nlp.vocab.vectors.name, quantization=quantization)
+
+    save_model_without_vectors(nlp, model_path)
+    assert not os.path.exists(model_path / "vocab" / "vectors")
+
+    loaded = load_model_with_store(model_path, store_path)
+    restored = VectorStore(store_path).vectors()
+    for row, key in enumerate(KEYS):
+        np.testing.assert_array_equal(loaded.vocab.vectors[key], restored[row])
@@ -0,0 +1,93 @@
+import json
+
+import numpy as np
+import pytest
+
+spacy = pytest.importorskip("spacy")
+
+from spacy_pl.vectors.subwords import (  # noqa: E402
+    fasttext_hash, ngram_buckets, add_subword_rows, SubwordVectors, SubwordVectorsComponent, FNV_OFFSET,
+    BUCKETS_FILENAME, META_FILENAME
+)
+
+
+def fnv1a(data: bytes) -> int:
+    h = FNV_OFFSET
+    for byte in data:
+        h = ((h ^ byte) * 16777619) % 2 ** 32
+    return h
+
+
+def test_fasttext_hash_of_ascii_is_fnv1a():
+    assert fasttext_hash("") == FNV_OFFSET
+    assert fasttext_hash("a") == 0xe40c292c
+    for ngram in ("<ko", "kot>", "<kot>"):
+        assert fasttext_hash(ngram) == fnv1a(ngram.encode("utf8"))
+
+
+def test_fasttext_hash_sign_extends_non_ascii_bytes():
+    # fastText hashes bytes as signed chars, so bytes >= 0x80 are xor-ed with 0xFFFFFF80 - 0xFFFFFFFF
+    h = (FNV_OFFSET ^ (0xFFFFFF00 | 0xC5)) * 16777619 % 2 ** 32
+    h = (h ^ (0xFFFFFF00 | 0xBC)) * 16777619 % 2 ** 32
+    assert fasttext_hash("ż") == h
+    assert fasttext_hash("ż") != fnv1a("ż".encode("utf8"))
+
+
+def test_ngram_buckets():
+    bucket = 2000000
+    assert ngram_buckets("ab", 3, 6, bucket) == [fasttext_hash(ngram) % bucket for ngram in ("<ab", "<ab>", "ab>")]
+    # n-grams are made of characters, not bytes
+    assert ngram_buckets("żó", 4, 4, bucket) == [fasttext_hash("<żó>") % bucket]
+    assert ngram_buckets("kot", 3, 3, 10) == [fasttext_hash(ngram) % 10 for ngram in ("<ko", "kot", "ot>")]
+
+
+def test_ngram_buckets_skip_single_boundary_characters():
+    bucket = 1000
+    assert ngram_buckets("ab", 1, 1, bucket) == [fasttext_hash("a") % bucket, fasttext_hash("b") % bucket]
+    assert ngram_buckets("", 1, 1, bucket) == []
+    assert ngram_buckets("abc", 6, 6, bucket) == []
+
+
+@pytest.fixture
+def subwords_path(tmp_path):
+    path = tmp_path / "subwords"
+    path.mkdir()
+    buckets = np.random.RandomState(0).normal(size=(50, 4)).astype(np.float16)
+    buckets.tofile(str(path / BUCKETS_FILENAME))
+    with open(path / META_FILENAME, "w") as f:
+        json.dump({"minn": 3, "maxn": 4, "bucket": 50, "dim": 4, "dtype": buckets.dtype.str}, f)
+    return path
+
+
+def test_subword_vectors_round_trip(tmp_path, subwords_path):
+    subword_vectors = SubwordVectors(subwords_path)
+    subword_vectors.to_disk(tmp_path / "copy")
+    loaded = SubwordVectors(tmp_path / "copy")
+
+    assert loaded.meta == subword_vectors.meta
+    np.testing.assert_array_equal(loaded.vector("kotek"), subword_vectors.vector("kotek"))
+    expected = np.asarray(subword_vectors.buckets)[ngram_buckets("kotek", 3, 4, 50)].astype(np.float32).mean(axis=0)
+    np.testing.assert_allclose(subword_vectors.vector("kotek"), expected)
+
+
+def test_subword_rows_are_added_to_vectors_table(subwords_path):
+    nlp = spacy.blank("pl")
+    nlp.vocab.set_vector("kot", np.ones(4, dtype=np.float32))
+    subword_vectors = SubwordVectors(subwords_path)
+
+    assert add_subword_rows(nlp.vocab, subword_vectors, ["kot", "kotek", "psy", "kotek"]) == 2
+    np.testing.assert_array_equal(nlp.vocab.get_vector("kot"), np.ones(4, dtype=np.float32))
+    np.testing.assert_allclose(nlp.vocab.get_vector("kotek"), subword_vectors.vector("kotek"))
+    assert nlp.vocab.has_vector("psy")
+
+
+def test_component_is_saved_and_loaded_with_model(tmp_path, subwords_path):
+    nlp = spacy.blank("pl")
+    nlp.add_pipe(nlp.create_pipe("subword_vectors", config={"subwords_path": str(subwords_path)}))
+    nlp.to_disk(tmp_path / "model")
+
+    loaded = spacy.load(tmp_path / "model")
+    doc = loaded("kotek")
+    assert loaded.pipe_names == ["subword_vectors"]
+    assert doc[0].has_vector
+    np.testing.assert_allclose(doc[0].vector, SubwordVectors(subwords_path).vector("kotek"))